@@ -0,0 +1,201 @@
+"""
+New-device detection for successful logins.
+
+Each user has a small fingerprint profile of the IP prefixes (/24 for IPv4,
+/48 for IPv6) and user-agent families (browser + OS, without versions) they
+have logged in from. Every entry has a hit count, and the profile is kept in
+least-recently-seen order. Both lists are bounded, so a profile stays a few
+hundred bytes however long the user's history gets.
+
+Scoring a login is a cache get and set of the profile, made under a short
+per-user lock taken with ``cache.add`` so concurrent logins of the same user
+don't overwrite each other's fingerprints. It never reads ``LoginHistory``.
+When the cache loses a profile, the next login starts a new one without
+alerting, and ``rebuild_login_fingerprints`` can rebuild every profile from
+history in one ordered pass.
+"""
+import logging
+import re
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+Assessment = namedtuple('Assessment', ['score', 'reasons', 'alert'])
+
+BROWSERS = (
+    ('Edge', re.compile(r'Edg(e|A|iOS)?/')),
+    ('Opera', re.compile(r'OPR/|Opera')),
+    ('Samsung Internet', re.compile(r'SamsungBrowser/')),
+    ('Firefox', re.compile(r'Firefox/|FxiOS/')),
+    ('Chrome', re.compile(r'Chrome/|CriOS/')),
+    ('Safari', re.compile(r'Safari/')),
+    ('curl', re.compile(r'^curl/')),
+    ('Python', re.compile(r'python-requests|python-urllib|httpx', re.I)),
+)
+SYSTEMS = (
+    ('iOS', re.compile(r'iPhone|iPad|iPod')),
+    ('Android', re.compile(r'Android')),
+    ('Windows', re.compile(r'Windows')),
+    ('macOS', re.compile(r'Mac OS X|Macintosh')),
+    ('ChromeOS', re.compile(r'CrOS')),
+    ('Linux', re.compile(r'Linux')),
+)
+
+
+@lru_cache(maxsize=1024)
+def user_agent_family(user_agent):
+    """Reduce a User-Agent header to ``"<browser> on <os>"``"""
+    browser = next((name for name, pattern in BROWSERS if pattern.search(user_agent)), 'Other')
+    system = next((name for name, pattern in SYSTEMS if pattern.search(user_agent)), 'Other')
+    return f'{browser} on {system}'
+
+
+def ip_prefix(ip_address):
+    """Network an address belongs to: /24 for IPv4, /48 for IPv6"""
+    if not ip_address:
+        return ''
+    if ':' in ip_address:
+        return ':'.join(ip_address.split(':')[:3]) + '::/48'
+    return ip_address.rsplit('.', 1)[0] + '.0/24'
+
+
+def _touch(entries, key, limit):
+    """Count ``key`` and move it to the most recent end, evicting the oldest"""
+    count = entries.pop(key, 0)
+    entries[key] = count + 1
+    while len(entries) > limit:
+        del entries[next(iter(entries))]
+    return count
+
+
+class LoginAnomalyDetector:
+    """Score logins against a bounded per-user profile kept in a cache"""
+
+    def __init__(self, cache_alias='default', key_prefix='login_fp', max_networks=16,
+                 max_agents=8, min_logins=3, threshold=2, timeout=None, lock_timeout=2):
+        self.cache_alias = cache_alias
+        self.key_prefix = key_prefix
+        self.max_networks = max_networks
+        self.max_agents = max_agents
+        self.min_logins = min_logins
+        self.threshold = threshold
+        self.timeout = timeout
+        self.lock_timeout = lock_timeout
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    def key(self, user_id):
+        return f'{self.key_prefix}:{user_id}'
+
+    def new_profile(self):
+        return {'logins': 0, 'networks': {}, 'agents': {}}
+
+    def observe(self, profile, ip_address, user_agent):
+        """Add a login to ``profile`` and return how often each part was seen before"""
+        profile['logins'] += 1
+        seen_network = _touch(profile['networks'], ip_prefix(ip_address), self.max_networks)
+        seen_agent = _touch(profile['agents'], user_agent_family(user_agent or ''), self.max_agents)
+        return seen_network, seen_agent
+
+    @contextmanager
+    def locked(self, user_id):
+        """
+        Hold the user's profile lock, waiting up to ``lock_timeout`` seconds.
+
+        The lock expires on its own, so a process that died holding it only
+        delays the next login; after the wait the update goes ahead anyway.
+        """
+        lock_key = f'{self.key(user_id)}:lock'
+        deadline = time.monotonic() + self.lock_timeout
+        while not self.cache.add(lock_key, 1, self.lock_timeout) and time.monotonic() < deadline:
+            time.sleep(0.005)
+        try:
+            yield
+        finally:
+            self.cache.delete(lock_key)
+
+    def check(self, user_id, ip_address, user_agent):
+        """Score a successful login and learn from it"""
+        key = self.key(user_id)
+        with self.locked(user_id):
+            profile = self.cache.get(key)
+            known = profile is not None and profile['logins'] >= self.min_logins
+            if profile is None:
+                profile = self.new_profile()
+
+            seen_network, seen_agent = self.observe(profile, ip_address, user_agent)
+            self.cache.set(key, profile, self.timeout)
+
+        # An unfamiliar device counts double; a new network alone is common
+        # (mobile data, travel) and only alerts together with a new device
+        reasons = []
+        score = 0
+        if not seen_agent:
+            reasons.append('device')
+            score += 2
+        if not seen_network:
+            reasons.append('network')
+            score += 1
+        return Assessment(score, reasons, known and score >= self.threshold)
+
+    def rebuild(self, rows, batch_size=500):
+        """Rebuild profiles from ``(user_id, ip_address, user_agent)`` rows grouped by user, oldest first"""
+        pending = {}
+        current_user = None
+        profile = None
+        users = 0
+        for user_id, ip_address, user_agent in rows:
+            if user_id != current_user:
+                if profile is not None:
+                    pending[self.key(current_user)] = profile
+                    users += 1
+                    if len(pending) >= batch_size:
+                        self.cache.set_many(pending, self.timeout)
+                        pending = {}
+                current_user = user_id
+                profile = self.new_profile()
+            self.observe(profile, ip_address, user_agent)
+        if profile is not None:
+            pending[self.key(current_user)] = profile
+            users += 1
+        if pending:
+            self.cache.set_many(pending, self.timeout)
+        return users
+
+    def forget(self, user_id):
+        self.cache.delete(self.key(user_id))
+
+
+@lru_cache(maxsize=None)
+def get_detector():
+    return LoginAnomalyDetector(**settings.LOGIN_ANOMALY_OPTIONS)
+
+
+def check_login(user, ip_address, user_agent):
+    """Score a successful login and alert the user about an unfamiliar device; never raises"""
+    from .events import publish_security_event
+    from .tasks import send_security_alert
+
+    try:
+        assessment = get_detector().check(user.id, ip_address, user_agent)
+    except Exception:
+        logger.exception('Login anomaly check failed for user %s', user.id)
+        return None
+
+    if assessment.alert:
+        device = user_agent_family(user_agent or '')
+        send_security_alert.delay(
+            user.id,
+            'New device sign-in',
+            f'A sign-in from {device} ({ip_address}) that we have not seen on your account before.',
+        )
+        publish_security_event(user.id, 'new_device', ip_address=ip_address, device=device)
+    return assessment
@@ -0,0 +1,455 @@
+"""
+Append-only columnar archive for old login history.
+
+``archive_login_history`` moves ``LoginHistory`` rows older than
+``LOGIN_HISTORY_HOT_DAYS`` out of the table into one segment file per month
+under ``LOGIN_HISTORY_ARCHIVE_DIR``. Each run appends a block of pages to the
+month's segment and never rewrites what is already there. A page holds up to
+``PAGE_ROWS`` rows sorted by user, newest first, and compresses each column
+separately: integers are delta-encoded, strings dictionary-encoded.
+
+``index.json`` records every page's offsets and its user and time ranges, so
+a per-user or time-bounded read only decompresses pages that can match.
+Every row before ``archived_before`` is in the archive and every row after
+it is in the table; ``iter_login_history`` stitches the two together.
+
+The Celery worker writes the archive and web processes read it, so all of
+them must see ``LOGIN_HISTORY_ARCHIVE_DIR`` on one shared filesystem. The
+directory is not created on the fly: writers raise ``ImproperlyConfigured``
+if it is missing, rather than archiving rows where the web can't read them.
+Writers serialise on an ``flock`` of ``archive.lock`` in that directory.
+
+Deleting a user cascades to their table rows; ``purge_user`` then rewrites
+the segments holding their archived rows without them.
+"""
+import fcntl
+import heapq
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+import zlib
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta, timezone as dt_timezone
+from contextlib import contextmanager
+from functools import lru_cache
+from itertools import accumulate, islice
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import Min
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = ('id', 'user_id', 'login_time', 'success', 'ip_address', 'user_agent')
+PAGE_ROWS = 1024
+INDEX_NAME = 'index.json'
+LOCK_NAME = 'archive.lock'
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+MICROSECOND = timedelta(microseconds=1)
+
+
+def _to_us(value):
+    return (value - EPOCH) // MICROSECOND
+
+
+def _from_us(value):
+    return EPOCH + timedelta(microseconds=value)
+
+
+def _le(values):
+    # Segments are little-endian whatever machine wrote them
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values
+
+
+def _encode_ints(values):
+    deltas = array('q', [values[0]] + [b - a for a, b in zip(values, values[1:])])
+    return zlib.compress(_le(deltas).tobytes())
+
+
+def _decode_ints(data, lo=0, hi=None):
+    deltas = array('q')
+    deltas.frombytes(zlib.decompress(data))
+    deltas = _le(deltas)
+    return list(accumulate(deltas[lo:hi], initial=sum(deltas[:lo])))[1:]
+
+
+def _encode_flags(values):
+    return zlib.compress(bytes(values))
+
+
+def _decode_flags(data, lo=0, hi=None):
+    return [bool(flag) for flag in zlib.decompress(data)[lo:hi]]
+
+
+def _encode_strings(values):
+    codes = {}
+    encoded = array('I', [codes.setdefault(value, len(codes)) for value in values])
+    dictionary = '\0'.join(codes).encode()
+    return zlib.compress(struct.pack('<I', len(dictionary)) + dictionary + _le(encoded).tobytes())
+
+
+def _decode_strings(data, lo=0, hi=None):
+    raw = zlib.decompress(data)
+    (size,) = struct.unpack_from('<I', raw)
+    dictionary = raw[4:4 + size].decode().split('\0')
+    codes = array('I')
+    codes.frombytes(raw[4 + size:])
+    return [dictionary[code] for code in _le(codes)[lo:hi]]
+
+
+CODECS = {
+    'id': (_encode_ints, _decode_ints),
+    'user_id': (_encode_ints, _decode_ints),
+    'login_time': (_encode_ints, _decode_ints),
+    'success': (_encode_flags, _decode_flags),
+    'ip_address': (_encode_strings, _decode_strings),
+    'user_agent': (_encode_strings, _decode_strings),
+}
+
+
+def month_key(value):
+    return f'{value.year:04d}-{value.month:02d}'
+
+
+def next_month(value):
+    return (value.replace(day=1) + timedelta(days=32)).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+class LoginHistoryArchive:
+    """Writer and memory-mapped reader for one archive directory"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._index = None
+        self._index_mtime = None
+        self._maps = {}
+
+    # Index
+
+    @property
+    def index(self):
+        """The committed index, reloaded when another process has changed it"""
+        index_path = self.path / INDEX_NAME
+        try:
+            mtime = index_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if self._index is None or mtime != self._index_mtime:
+            if mtime is None:
+                self._index = {'archived_before': None, 'segments': {}}
+            else:
+                self._index = json.loads(index_path.read_text())
+            self._index_mtime = mtime
+        return self._index
+
+    @property
+    def archived_before(self):
+        """Everything older than this is archived; None if nothing ever was"""
+        value = self.index['archived_before']
+        return None if value is None else _from_us(value)
+
+    def _commit(self, index):
+        index_path = self.path / INDEX_NAME
+        tmp = index_path.with_suffix('.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(index, f, separators=(',', ':'))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, index_path)
+        self._index = None
+
+    # Writing
+
+    @contextmanager
+    def lock(self, blocking=True):
+        """
+        Exclusive ``flock`` for writers; yields False if ``blocking`` is off and it's held.
+
+        Raises ``ImproperlyConfigured`` if the archive directory doesn't exist.
+        """
+        if not self.path.is_dir():
+            raise ImproperlyConfigured(
+                f'LOGIN_HISTORY_ARCHIVE_DIR {self.path} does not exist; create it on a filesystem '
+                f'shared by the Celery worker and the web processes'
+            )
+        with open(self.path / LOCK_NAME, 'a') as f:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            yield True
+
+    def _write_page(self, f, columns):
+        """Write one page of ``columns`` (times in microseconds) at the end of ``f``"""
+        offset = f.tell()
+        lengths = []
+        for name in COLUMNS:
+            blob = CODECS[name][0](list(columns[name]))
+            f.write(blob)
+            lengths.append(len(blob))
+        return {
+            'offset': offset,
+            'lengths': lengths,
+            'rows': len(columns['id']),
+            'users': [columns['user_id'][0], columns['user_id'][-1]],
+            'time': [min(columns['login_time']), max(columns['login_time'])],
+        }
+
+    def _append_block(self, index, month, rows, page_rows):
+        """Append ``rows`` (``COLUMNS`` tuples sorted by user, newest first) as one block"""
+        segment = index['segments'].setdefault(month, {'file': f'{month}.seg', 'blocks': []})
+        pages = []
+        with open(self.path / segment['file'], 'ab') as f:
+            rows = iter(rows)
+            while page := list(islice(rows, page_rows)):
+                columns = dict(zip(COLUMNS, zip(*page)))
+                columns['login_time'] = [_to_us(value) for value in columns['login_time']]
+                pages.append(self._write_page(f, columns))
+            f.flush()
+            os.fsync(f.fileno())
+        if pages:
+            segment['blocks'].append(pages)
+        return sum(page['rows'] for page in pages)
+
+    def _rewrite_without_user(self, index, user_id):
+        """
+        Copy segments holding ``user_id`` into new files without their rows.
+
+        Untouched pages are copied byte for byte. Returns the number of rows
+        dropped and the old files, which can go once the index is committed.
+        """
+        dropped, replaced = 0, []
+        for month, segment in index['segments'].items():
+            blocks = segment['blocks']
+            if not any(page['users'][0] <= user_id <= page['users'][1] for block in blocks for page in block):
+                continue
+            generation = segment.get('generation', 0) + 1
+            name = f'{month}.{generation}.seg'
+            new_blocks = []
+            with open(self.path / name, 'wb') as f:
+                for block in blocks:
+                    pages = []
+                    for page in block:
+                        if page['users'][0] <= user_id <= page['users'][1]:
+                            columns = self._columns(segment, page, COLUMNS)
+                            keep = [i for i, row_user in enumerate(columns['user_id']) if row_user != user_id]
+                            dropped += page['rows'] - len(keep)
+                            if keep:
+                                pages.append(self._write_page(
+                                    f, {column: [values[i] for i in keep] for column, values in columns.items()},
+                                ))
+                            continue
+                        start = page['offset']
+                        raw = self._buffer(segment['file'], start + sum(page['lengths']))
+                        pages.append({**page, 'offset': f.tell()})
+                        f.write(raw[start:start + sum(page['lengths'])])
+                    if pages:
+                        new_blocks.append(pages)
+                f.flush()
+                os.fsync(f.fileno())
+            replaced.append(segment['file'])
+            segment.update(file=name, blocks=new_blocks, generation=generation)
+        return dropped, replaced
+
+    # Reading
+
+    def _buffer(self, name, end):
+        """Memory map of a segment covering at least ``end`` bytes"""
+        buffer = self._maps.get(name)
+        if buffer is None or len(buffer) < end:
+            with open(self.path / name, 'rb') as f:
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._maps[name] = buffer
+        return buffer
+
+    def _columns(self, segment, page, names, lo=0, hi=None):
+        """Decode ``names`` for rows ``lo:hi`` of a page"""
+        buffer = self._buffer(segment['file'], page['offset'] + sum(page['lengths']))
+        view = memoryview(buffer)
+        columns = {}
+        start = page['offset']
+        for name, length in zip(COLUMNS, page['lengths']):
+            if name in names:
+                columns[name] = CODECS[name][1](view[start:start + length], lo, hi)
+            start += length
+        view.release()
+        return columns
+
+    def _segments_newest_first(self):
+        segments = self.index['segments']
+        for month in sorted(segments, reverse=True):
+            segment = segments[month]
+            for block in reversed(segment['blocks']):
+                yield segment, block
+
+    def user_rows(self, user_id, since=None, until=None):
+        """
+        Yield ``history.EXPORT_FIELDS`` tuples for one user, newest first.
+
+        ``since`` is inclusive and ``until`` exclusive; pages outside the
+        user or time range are skipped without being read.
+        """
+        since_us = None if since is None else _to_us(since)
+        until_us = None if until is None else _to_us(until)
+        for segment, block in self._segments_newest_first():
+            for page in block:
+                if not page['users'][0] <= user_id <= page['users'][1]:
+                    continue
+                if since_us is not None and page['time'][1] < since_us:
+                    continue
+                if until_us is not None and page['time'][0] >= until_us:
+                    continue
+                users = self._columns(segment, page, ('user_id',))['user_id']
+                lo, hi = bisect_left(users, user_id), bisect_right(users, user_id)
+                if lo == hi:
+                    continue
+                columns = self._columns(segment, page, ('id', 'login_time', 'ip_address', 'user_agent', 'success'), lo, hi)
+                for row_id, login_time, ip_address, user_agent, success in zip(
+                    columns['id'], columns['login_time'], columns['ip_address'],
+                    columns['user_agent'], columns['success'],
+                ):
+                    if since_us is not None and login_time < since_us:
+                        continue
+                    if until_us is not None and login_time >= until_us:
+                        continue
+                    yield row_id, _from_us(login_time), ip_address, user_agent, success
+
+    def _block_by_user(self, segment, block, successful_only):
+        # Pages are newest first per user and a user can span pages, so buffer
+        # one user's rows and flip them
+        current, rows = None, []
+        for page in block:
+            columns = self._columns(segment, page, ('user_id', 'login_time', 'ip_address', 'user_agent', 'success'))
+            for user_id, login_time, ip_address, user_agent, success in zip(
+                columns['user_id'], columns['login_time'], columns['ip_address'],
+                columns['user_agent'], columns['success'],
+            ):
+                if user_id != current:
+                    yield from reversed(rows)
+                    current, rows = user_id, []
+                if success or not successful_only:
+                    rows.append((user_id, _from_us(login_time), ip_address, user_agent, success))
+        yield from reversed(rows)
+
+    def iter_logins(self, successful_only=False):
+        """Yield ``(user_id, login_time, ip_address, user_agent, success)`` by user, oldest first"""
+        return heapq.merge(
+            *(self._block_by_user(segment, block, successful_only)
+              for segment, block in self._segments_newest_first()),
+            key=lambda row: (row[0], row[1]),
+        )
+
+    def size(self):
+        """Bytes on disk (segments and index)"""
+        if not self.path.exists():
+            return 0
+        return sum(path.stat().st_size for path in self.path.iterdir() if path.is_file())
+
+    def close(self):
+        for buffer in self._maps.values():
+            buffer.close()
+        self._maps = {}
+
+    def _forget(self, names):
+        for name in names:
+            buffer = self._maps.pop(name, None)
+            if buffer is not None:
+                buffer.close()
+            (self.path / name).unlink(missing_ok=True)
+
+
+@lru_cache(maxsize=None)
+def _archive(path):
+    return LoginHistoryArchive(path)
+
+
+def get_archive():
+    return _archive(str(settings.LOGIN_HISTORY_ARCHIVE_DIR))
+
+
+def archive_login_history(days=None, page_rows=PAGE_ROWS):
+    """
+    Move rows older than ``days`` (default ``LOGIN_HISTORY_HOT_DAYS``) to the archive.
+
+    Segments and the index are written before any row is deleted, so a run
+    that dies part-way loses nothing; the next run deletes leftovers below
+    the committed ``archived_before``. Returns the number of rows moved, or
+    None if another run holds the lock.
+    """
+    days = settings.LOGIN_HISTORY_HOT_DAYS if days is None else days
+    if days < 1:
+        # Rows written during the run must land after the cutoff
+        raise ValueError('days must be at least 1')
+    archive = get_archive()
+    with archive.lock(blocking=False) as acquired:
+        if not acquired:
+            logger.info('Login history archiving already running')
+            return None
+        return _archive_rows(archive, days, page_rows)
+
+
+def _archive_rows(archive, days, page_rows):
+    from .models import LoginHistory
+
+    previous = archive.archived_before
+    if previous is not None:
+        LoginHistory.objects.filter(login_time__lt=previous).delete()
+
+    cutoff = timezone.now() - timedelta(days=days)
+    if previous is not None and cutoff <= previous:
+        return 0
+
+    index = json.loads(json.dumps(archive.index))
+    first = LoginHistory.objects.filter(login_time__lt=cutoff).aggregate(first=Min('login_time'))['first']
+    windows = []
+    start = first
+    while start is not None and start < cutoff:
+        end = min(next_month(start), cutoff)
+        windows.append((start, end))
+        start = end
+
+    moved = 0
+    for start, end in windows:
+        rows = (
+            LoginHistory.objects
+            .filter(login_time__gte=start, login_time__lt=end)
+            .order_by('user_id', '-login_time', '-id')
+            .values_list(*COLUMNS)
+            .iterator(chunk_size=page_rows)
+        )
+        moved += archive._append_block(index, month_key(start), rows, page_rows)
+
+    index['archived_before'] = _to_us(cutoff)
+    archive._commit(index)
+
+    for start, end in windows:
+        LoginHistory.objects.filter(login_time__gte=start, login_time__lt=end).delete()
+    return moved
+
+
+def purge_user(user_id):
+    """
+    Remove a deleted user's rows from the archive; returns how many were dropped.
+
+    Blocks while an archive run holds the lock, so rows it copied before the
+    user was deleted are purged too.
+    """
+    archive = get_archive()
+    if not archive.path.is_dir():
+        return 0
+    with archive.lock():
+        index = json.loads(json.dumps(archive.index))
+        dropped, replaced = archive._rewrite_without_user(index, user_id)
+        if replaced:
+            archive._commit(index)
+            archive._forget(replaced)
+        return dropped
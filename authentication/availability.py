@@ -0,0 +1,172 @@
+"""
+Email/username availability checks that mostly avoid the database.
+
+A Bloom filter of every taken email and username (lower-cased) is rebuilt
+periodically by ``rebuild_availability_filter`` and shared through the
+cache. Each process keeps a deserialized copy and polls the cache for a new
+version at most every ``AVAILABILITY_REFRESH_SECONDS``. Names taken since
+the last rebuild are recorded as short-lived cache keys by ``mark_taken``
+(called from ``post_save`` and the bulk-create paths), so a fresh sign-up is
+never reported as available.
+
+A Bloom filter has no false negatives: "not in the filter" (and not recently
+taken) means available without a query. A hit may be a false positive, so
+hits are confirmed against the unique index. Registration still relies on
+the database's unique constraints for the final insert.
+
+The filter and the recently-taken keys must be visible to every process, so
+they need a shared cache. With a per-process LocMem cache a filter rebuilt in
+the Celery worker would never reach the web processes, and a name taken in
+one web process would be missing from the others; unless
+``AVAILABILITY_FILTER_ENABLED`` is on (the default when ``CACHE_URL`` is
+set), every check is a plain indexed query instead.
+"""
+import hashlib
+import logging
+import math
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+
+User = get_user_model()
+logger = logging.getLogger(__name__)
+
+FIELDS = ('email', 'username')
+FILTER_KEY = 'availability:filter'
+VERSION_KEY = 'availability:version'
+REBUILD_LOCK_KEY = 'availability:rebuilding'
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings using double hashing"""
+
+    def __init__(self, capacity, error_rate=0.01, bits=None, hashes=None):
+        self.size = bits or max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = hashes or max(1, round(self.size / max(capacity, 1) * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+    def to_bytes(self):
+        return self.size.to_bytes(8, 'little') + self.hashes.to_bytes(2, 'little') + bytes(self.bits)
+
+    @classmethod
+    def from_bytes(cls, data):
+        bloom = cls(0, bits=int.from_bytes(data[:8], 'little'), hashes=int.from_bytes(data[8:10], 'little'))
+        bloom.bits = bytearray(data[10:])
+        return bloom
+
+
+def _item(field, value):
+    return f'{field}:{value.strip().lower()}'
+
+
+def _recent_key(field, value):
+    return f'availability:recent:{hashlib.blake2b(_item(field, value).encode(), digest_size=12).hexdigest()}'
+
+
+class _LocalFilter:
+    """This process's copy of the shared filter"""
+
+    def __init__(self):
+        self.bloom = None
+        self.version = None
+        self.checked_at = 0.0
+
+    def get(self):
+        now = time.monotonic()
+        if now - self.checked_at >= settings.AVAILABILITY_REFRESH_SECONDS:
+            self.checked_at = now
+            version = cache.get(VERSION_KEY)
+            if version is None:
+                self._request_rebuild()
+            elif version != self.version:
+                data = cache.get(FILTER_KEY)
+                if data is not None:
+                    self.bloom, self.version = BloomFilter.from_bytes(data), version
+        return self.bloom
+
+    def _request_rebuild(self):
+        from .tasks import rebuild_availability_filter
+
+        if cache.add(REBUILD_LOCK_KEY, True, 300):
+            try:
+                rebuild_availability_filter.delay()
+            except Exception:
+                logger.exception('Could not queue an availability filter rebuild')
+                cache.delete(REBUILD_LOCK_KEY)
+
+
+local_filter = _LocalFilter()
+
+
+def rebuild_filter():
+    """Build the filter from every user in one streaming pass and publish it"""
+    count = User.objects.count()
+    capacity = max(settings.AVAILABILITY_FILTER_CAPACITY, count * 2)
+    bloom = BloomFilter(capacity, settings.AVAILABILITY_FILTER_ERROR_RATE)
+    for email, username in User.objects.values_list(*FIELDS).iterator(chunk_size=5000):
+        bloom.add(_item('email', email))
+        bloom.add(_item('username', username))
+
+    version = time.time_ns()
+    cache.set(FILTER_KEY, bloom.to_bytes(), None)
+    cache.set(VERSION_KEY, version, None)
+    cache.delete(REBUILD_LOCK_KEY)
+    local_filter.bloom, local_filter.version = bloom, version
+    return count, len(bloom.bits)
+
+
+def mark_taken(emails=(), usernames=()):
+    """Record names taken since the last rebuild"""
+    if not settings.AVAILABILITY_FILTER_ENABLED:
+        return
+    items = [('email', e) for e in emails if e] + [('username', u) for u in usernames if u]
+    if not items:
+        return
+    bloom = local_filter.bloom
+    if bloom is not None:
+        for field, value in items:
+            bloom.add(_item(field, value))
+    # Outlive the next rebuild, which will include them
+    timeout = settings.AVAILABILITY_REBUILD_MINUTES * 60 * 2
+    cache.set_many({_recent_key(field, value): True for field, value in items}, timeout)
+
+
+def _maybe_taken(field, value):
+    if not settings.AVAILABILITY_FILTER_ENABLED:
+        return True
+    bloom = local_filter.get()
+    if bloom is None or _item(field, value) in bloom:
+        # No filter yet (cold cache) or a hit that may be a false positive
+        return True
+    return cache.get(_recent_key(field, value)) is not None
+
+
+def is_available(field, value):
+    """True if no user has ``value`` as ``field``; queries only on a filter hit"""
+    if not _maybe_taken(field, value):
+        return True
+    return not User.objects.filter(**{field: value}).exists()
+
+
+def unique_message(field):
+    """The error message the model's unique constraint would give"""
+    model_field = User._meta.get_field(field)
+    return model_field.error_messages['unique'] % {
+        'model_name': User._meta.verbose_name,
+        'field_label': model_field.verbose_name,
+    }
@@ -0,0 +1,257 @@
+"""
+Streaming bulk user import.
+
+Rows are read lazily from a CSV or NDJSON file, validated against in-memory
+sets of existing emails/usernames, hashed across a worker pool and inserted
+with ``bulk_create`` one chunk per transaction. Progress is checkpointed next
+to the source file after every chunk so an interrupted import can resume.
+
+A run holds an exclusive ``flock`` on ``<file>.lock`` from start to finish,
+and status changes are made under that lock and only from the expected
+statuses, so a duplicate task delivery or a second resume request can't
+import the same file twice. The kernel drops the lock if the worker dies,
+which is how a ``running`` import is told apart from an interrupted one.
+"""
+import csv
+import fcntl
+import itertools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.password_validation import validate_password
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+
+from .availability import mark_taken
+from .tasks import send_welcome_emails
+
+User = get_user_model()
+
+MAX_RECORDED_ERRORS = 100
+
+# A worker may start an import in these states ("running" only once its lock is free)
+STARTABLE = ('pending', 'queued', 'running')
+# ... and an admin may queue a resume from these
+RESUMABLE = ('failed', 'running')
+
+
+def read_rows(path):
+    """Yield one dict per user from a CSV or NDJSON file"""
+    path = Path(path)
+    with path.open(newline='', encoding='utf-8') as f:
+        if path.suffix.lower() in ('.ndjson', '.jsonl'):
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    yield None
+        else:
+            yield from csv.DictReader(f)
+
+
+def _setup_worker():
+    # Spawned (non-forked) workers start without Django configured
+    import django
+    django.setup()
+
+
+class UserImporter:
+    """Import users from ``path`` in chunks, resuming from the last checkpoint"""
+
+    def __init__(self, path, chunk_size=1000, workers=None, executor='process',
+                 email_batch_size=500, progress=None):
+        self.path = Path(path)
+        self.checkpoint_path = checkpoint_path(self.path)
+        self.chunk_size = chunk_size
+        self.workers = workers or os.cpu_count() or 1
+        self.executor = executor
+        self.email_batch_size = email_batch_size
+        self.progress = progress
+        self.username_validator = User.username_validator
+
+    def load_checkpoint(self):
+        if self.checkpoint_path.exists():
+            return json.loads(self.checkpoint_path.read_text())
+        return {'status': 'pending', 'rows_done': 0, 'created': 0, 'skipped': 0, 'errors': []}
+
+    def save_checkpoint(self, state):
+        tmp_path = self.checkpoint_path.with_suffix('.tmp')
+        tmp_path.write_text(json.dumps(state))
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def run(self, resume=True):
+        """
+        Import the file and return the final state.
+
+        Returns None without touching anything if another run holds the file
+        or its checkpoint says it is already done or failed.
+        """
+        with locked(self.path, blocking=False) as acquired:
+            if not acquired:
+                return None
+            state = self.load_checkpoint()
+            if resume and state['status'] not in STARTABLE:
+                return None
+            if not resume:
+                state = {'status': 'pending', 'rows_done': 0, 'created': 0, 'skipped': 0, 'errors': []}
+            return self._run(state)
+
+    def _run(self, state):
+        state['status'] = 'running'
+        state.pop('error', None)
+        self.save_checkpoint(state)
+
+        # Preloaded once so every uniqueness check is a set lookup
+        emails = set(User.objects.values_list('email', flat=True).iterator())
+        usernames = set(User.objects.values_list('username', flat=True).iterator())
+
+        if self.executor == 'process':
+            pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_setup_worker)
+        else:
+            # PBKDF2 releases the GIL, so threads still hash in parallel
+            pool = ThreadPoolExecutor(max_workers=self.workers)
+
+        try:
+            rows = itertools.islice(read_rows(self.path), state['rows_done'], None)
+            while True:
+                chunk = list(itertools.islice(rows, self.chunk_size))
+                if not chunk:
+                    break
+                self._import_chunk(chunk, state, emails, usernames, pool)
+                state['rows_done'] += len(chunk)
+                self.save_checkpoint(state)
+                if self.progress:
+                    self.progress(state)
+        except Exception as e:
+            state['status'] = 'failed'
+            state['error'] = str(e)
+            self.save_checkpoint(state)
+            raise
+        finally:
+            pool.shutdown()
+
+        state['status'] = 'done'
+        self.save_checkpoint(state)
+        return state
+
+    def _import_chunk(self, chunk, state, emails, usernames, pool):
+        users = []
+        passwords = []
+        for line, row in enumerate(chunk, start=state['rows_done'] + 1):
+            user, password, error = self._build_user(row, emails, usernames)
+            if error:
+                state['skipped'] += 1
+                if len(state['errors']) < MAX_RECORDED_ERRORS:
+                    state['errors'].append({'row': line, 'error': error})
+                continue
+            emails.add(user.email)
+            usernames.add(user.username)
+            users.append(user)
+            passwords.append(password)
+
+        if not users:
+            return
+
+        chunksize = max(1, len(passwords) // (self.workers * 4))
+        for user, encoded in zip(users, pool.map(make_password, passwords, chunksize=chunksize)):
+            user.password = encoded
+
+        with transaction.atomic():
+            created = User.objects.bulk_create(users, batch_size=500)
+        mark_taken(emails=[user.email for user in users], usernames=[user.username for user in users])
+
+        user_ids = [user.pk for user in created]
+        if None in user_ids:
+            # Backends without RETURNING support don't populate primary keys
+            user_ids = list(
+                User.objects.filter(email__in=[user.email for user in users]).values_list('id', flat=True)
+            )
+        for i in range(0, len(user_ids), self.email_batch_size):
+            send_welcome_emails.delay(user_ids[i:i + self.email_batch_size])
+
+        state['created'] += len(created)
+
+    def _build_user(self, row, emails, usernames):
+        if not isinstance(row, dict):
+            return None, None, 'Malformed row'
+
+        email = User.objects.normalize_email((row.get('email') or '').strip())
+        username = User.normalize_username((row.get('username') or '').strip())
+        password = row.get('password') or None
+        if not email or not username:
+            return None, None, 'Email and username are required'
+
+        try:
+            validate_email(email)
+            self.username_validator(username)
+        except ValidationError as e:
+            return None, None, e.messages[0]
+
+        if email in emails:
+            return None, None, 'A user with that email already exists.'
+        if username in usernames:
+            return None, None, 'A user with that username already exists.'
+
+        user = User(
+            email=email,
+            username=username,
+            first_name=(row.get('first_name') or '').strip()[:150],
+            last_name=(row.get('last_name') or '').strip()[:150],
+        )
+        if password:
+            try:
+                validate_password(password, user)
+            except ValidationError as e:
+                return None, None, e.messages[0]
+        return user, password, None
+
+
+def checkpoint_path(path):
+    """Progress file kept next to the import file"""
+    path = Path(path)
+    return path.with_name(f'{path.stem}.progress.json')
+
+
+def lock_path(path):
+    """Lock file held by the run importing ``path``"""
+    path = Path(path)
+    return path.with_name(f'{path.stem}.lock')
+
+
+@contextmanager
+def locked(path, blocking=True):
+    """Exclusive ``flock`` on the import's lock file; yields False if ``blocking`` is off and it's held"""
+    with open(lock_path(path), 'a') as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        yield True
+
+
+def queue_resume(path):
+    """
+    Move a failed or interrupted import back to ``queued``.
+
+    Returns False, changing nothing, unless the checkpoint says ``failed`` or
+    ``running`` and no run holds the lock, so at most one resume is queued.
+    """
+    importer = UserImporter(path)
+    with locked(path, blocking=False) as acquired:
+        if not acquired:
+            return False
+        state = importer.load_checkpoint()
+        if state['status'] not in RESUMABLE:
+            return False
+        state['status'] = 'queued'
+        importer.save_checkpoint(state)
+        return True
@@ -0,0 +1,135 @@
+"""
+Signed, short-lived challenges for the second login step.
+
+After a correct password, a 2FA user gets a challenge token instead of a raw
+``user_id``. The token is a ``django.core.signing`` payload carrying the user
+id, a version of the user's TOTP secret, the user's ``last_login`` at issue
+time and an expiry. The secret and the user's API representation are cached
+under the token's nonce, so the verify step normally checks the code without
+reading the user row. If the state isn't in this process's cache (a per-process
+LocMem cache behind several workers, or an eviction), it is loaded from the
+database instead.
+
+The final ``last_login`` update is conditional on the secret and on
+``last_login`` still being what the challenge saw, so a challenge completes
+at most once whichever process sees it. Wrong codes are counted per challenge,
+and the challenge is burned after ``TWO_FACTOR_CHALLENGE_ATTEMPTS`` of them.
+The counter lives in the default cache, so set ``CACHE_URL`` to share it
+between processes.
+"""
+import secrets
+import time
+from datetime import datetime
+
+import pyotp
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+SALT = 'authentication.challenge'
+
+
+class InvalidChallenge(Exception):
+    """The challenge is forged, expired or already used"""
+
+
+def secret_version(secret):
+    """Opaque tag that changes whenever the TOTP secret does"""
+    return salted_hmac(SALT, secret or '').hexdigest()[:16]
+
+
+def _state_key(nonce):
+    return f'2fa:challenge:{nonce}'
+
+
+def _attempts_key(nonce):
+    return f'2fa:challenge:{nonce}:failures'
+
+
+def issue_challenge(user, representation):
+    """Cache the state the verify step needs and return the signed token"""
+    nonce = secrets.token_urlsafe(16)
+    lifetime = settings.TWO_FACTOR_CHALLENGE_SECONDS
+    cache.set(_state_key(nonce), {
+        'secret': user.two_factor_secret,
+        'user': representation,
+    }, lifetime)
+    return signing.dumps({
+        'uid': user.pk,
+        'sv': secret_version(user.two_factor_secret),
+        'll': user.last_login.isoformat() if user.last_login else None,
+        'exp': int(time.time()) + lifetime,
+        'n': nonce,
+    }, salt=SALT)
+
+
+def _load_state(user_id):
+    from .serializers import user_representation
+
+    user = get_user_model().objects.filter(pk=user_id, is_active=True, two_factor_enabled=True).first()
+    if user is None:
+        return None
+    return {'secret': user.two_factor_secret, 'user': user_representation.to_representation(user)}
+
+
+def open_challenge(token):
+    """Return ``(payload, state)`` for a live challenge or raise ``InvalidChallenge``"""
+    try:
+        payload = signing.loads(token, salt=SALT)
+    except signing.BadSignature:
+        raise InvalidChallenge('Invalid challenge')
+    if payload['exp'] < time.time():
+        raise InvalidChallenge('Challenge expired')
+    if (cache.get(_attempts_key(payload['n'])) or 0) >= settings.TWO_FACTOR_CHALLENGE_ATTEMPTS:
+        raise InvalidChallenge('Too many attempts')
+
+    state = cache.get(_state_key(payload['n']))
+    if state is None:
+        state = _load_state(payload['uid'])
+    if state is None or not constant_time_compare(secret_version(state['secret']), payload['sv']):
+        raise InvalidChallenge('Challenge expired')
+    return payload, state
+
+
+def verify_code(state, code):
+    """TOTP check against the cached secret"""
+    return bool(state['secret']) and pyotp.TOTP(state['secret']).verify(code, valid_window=1)
+
+
+def record_failure(payload):
+    """Count a wrong code; returns True once the challenge is burned"""
+    key = _attempts_key(payload['n'])
+    timeout = max(1, payload['exp'] - int(time.time()))
+    cache.add(key, 0, timeout)
+    try:
+        failures = cache.incr(key)
+    except ValueError:
+        # Expired between add and incr
+        return True
+    if failures >= settings.TWO_FACTOR_CHALLENGE_ATTEMPTS:
+        cache.delete(_state_key(payload['n']))
+        return True
+    return False
+
+
+def complete_challenge(payload, state):
+    """
+    Set ``last_login`` if the challenge is still current; the only query.
+
+    Fails if the account was disabled, 2FA was reset, or the user logged in
+    since the challenge was issued (including by this challenge).
+    """
+    last_login = payload['ll']
+    users = get_user_model().objects.filter(
+        pk=payload['uid'], is_active=True, two_factor_enabled=True, two_factor_secret=state['secret'],
+    )
+    if last_login is None:
+        users = users.filter(last_login__isnull=True)
+    else:
+        users = users.filter(last_login=datetime.fromisoformat(last_login))
+    updated = users.update(last_login=timezone.now())
+    cache.delete(_state_key(payload['n']))
+    return bool(updated)
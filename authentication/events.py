@@ -0,0 +1,137 @@
+"""
+Pub/sub for account security events (logins, 2FA changes, lockouts).
+
+Views publish from synchronous code; SSE connections subscribe from the
+event loop. ``InProcessBroker`` fans events out to the subscribers of the
+current process. ``RedisBroker`` publishes through Redis and keeps a single
+pattern subscription per process, so the number of open SSE connections
+doesn't change the number of Redis connections. Pick one with
+``SECURITY_EVENTS_BROKER``.
+
+``InProcessBroker`` only works when every publisher runs inside the ASGI
+process holding the streams: events published by Celery workers, WSGI
+workers or other ASGI workers are silently dropped. It's the fallback only
+when neither ``SECURITY_EVENTS_REDIS_URL`` nor ``CACHE_URL`` is set.
+"""
+import asyncio
+import contextlib
+import json
+import logging
+import threading
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+def _offer(queue, event):
+    # A subscriber that stopped reading loses its oldest events, not memory
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(event)
+
+
+class InProcessBroker:
+    """Fan events out to subscriber queues living in this process"""
+
+    def __init__(self, queue_size=100):
+        self.queue_size = queue_size
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def publish(self, user_id, event):
+        self._fan_out(user_id, event)
+
+    def _fan_out(self, user_id, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(_offer, queue, event)
+            except RuntimeError:
+                # Event loop already closed
+                pass
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(s) for s in self._subscribers.values())
+
+    @contextlib.asynccontextmanager
+    async def subscribe(self, user_id):
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        entry = (asyncio.get_running_loop(), queue)
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(entry)
+        try:
+            yield queue
+        finally:
+            with self._lock:
+                subscribers = self._subscribers.get(user_id)
+                if subscribers is not None:
+                    subscribers.discard(entry)
+                    if not subscribers:
+                        del self._subscribers[user_id]
+
+
+class RedisBroker(InProcessBroker):
+    """Publish through Redis so events reach subscribers in every process"""
+
+    def __init__(self, url, channel_prefix='security_events:', **kwargs):
+        super().__init__(**kwargs)
+        self.url = url
+        self.channel_prefix = channel_prefix
+        self._client = None
+        self._listeners = {}
+
+    def publish(self, user_id, event):
+        if self._client is None:
+            import redis
+            self._client = redis.Redis.from_url(self.url)
+        self._client.publish(f'{self.channel_prefix}{user_id}', json.dumps(event))
+
+    @contextlib.asynccontextmanager
+    async def subscribe(self, user_id):
+        loop = asyncio.get_running_loop()
+        listener = self._listeners.get(loop)
+        if listener is None or listener.done():
+            self._listeners[loop] = loop.create_task(self._listen())
+        async with super().subscribe(user_id) as queue:
+            yield queue
+
+    async def _listen(self):
+        import redis.asyncio as aioredis
+
+        client = aioredis.from_url(self.url)
+        pubsub = client.pubsub()
+        await pubsub.psubscribe(f'{self.channel_prefix}*')
+        try:
+            async for message in pubsub.listen():
+                if message['type'] != 'pmessage':
+                    continue
+                try:
+                    user_id = int(message['channel'].rsplit(b':', 1)[1])
+                    event = json.loads(message['data'])
+                except (ValueError, IndexError):
+                    continue
+                self._fan_out(user_id, event)
+        finally:
+            await pubsub.close()
+            await client.close()
+
+
+@lru_cache(maxsize=None)
+def get_broker():
+    broker_class = import_string(settings.SECURITY_EVENTS_BROKER)
+    return broker_class(**settings.SECURITY_EVENTS_BROKER_OPTIONS)
+
+
+def publish_security_event(user_id, event_type, **data):
+    """Publish an event to the user's open SSE streams; never raises"""
+    event = {'type': event_type, 'time': timezone.now().isoformat(), **data}
+    try:
+        get_broker().publish(user_id, event)
+    except Exception:
+        logger.exception('Failed to publish security event %s for user %s', event_type, user_id)
@@ -0,0 +1,46 @@
+"""
+Password hashing tuned to this deployment.
+
+``TunedPBKDF2PasswordHasher`` is Django's PBKDF2-SHA256 hasher with the
+iteration count taken from ``PASSWORD_PBKDF2_ITERATIONS`` (see the
+``calibrate_password_hasher`` command), but never below Django's own default.
+It keeps the ``pbkdf2_sha256`` algorithm name, so existing hashes keep
+verifying. Hashes made with fewer iterations are upgraded one user at a time
+by ``check_and_upgrade`` on their next successful login; stronger ones are
+left alone, so lowering the setting never weakens stored hashes.
+"""
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher, check_password
+
+
+MIN_ITERATIONS = PBKDF2PasswordHasher.iterations
+
+
+class TunedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """PBKDF2-SHA256 with the iteration count from settings"""
+
+    @property
+    def iterations(self):
+        return max(settings.PASSWORD_PBKDF2_ITERATIONS, MIN_ITERATIONS)
+
+    def must_update(self, encoded):
+        # Django rehashes on any mismatch; only ever move up
+        iterations = self.decode(encoded)['iterations']
+        if iterations != self.iterations:
+            return iterations < self.iterations
+        return super().must_update(encoded)
+
+
+def check_and_upgrade(user, raw_password):
+    """
+    ``user.check_password`` for the login path.
+
+    On success a hash made with another hasher or other parameters is
+    replaced with a column-targeted update, without ``save()`` or signals.
+    """
+    def upgrade(raw_password):
+        user.set_password(raw_password)
+        user._password = None
+        type(user)._default_manager.filter(pk=user.pk).update(password=user.password)
+
+    return user.is_active and check_password(raw_password, user.password, upgrade)
@@ -0,0 +1,81 @@
+"""
+Constant-memory iteration and export of a user's login history.
+
+Rows are fetched in keyset pages over the ``(user, -login_time)`` index, so
+each page is an index range scan no matter how deep into the history it is,
+and only one page is ever held in memory. Rows older than the archive's
+``archived_before`` come from the segment files instead (see ``archive``).
+"""
+import csv
+import json
+
+from django.db.models import Q
+
+from .archive import get_archive
+from .models import LoginHistory
+
+EXPORT_FIELDS = ('id', 'login_time', 'ip_address', 'user_agent', 'success')
+
+
+def iter_login_history(user_id, page_size=2000):
+    """Yield ``EXPORT_FIELDS`` tuples for a user, newest first, table then archive"""
+    archive = get_archive()
+    archived_before = archive.archived_before
+    queryset = (
+        LoginHistory.objects
+        .filter(user_id=user_id)
+        .order_by('-login_time', '-id')
+        .values_list(*EXPORT_FIELDS)
+    )
+    if archived_before is not None:
+        # Rows below the boundary may linger until the archiver deletes them
+        queryset = queryset.filter(login_time__gte=archived_before)
+    yield from _iter_table(queryset, page_size)
+    if archived_before is not None:
+        yield from archive.user_rows(user_id)
+
+
+def _iter_table(queryset, page_size):
+    page = list(queryset[:page_size])
+    while page:
+        yield from page
+        if len(page) < page_size:
+            return
+        last_id, last_time = page[-1][0], page[-1][1]
+        page = list(
+            queryset.filter(
+                Q(login_time__lt=last_time) | Q(login_time=last_time, id__lt=last_id)
+            )[:page_size]
+        )
+
+
+class _Echo:
+    """File-like object whose write() just returns the value (for csv.writer)"""
+
+    def write(self, value):
+        return value
+
+
+def _row_dict(row):
+    record = dict(zip(EXPORT_FIELDS, row))
+    record['login_time'] = record['login_time'].isoformat()
+    return record
+
+
+def stream_ndjson(rows):
+    for row in rows:
+        yield json.dumps(_row_dict(row)) + '\n'
+
+
+def stream_csv(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for row in rows:
+        record = _row_dict(row)
+        yield writer.writerow([record[field] for field in EXPORT_FIELDS])
+
+
+EXPORT_FORMATS = {
+    'ndjson': (stream_ndjson, 'application/x-ndjson'),
+    'csv': (stream_csv, 'text/csv'),
+}
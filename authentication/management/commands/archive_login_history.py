@@ -0,0 +1,31 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from authentication.archive import PAGE_ROWS, archive_login_history, get_archive
+
+
+class Command(BaseCommand):
+    help = 'Move login history older than --days into the compressed monthly segment archive'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None, help='Defaults to LOGIN_HISTORY_HOT_DAYS')
+        parser.add_argument('--page-rows', type=int, default=PAGE_ROWS)
+
+    def handle(self, *args, **options):
+        start = time.monotonic()
+        try:
+            moved = archive_login_history(options['days'], options['page_rows'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        if moved is None:
+            raise CommandError('Another archive run is in progress')
+
+        archive = get_archive()
+        elapsed = time.monotonic() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'Archived {moved} rows in {elapsed:.1f}s; everything before '
+            f'{archive.archived_before:%Y-%m-%d %H:%M} is in {settings.LOGIN_HISTORY_ARCHIVE_DIR} '
+            f'({archive.size() / 1e6:.1f} MB)'
+        ))
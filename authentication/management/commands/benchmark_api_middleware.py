@@ -0,0 +1,56 @@
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import Client, override_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from authentication.views import UserProfileView
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Compare per-request cost of a JWT API call with and without the API fast lane'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--path', default='/api/auth/profile/')
+
+    def handle(self, *args, **options):
+        n = options['requests']
+        saved_throttles = UserProfileView.throttle_classes
+        UserProfileView.throttle_classes = []
+        try:
+            with transaction.atomic():
+                user = User.objects.create_user(
+                    username=f'bench-{uuid.uuid4().hex[:8]}',
+                    email=f'bench-{uuid.uuid4().hex[:8]}@example.com',
+                )
+                token = str(RefreshToken.for_user(user).access_token)
+                results = {}
+                for label, enabled in (('full stack', False), ('fast lane', True)):
+                    with override_settings(API_FAST_LANE=enabled):
+                        results[label] = self._time(options['path'], token, n)
+                transaction.set_rollback(True)
+        finally:
+            UserProfileView.throttle_classes = saved_throttles
+
+        for label, elapsed in results.items():
+            self.stdout.write(f'{label:<12} {elapsed / n * 1e6:.0f} us/request')
+        saved = (results['full stack'] - results['fast lane']) / n * 1e6
+        self.stdout.write(self.style.SUCCESS(f'saved        {saved:.0f} us/request'))
+
+    def _time(self, path, token, n):
+        # Browsers that also hold an admin/OAuth session send this cookie
+        # along with their API calls
+        client = Client(HTTP_HOST='localhost', HTTP_AUTHORIZATION=f'Bearer {token}')
+        client.cookies['sessionid'] = 'benchmark'
+        for _ in range(min(n, 100)):
+            client.get(path)
+        start = time.perf_counter()
+        for _ in range(n):
+            client.get(path)
+        return time.perf_counter() - start
@@ -0,0 +1,75 @@
+import random
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from authentication.availability import is_available, local_filter, rebuild_filter
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Compare Bloom-filter availability checks with plain exists() queries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20_000, help='Temporary users to seed (rolled back)')
+        parser.add_argument('--checks', type=int, default=5000)
+        parser.add_argument('--taken', type=float, default=0.2, help='Share of checks for names that exist')
+
+    @override_settings(AVAILABILITY_FILTER_ENABLED=True)
+    def handle(self, *args, **options):
+        rng = random.Random(0)
+        run = uuid.uuid4().hex[:6]
+        password = make_password(None)
+
+        with transaction.atomic():
+            User.objects.bulk_create(
+                [User(username=f'avail{run}_{i}', email=f'avail{run}_{i}@example.com', password=password)
+                 for i in range(options['users'])],
+                batch_size=1000,
+            )
+            count, size = rebuild_filter()
+
+            checks = []
+            for _ in range(options['checks']):
+                field = rng.choice(('email', 'username'))
+                i = rng.randrange(options['users']) if rng.random() < options['taken'] else f'new{rng.randrange(10**9)}'
+                checks.append((field, f'avail{run}_{i}@example.com' if field == 'email' else f'avail{run}_{i}'))
+
+            baseline = self._run(checks, lambda field, value: not User.objects.filter(**{field: value}).exists())
+            bloom = self._run(checks, is_available)
+            assert baseline[0] == bloom[0], 'Bloom filter answers differ from the database'
+
+            free = [(field, value) for (field, value), ok in zip(checks, baseline[0]) if ok]
+            false_positives = sum(f'{field}:{value.lower()}' in local_filter.bloom for field, value in free)
+            transaction.set_rollback(True)
+
+        # Publish a filter without the seeded users again
+        rebuild_filter()
+
+        self.stdout.write(f'filter:  {count} users, {size / 1024:.1f} KiB')
+        self.stdout.write(f'checks:  {len(checks)} ({len(checks) - len(free)} taken, {len(free)} free)')
+        for label, (_, queries, timings) in (('exists()', baseline), ('bloom', bloom)):
+            self.stdout.write(
+                f'  {label:<9} {queries / len(checks):.3f} queries/check  '
+                f'p50 {timings[len(timings) // 2] * 1e6:.1f} us  p99 {timings[int(len(timings) * 0.99)] * 1e6:.1f} us'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'false positives: {false_positives}/{len(free)} free names '
+            f'({false_positives / max(len(free), 1):.2%})'
+        ))
+
+    def _run(self, checks, check):
+        answers, timings = [], []
+        with CaptureQueriesContext(connection) as queries:
+            for field, value in checks:
+                start = time.perf_counter()
+                answers.append(check(field, value))
+                timings.append(time.perf_counter() - start)
+        timings.sort()
+        return answers, len(queries), timings
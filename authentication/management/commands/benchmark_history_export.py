@@ -0,0 +1,62 @@
+import random
+import time
+import tracemalloc
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from authentication.history import EXPORT_FORMATS, iter_login_history
+from authentication.models import LoginHistory
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Measure peak Python memory while exporting a large login history'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000)
+        parser.add_argument('--format', choices=sorted(EXPORT_FORMATS), default='ndjson')
+        parser.add_argument('--max-peak-mb', type=float, default=None, help='Fail if peak memory exceeds this')
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        stream, _ = EXPORT_FORMATS[options['format']]
+
+        with transaction.atomic():
+            user = User.objects.create_user(
+                username=f'export-bench-{random.randrange(10**9)}',
+                email=f'export-bench-{random.randrange(10**9)}@example.com',
+            )
+            self.stdout.write(f'Inserting {rows} login history rows...')
+            batch = []
+            for i in range(rows):
+                batch.append(LoginHistory(
+                    user=user,
+                    ip_address=f'10.{i % 256}.{i // 256 % 256}.{i // 65536 % 256}',
+                    user_agent='Mozilla/5.0 (benchmark)',
+                    success=i % 7 != 0,
+                ))
+                if len(batch) == 10000:
+                    LoginHistory.objects.bulk_create(batch)
+                    batch = []
+            LoginHistory.objects.bulk_create(batch)
+            tracemalloc.start()
+            start = time.perf_counter()
+            exported = 0
+            size = 0
+            for chunk in stream(iter_login_history(user.id)):
+                exported += 1
+                size += len(chunk)
+            elapsed = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(f'chunks streamed: {exported} ({size / 1e6:.1f} MB)')
+        self.stdout.write(f'elapsed:         {elapsed:.1f}s ({rows / elapsed:.0f} rows/s)')
+        self.stdout.write(self.style.SUCCESS(f'peak memory:     {peak / 1e6:.2f} MB'))
+        if options['max_peak_mb'] is not None and peak / 1e6 > options['max_peak_mb']:
+            raise CommandError(f'Peak memory {peak / 1e6:.2f} MB is over the {options["max_peak_mb"]} MB ceiling')
@@ -0,0 +1,58 @@
+import random
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from authentication.anomaly import LoginAnomalyDetector
+
+AGENTS = (
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0 Safari/537.36',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 14_5) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.5 Safari/605.1.15',
+    'Mozilla/5.0 (iPhone; CPU iPhone OS 17_5 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Mobile/15E148',
+    'Mozilla/5.0 (X11; Linux x86_64; rv:127.0) Gecko/20100101 Firefox/127.0',
+    'Mozilla/5.0 (Linux; Android 14) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0 Mobile Safari/537.36',
+)
+
+
+class Command(BaseCommand):
+    help = 'Measure the per-login cost of new-device scoring against the configured cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logins', type=int, default=100_000)
+        parser.add_argument('--users', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        logins, users = options['logins'], options['users']
+        options_ = {**settings.LOGIN_ANOMALY_OPTIONS, 'key_prefix': f'login_fp_bench{random.randrange(10**9)}'}
+        detector = LoginAnomalyDetector(**options_)
+        rng = random.Random(0)
+
+        # Each user mostly logs in from a couple of home networks and devices
+        habits = {
+            user_id: ([f'10.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(256)}' for _ in range(2)],
+                      rng.sample(AGENTS, 2))
+            for user_id in range(users)
+        }
+        timings = []
+        alerts = 0
+        for i in range(logins):
+            user_id = rng.randrange(users)
+            networks, agents = habits[user_id]
+            if rng.random() < 0.01:
+                ip, agent = f'203.0.{rng.randrange(256)}.{rng.randrange(256)}', rng.choice(AGENTS)
+            else:
+                ip, agent = rng.choice(networks), rng.choice(agents)
+            start = time.perf_counter()
+            assessment = detector.check(user_id, ip, agent)
+            timings.append(time.perf_counter() - start)
+            alerts += assessment.alert
+
+        detector.cache.delete_many([detector.key(user_id) for user_id in range(users)])
+        timings.sort()
+        self.stdout.write(f'logins:  {logins} across {users} users ({alerts} alerts)')
+        self.stdout.write(f'cache:   {detector.cache_alias} ({type(detector.cache).__name__})')
+        self.stdout.write(self.style.SUCCESS(
+            f'per login: p50 {timings[len(timings) // 2] * 1e6:.1f} us  '
+            f'p99 {timings[int(len(timings) * 0.99)] * 1e6:.1f} us'
+        ))
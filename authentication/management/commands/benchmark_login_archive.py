@@ -0,0 +1,125 @@
+import random
+import shutil
+import tempfile
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import override_settings
+from django.utils import timezone
+
+from authentication.archive import archive_login_history, get_archive
+from authentication.history import iter_login_history
+from authentication.models import LoginHistory
+
+User = get_user_model()
+
+AGENTS = (
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0 Safari/537.36',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 14_5) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.5 Safari/605.1.15',
+    'Mozilla/5.0 (iPhone; CPU iPhone OS 17_5 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Mobile/15E148',
+)
+
+
+def table_bytes():
+    """Size of login_history and its indexes, where the database can tell"""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(
+                "SELECT SUM(pgsize) FROM dbstat WHERE name IN "
+                "(SELECT name FROM sqlite_master WHERE tbl_name = 'login_history')"
+            )
+        elif connection.vendor == 'postgresql':
+            cursor.execute("SELECT pg_total_relation_size('login_history')")
+        else:
+            return None
+        return cursor.fetchone()[0]
+
+
+def _mb(size):
+    return 'n/a' if size is None else f'{size / 1e6:.1f} MB'
+
+
+class Command(BaseCommand):
+    help = 'Compare table size and per-user history latency before and after archiving (rolled back)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=500_000)
+        parser.add_argument('--users', type=int, default=500)
+        parser.add_argument('--days', type=int, default=730, help='History spread over this many days')
+        parser.add_argument('--hot-days', type=int, default=180)
+        parser.add_argument('--samples', type=int, default=100)
+
+    def handle(self, *args, **options):
+        rng = random.Random(0)
+        directory = tempfile.mkdtemp(prefix='login-archive-bench-')
+        login_time = LoginHistory._meta.get_field('login_time')
+        try:
+            with override_settings(LOGIN_HISTORY_ARCHIVE_DIR=directory), transaction.atomic():
+                run = random.randrange(10**9)
+                users = User.objects.bulk_create([
+                    User(username=f'archive-bench-{run}-{i}', email=f'archive-bench-{run}-{i}@example.com')
+                    for i in range(options['users'])
+                ])
+                self.stdout.write(f'Inserting {options["rows"]} login history rows...')
+                now = timezone.now()
+                span = options['days'] * 86400
+                # Keep the generated timestamps instead of "now"
+                login_time.auto_now_add = False
+                try:
+                    batch = []
+                    for i in range(options['rows']):
+                        batch.append(LoginHistory(
+                            user=rng.choice(users),
+                            ip_address=f'10.{rng.randrange(4)}.{rng.randrange(256)}.{rng.randrange(256)}',
+                            user_agent=rng.choice(AGENTS),
+                            login_time=now - timedelta(seconds=rng.randrange(span)),
+                            success=rng.random() > 0.1,
+                        ))
+                        if len(batch) == 10000:
+                            LoginHistory.objects.bulk_create(batch)
+                            batch = []
+                    LoginHistory.objects.bulk_create(batch)
+                finally:
+                    login_time.auto_now_add = True
+
+                sample = [user.id for user in rng.sample(users, min(options['samples'], len(users)))]
+                before_bytes = table_bytes()
+                before = self._latency(sample)
+
+                start = time.perf_counter()
+                moved = archive_login_history(options['hot_days'])
+                archive_seconds = time.perf_counter() - start
+
+                after_bytes = table_bytes()
+                after = self._latency(sample)
+                archive_bytes = get_archive().size()
+                transaction.set_rollback(True)
+        finally:
+            get_archive().close()
+            shutil.rmtree(directory, ignore_errors=True)
+
+        self.stdout.write(f'archived:        {moved} rows in {archive_seconds:.1f}s')
+        self.stdout.write(f'table+indexes:   {_mb(before_bytes)} -> {_mb(after_bytes)}')
+        self.stdout.write(f'archive files:   {_mb(archive_bytes)}')
+        self.stdout.write(f'{"per-user history":<16} {"p50 ms":>8} {"p99 ms":>8}')
+        for label, timings in (('table only', before), ('table+archive', after)):
+            self.stdout.write(
+                f'{label:<16} {timings[len(timings) // 2] * 1e3:>8.1f} '
+                f'{timings[int(len(timings) * 0.99)] * 1e3:>8.1f}'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'{moved} rows in {_mb(archive_bytes)} of segments '
+            f'({archive_bytes / max(moved, 1):.1f} bytes/row)'
+        ))
+
+    def _latency(self, user_ids):
+        timings = []
+        for user_id in user_ids:
+            start = time.perf_counter()
+            for _ in iter_login_history(user_id):
+                pass
+            timings.append(time.perf_counter() - start)
+        return sorted(timings)
@@ -0,0 +1,92 @@
+import uuid
+from contextlib import ExitStack
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+from django.test import RequestFactory, override_settings
+
+from authentication.tasks import log_login_attempt, send_welcome_email, send_security_alert
+from authentication.views import LoginView
+
+User = get_user_model()
+
+WRITE_PREFIXES = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+
+class Command(BaseCommand):
+    help = 'Count database writes (including Celery result rows) caused by one login'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logins', type=int, default=20)
+        parser.add_argument(
+            '--store-all-results', action='store_true',
+            help='Store results for every task, i.e. the behaviour before the per-task policy',
+        )
+
+    def handle(self, *args, **options):
+        tasks = (log_login_attempt, send_welcome_email, send_security_alert)
+        saved_policy = [(task, task.ignore_result, task.store_eager_result) for task in tasks]
+        saved_throttles = LoginView.throttle_classes
+
+        # Run tasks in-process and let eager results hit the result backend
+        # exactly like a worker would, so the count covers both sides. The
+        # Celery app reads CELERY_* settings live (the prefixed names win over
+        # app.conf attributes); store_eager_result is copied onto each task.
+        eager = override_settings(CELERY_TASK_ALWAYS_EAGER=True)
+        LoginView.throttle_classes = []
+        for task in tasks:
+            task.store_eager_result = True
+        if options['store_all_results']:
+            for task in tasks:
+                task.ignore_result = False
+
+        try:
+            with eager:
+                writes = self._measure(options['logins'])
+        finally:
+            LoginView.throttle_classes = saved_throttles
+            for task, ignore, store_eager in saved_policy:
+                task.ignore_result = ignore
+                task.store_eager_result = store_eager
+
+        logins = options['logins']
+        total = sum(writes.values())
+        self.stdout.write(f'logins:            {logins}')
+        for table, count in sorted(writes.items()):
+            self.stdout.write(f'  {table:<34} {count / logins:.2f} writes/login')
+        self.stdout.write(self.style.SUCCESS(f'total:             {total / logins:.2f} writes/login'))
+
+    def _measure(self, logins):
+        writes = {}
+
+        def count_writes(execute, sql, params, many, context):
+            statement = sql.lstrip().upper()
+            if statement.startswith(WRITE_PREFIXES):
+                words = statement.split()
+                # INSERT INTO t / DELETE FROM t / UPDATE t
+                table = (words[1] if words[0] == 'UPDATE' else words[2]).strip('"`').lower()
+                writes[table] = writes.get(table, 0) + 1
+            return execute(sql, params, many, context)
+
+        factory = RequestFactory()
+        view = LoginView.as_view()
+        with transaction.atomic():
+            password = uuid.uuid4().hex
+            user = User.objects.create_user(
+                username=f'bench-{uuid.uuid4().hex[:8]}',
+                email=f'bench-{uuid.uuid4().hex[:8]}@example.com',
+                password=password,
+            )
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(count_writes))
+                for _ in range(logins):
+                    request = factory.post(
+                        '/api/auth/login/',
+                        {'email': user.email, 'password': password},
+                        content_type='application/json',
+                    )
+                    view(request)
+            transaction.set_rollback(True)
+        return writes
@@ -0,0 +1,74 @@
+import asyncio
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+
+from authentication import sse
+from authentication.events import InProcessBroker
+
+
+class Command(BaseCommand):
+    help = 'Hold N simulated SSE connections in one process and measure memory and fan-out latency'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--connections', type=int, default=5000)
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--events', type=int, default=200)
+
+    def handle(self, *args, **options):
+        asyncio.run(self._run(options['connections'], options['users'], options['events']))
+
+    async def _run(self, connections, users, events):
+        broker = InProcessBroker()
+        sse.get_broker = lambda: broker
+        app = sse.SecurityEventsApp(None)
+
+        async def authenticate(scope, headers):
+            # Token checks are per connect, not per event; skip them here
+            return scope['user_id']
+        app._authenticate = authenticate
+
+        closing = asyncio.Event()
+        delivered = asyncio.Queue()
+
+        async def receive():
+            await closing.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            if message.get('body', b'').startswith(b'event:'):
+                delivered.put_nowait(time.perf_counter())
+
+        tracemalloc.start()
+        before, _ = tracemalloc.get_traced_memory()
+        tasks = [
+            asyncio.create_task(app(
+                {'type': 'http', 'path': app.path, 'method': 'GET', 'headers': [], 'user_id': i % users},
+                receive, send,
+            ))
+            for i in range(connections)
+        ]
+        while broker.subscriber_count() < connections:
+            await asyncio.sleep(0.01)
+        after, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        per_user = connections // users
+        latencies = []
+        for i in range(events):
+            start = time.perf_counter()
+            broker.publish(i % users, {'type': 'login', 'ip_address': '10.0.0.1'})
+            for _ in range(per_user):
+                latencies.append(await delivered.get() - start)
+
+        closing.set()
+        await asyncio.gather(*tasks)
+
+        latencies.sort()
+        self.stdout.write(f'connections:      {connections} ({per_user} per user)')
+        self.stdout.write(f'memory:           {(after - before) / connections / 1024:.1f} KiB per connection')
+        self.stdout.write(f'fan-out p50:      {latencies[len(latencies) // 2] * 1e6:.0f} us')
+        self.stdout.write(self.style.SUCCESS(
+            f'fan-out p99:      {latencies[int(len(latencies) * 0.99)] * 1e6:.0f} us'
+        ))
@@ -0,0 +1,69 @@
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import RequestFactory
+from rest_framework.renderers import JSONRenderer
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from authentication.serializers import UserSerializer, user_representation
+from backend.renderers import ORJSONRenderer
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Compare DRF default serialization/rendering with the compiled User path and orjson'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20000)
+
+    def handle(self, *args, **options):
+        n = options['iterations']
+        with transaction.atomic():
+            user = User.objects.create_user(
+                username=f'bench-{uuid.uuid4().hex[:8]}',
+                email=f'bench-{uuid.uuid4().hex[:8]}@example.com',
+                first_name='Zoë', last_name='Ñúñez',
+            )
+            refresh = RefreshToken.for_user(user)
+            tokens = {'access': str(refresh.access_token), 'refresh': str(refresh)}
+            request = RequestFactory().get('/api/auth/profile/', HTTP_HOST='localhost')
+
+            endpoints = {
+                'login': (
+                    lambda: {**tokens, 'user': UserSerializer(user).data, 'requires_2fa': False},
+                    lambda: {**tokens, 'user': user_representation.to_representation(user), 'requires_2fa': False},
+                ),
+                '2fa verify': (
+                    lambda: {**tokens, 'user': UserSerializer(user).data},
+                    lambda: {**tokens, 'user': user_representation.to_representation(user)},
+                ),
+                'profile': (
+                    lambda: UserSerializer(user, context={'request': request}).data,
+                    lambda: user_representation.to_representation(user, request),
+                ),
+            }
+
+            default_renderer = JSONRenderer()
+            fast_renderer = ORJSONRenderer()
+            for name, (default_payload, fast_payload) in endpoints.items():
+                expected = default_renderer.render(default_payload())
+                actual = fast_renderer.render(fast_payload())
+                default_time = self._time(lambda: default_renderer.render(default_payload()), n)
+                fast_time = self._time(lambda: fast_renderer.render(fast_payload()), n)
+                self.stdout.write(
+                    f'{name:<11} default {default_time / n * 1e6:6.1f} us   '
+                    f'fast {fast_time / n * 1e6:6.1f} us   '
+                    f'x{default_time / fast_time:.1f}   '
+                    f'identical: {"yes" if expected == actual else "NO"}'
+                )
+            transaction.set_rollback(True)
+
+    def _time(self, func, n):
+        start = time.perf_counter()
+        for _ in range(n):
+            func()
+        return time.perf_counter() - start
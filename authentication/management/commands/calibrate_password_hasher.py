@@ -0,0 +1,137 @@
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import (
+    Argon2PasswordHasher, BCryptPasswordHasher, BCryptSHA256PasswordHasher, PBKDF2PasswordHasher,
+    PBKDF2SHA1PasswordHasher, ScryptPasswordHasher, get_hashers, identify_hasher,
+)
+from django.core.management.base import BaseCommand
+
+User = get_user_model()
+
+# Cost parameter per algorithm and how runtime scales with it
+COST_PARAMETERS = {
+    'pbkdf2_sha256': ('iterations', 'linear'),
+    'pbkdf2_sha1': ('iterations', 'linear'),
+    'argon2': ('time_cost', 'linear'),
+    'scrypt': ('work_factor', 'power_of_two'),
+    'bcrypt_sha256': ('rounds', 'log2'),
+    'bcrypt': ('rounds', 'log2'),
+}
+# Never recommend less than Django's own defaults, whatever the hardware
+MINIMUMS = {
+    'pbkdf2_sha256': PBKDF2PasswordHasher.iterations,
+    'pbkdf2_sha1': PBKDF2SHA1PasswordHasher.iterations,
+    'argon2': Argon2PasswordHasher.time_cost,
+    'scrypt': ScryptPasswordHasher.work_factor,
+    'bcrypt_sha256': BCryptSHA256PasswordHasher.rounds,
+    'bcrypt': BCryptPasswordHasher.rounds,
+}
+SETTINGS = {
+    'authentication.hashers.TunedPBKDF2PasswordHasher': 'PASSWORD_PBKDF2_ITERATIONS',
+}
+
+
+def recommend(value, scaling, ratio, minimum=0):
+    """Largest cost whose runtime is ``ratio`` times the measured one, but at least ``minimum``"""
+    if scaling == 'linear':
+        step = 10_000 if value >= 100_000 else 1
+        cost = max(step, int(value * ratio) // step * step)
+    elif scaling == 'power_of_two':
+        cost = 2 ** max(1, int(math.log2(value * ratio)))
+    else:
+        cost = max(4, value + math.floor(math.log2(ratio)))
+    return max(cost, minimum)
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the configured PASSWORD_HASHERS on this machine and recommend cost settings for a p99 target'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target-ms', type=float, default=250, help='p99 budget for one password check')
+        parser.add_argument('--samples', type=int, default=30)
+        parser.add_argument(
+            '--concurrency', type=int, default=1,
+            help='Parallel hashes, e.g. the number of web workers per machine',
+        )
+
+    def handle(self, *args, **options):
+        target = options['target_ms'] / 1000
+        self.stdout.write(
+            f'target p99 {options["target_ms"]:.0f} ms, {options["samples"]} samples, '
+            f'concurrency {options["concurrency"]}\n'
+        )
+        self.stdout.write(f'  {"hasher":<24} {"parameter":<22} {"p50 ms":>8} {"p99 ms":>8}  recommended')
+
+        env = []
+        for hasher in get_hashers():
+            parameter, scaling = COST_PARAMETERS.get(hasher.algorithm, (None, None))
+            if parameter is None:
+                continue
+            try:
+                p50, p99 = self._measure(hasher, options['samples'], options['concurrency'])
+            except ValueError as e:
+                # Library (argon2-cffi, bcrypt) not installed
+                self.stdout.write(f'  {hasher.algorithm:<24} skipped: {e}')
+                continue
+
+            value = getattr(hasher, parameter)
+            minimum = MINIMUMS[hasher.algorithm]
+            suggested = recommend(value, scaling, target / p99, minimum)
+            # Runtime isn't exactly proportional (memory, caches); re-measure and back off
+            for _ in range(3):
+                settings_ = {parameter: suggested}
+                if hasher.algorithm == 'scrypt':
+                    # scrypt needs 128 * block_size * work_factor bytes; OpenSSL caps it at 32 MiB by default
+                    settings_['maxmem'] = max(hasher.maxmem, 2 * 128 * hasher.block_size * suggested)
+                probe = type('Probe', (type(hasher),), settings_)()
+                _, check_p99 = self._measure(probe, options['samples'], options['concurrency'])
+                lower = recommend(suggested, scaling, target / check_p99, minimum)
+                if check_p99 <= target or lower >= suggested:
+                    break
+                suggested = lower
+            self.stdout.write(
+                f'  {hasher.algorithm:<24} {f"{parameter}={value}":<22} {p50 * 1e3:>8.1f} {p99 * 1e3:>8.1f}  '
+                f'{", ".join(f"{k}={v}" for k, v in settings_.items())} (p99 {check_p99 * 1e3:.1f} ms)'
+            )
+            if check_p99 > target and suggested == minimum:
+                self.stdout.write(self.style.WARNING(
+                    f'  {hasher.algorithm}: Django\'s minimum {parameter}={minimum} is over the target; '
+                    f'raise --target-ms or add CPU rather than lowering the cost'
+                ))
+            path = f'{type(hasher).__module__}.{type(hasher).__qualname__}'
+            if path in SETTINGS:
+                env.append(f'{SETTINGS[path]}={suggested}')
+
+        self.stdout.write('')
+        self._report_current_hashes()
+        for line in env:
+            self.stdout.write(self.style.SUCCESS(line))
+
+    def _measure(self, hasher, samples, concurrency):
+        def one(_):
+            salt = hasher.salt()
+            start = time.perf_counter()
+            hasher.encode('correct horse battery staple', salt)
+            return time.perf_counter() - start
+
+        one(None)
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            timings = sorted(pool.map(one, range(samples)))
+        return timings[len(timings) // 2], timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+
+    def _report_current_hashes(self):
+        """How many users still have hashes that will be upgraded on login"""
+        preferred = get_hashers()[0]
+        total = stale = 0
+        for encoded in User.objects.values_list('password', flat=True).iterator(chunk_size=5000):
+            try:
+                hasher = identify_hasher(encoded)
+            except ValueError:
+                # Unusable password (e.g. Google-only accounts)
+                continue
+            total += 1
+            stale += hasher.algorithm != preferred.algorithm or preferred.must_update(encoded)
+        self.stdout.write(f'{stale} of {total} password hashes will be upgraded on their next login')
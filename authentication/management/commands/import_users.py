@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from authentication.bulk_import import UserImporter
+
+
+class Command(BaseCommand):
+    help = 'Bulk import users from a CSV or NDJSON file (email, username, password, first_name, last_name)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--workers', type=int, default=None, help='Password hashing processes (default: CPU count)')
+        parser.add_argument('--restart', action='store_true', help='Ignore the saved checkpoint and start from the first row')
+
+    def handle(self, *args, **options):
+        start = time.monotonic()
+
+        def report(state):
+            rate = state['rows_done'] / max(time.monotonic() - start, 1e-6)
+            self.stdout.write(
+                f"rows {state['rows_done']}  created {state['created']}  "
+                f"skipped {state['skipped']}  ({rate:.0f} rows/s)"
+            )
+
+        importer = UserImporter(
+            options['path'],
+            chunk_size=options['chunk_size'],
+            workers=options['workers'],
+            progress=report,
+        )
+        try:
+            state = importer.run(resume=not options['restart'])
+        except FileNotFoundError as e:
+            raise CommandError(str(e))
+        if state is None:
+            raise CommandError('This file is being imported by another process or has already been imported')
+
+        for error in state['errors']:
+            self.stdout.write(self.style.WARNING(f"row {error['row']}: {error['error']}"))
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {state['created']} users, skipped {state['skipped']} "
+            f"in {time.monotonic() - start:.1f}s"
+        ))
@@ -3,12 +3,15 @@ from django.contrib.auth.models import AbstractUser
 from django.utils import timezone
 import pyotp
 
+from backend.images import srcset
+
 
 class User(AbstractUser):
     """Extended User model with 2FA support"""
     email = models.EmailField(unique=True)
     phone_number = models.CharField(max_length=20, blank=True, null=True)
     profile_picture = models.ImageField(upload_to='profile_pics/', blank=True, null=True)
+    profile_picture_variants = models.JSONField(default=dict, blank=True, editable=False)
     
     # 2FA Fields
     two_factor_enabled = models.BooleanField(default=False)
@@ -37,6 +40,10 @@ class User(AbstractUser):
     def __str__(self):
         return self.email
     
+    @property
+    def profile_picture_srcset(self):
+        return srcset(self.profile_picture_variants)
+    
     def generate_2fa_secret(self):
         """Generate a new 2FA secret"""
         if not self.two_factor_secret:
@@ -60,7 +67,7 @@ class User(AbstractUser):
                 # Unlock account if lock period has expired
                 self.account_locked_until = None
                 self.login_attempts = 0
-                self.save()
+                self.save(update_fields=['account_locked_until', 'login_attempts'])
         return False
     
     def increment_login_attempts(self):
@@ -72,14 +79,14 @@ class User(AbstractUser):
         if self.login_attempts >= 3:
             self.account_locked_until = timezone.now() + timezone.timedelta(minutes=30)
         
-        self.save()
+        self.save(update_fields=['login_attempts', 'last_login_attempt', 'account_locked_until'])
     
     def reset_login_attempts(self):
         """Reset login attempts after successful login"""
         self.login_attempts = 0
         self.last_login_attempt = None
         self.account_locked_until = None
-        self.save()
+        self.save(update_fields=['login_attempts', 'last_login_attempt', 'account_locked_until'])
 
 
 class LoginHistory(models.Model):
@@ -95,6 +102,9 @@ class LoginHistory(models.Model):
         verbose_name = 'Login History'
         verbose_name_plural = 'Login Histories'
         ordering = ['-login_time']
+        indexes = [
+            models.Index(fields=['user', '-login_time'], name='login_history_user_time_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.email} - {self.login_time}"
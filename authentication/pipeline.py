@@ -0,0 +1,140 @@
+"""
+social_django pipeline steps for Google sign-in.
+
+These steps replace the default ``social_user`` / ``get_username`` /
+``create_user`` / ``associate_user`` / ``load_extra_data`` / ``user_details``
+chain. The Google account is resolved through the unique ``User.google_id``
+index, so there is no ``UserSocialAuth`` row. A returning user costs a
+single indexed lookup, and profile fields are only written when Google
+reports a change. The last step issues the same JWT pair as ``LoginView``
+and hands it to the frontend in the URL fragment.
+"""
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import IntegrityError, transaction
+from django.shortcuts import redirect
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+from social_core.exceptions import AuthException
+
+from .anomaly import check_login
+from .availability import mark_taken
+from .challenge import issue_challenge
+from .events import publish_security_event
+from .models import LoginHistory
+from .serializers import user_representation
+from .tasks import log_login_attempt
+
+User = get_user_model()
+
+SYNCED_FIELDS = ('first_name', 'last_name')
+
+
+def _username_for(email, uid, full=False):
+    local = email.split('@', 1)[0][:100]
+    return f'{local}_{uid if full else uid[-8:]}'[:150]
+
+
+class GoogleSignInForbidden(AuthException):
+    """Unverified email, disabled account, or an email linked to another Google account"""
+
+    # AuthForbidden isn't in every social-auth-core release; AuthException is
+    def __str__(self):
+        return "Your credentials aren't allowed"
+
+
+def _create(uid, email, details):
+    """Insert the Google user; None if an account with ``email`` appeared meanwhile"""
+    for full_uid in (False, True):
+        try:
+            with transaction.atomic():
+                User.objects.bulk_create([User(
+                    email=email,
+                    username=_username_for(email, uid, full_uid),
+                    google_id=uid,
+                    password=make_password(None),
+                    **{field: details.get(field) or '' for field in SYNCED_FIELDS},
+                )])
+            return User.objects.get(google_id=uid)
+        except IntegrityError:
+            if User.objects.filter(email=email).exists():
+                return None
+            # Username taken by someone else; the full uid is unique
+            if full_uid:
+                raise
+
+
+def _link(uid, email):
+    """Attach ``uid`` to the account with ``email``, unless another Google account holds it"""
+    User.objects.filter(email=email, google_id__isnull=True).update(google_id=uid)
+    return User.objects.filter(email=email, google_id=uid).first()
+
+
+def upsert_google_user(backend, uid, details, response, *args, **kwargs):
+    """Resolve the user by ``google_id``, creating or linking the account on first sign-in"""
+    email = (details.get('email') or '').strip().lower()
+    # Linking by email hands over an existing account, so the claim must be explicit
+    if not email or response.get('email_verified', False) is not True:
+        raise GoogleSignInForbidden(backend)
+
+    user = User.objects.filter(google_id=uid).first()
+    is_new = user is None
+    if is_new:
+        # Emails are unique as stored; link to an existing account whatever its case
+        existing = User.objects.filter(email__iexact=email).values_list('email', flat=True).first()
+        if existing is None:
+            user = _create(uid, email, details)
+        if user is None:
+            user = _link(uid, existing or email)
+        if user is None:
+            # Never move an account from one Google identity to another
+            raise GoogleSignInForbidden(backend)
+        mark_taken(emails=[user.email], usernames=[user.username])
+
+    if not user.is_active:
+        raise GoogleSignInForbidden(backend)
+
+    changed = {
+        field: details[field] for field in SYNCED_FIELDS
+        if details.get(field) and details[field] != getattr(user, field)
+    }
+    if changed:
+        changed['updated_at'] = timezone.now()
+        User.objects.filter(pk=user.pk).update(**changed)
+        for field, value in changed.items():
+            setattr(user, field, value)
+
+    return {'user': user, 'is_new': is_new}
+
+
+def issue_jwt(backend, user, *args, **kwargs):
+    """Finish the login like ``LoginView`` and redirect to the frontend with the tokens"""
+    from .views import get_client_ip
+
+    request = backend.strategy.request
+    target = settings.SOCIAL_AUTH_JWT_REDIRECT_URL
+
+    if user.is_account_locked():
+        return redirect(f"{target}#{urlencode({'error': 'account_locked'})}")
+
+    if user.two_factor_enabled:
+        challenge = issue_challenge(user, user_representation.to_representation(user))
+        return redirect(f"{target}#{urlencode({'requires_2fa': 'true', 'challenge': challenge})}")
+
+    refresh = RefreshToken.for_user(user)
+    ip_address = get_client_ip(request)
+    user_agent = request.META.get('HTTP_USER_AGENT', '')
+
+    LoginHistory.objects.create(user=user, ip_address=ip_address, user_agent=user_agent, success=True)
+    now = timezone.now()
+    User.objects.filter(pk=user.pk).update(last_login=now)
+    user.last_login = now
+
+    log_login_attempt.delay(user.id, True, ip_address)
+    publish_security_event(user.id, 'login', ip_address=ip_address, user_agent=user_agent, method='google')
+    check_login(user, ip_address, user_agent)
+
+    return redirect(f"{target}#{urlencode({'access': str(refresh.access_token), 'refresh': str(refresh)})}")
@@ -1,6 +1,11 @@
 from rest_framework import serializers
+from rest_framework.relations import PKOnlyObject
+from rest_framework.settings import api_settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
+from django.db import IntegrityError, transaction
+from backend.fields import ImageVariantsField
+from .availability import is_available, unique_message
 import pyotp
 import qrcode
 import io
@@ -11,14 +16,77 @@ User = get_user_model()
 
 class UserSerializer(serializers.ModelSerializer):
     """Serializer for User model"""
+    profile_picture_srcset = ImageVariantsField(source='profile_picture_variants')
+    
     class Meta:
         model = User
         fields = ('id', 'username', 'email', 'first_name', 'last_name', 
-                  'phone_number', 'profile_picture', 'two_factor_enabled',
-                  'created_at', 'updated_at')
+                  'phone_number', 'profile_picture', 'profile_picture_srcset',
+                  'two_factor_enabled', 'created_at', 'updated_at')
         read_only_fields = ('id', 'created_at', 'updated_at')
 
 
+class CompiledReadSerializer:
+    """
+    Read-only fast path for a serializer class.
+
+    The field plan (source attributes and representation functions) is
+    resolved once from the serializer's fields, so each call is a plain loop
+    instead of building a serializer and its fields per instance. Output is
+    identical to ``serializer_class(instance, context=...).data``.
+    """
+    def __init__(self, serializer_class):
+        self.serializer_class = serializer_class
+        self._plan = None
+    
+    def _compile(self):
+        plan = []
+        for field in self.serializer_class().fields.values():
+            if field.write_only:
+                continue
+            if isinstance(field, serializers.FileField):
+                use_url = getattr(field, 'use_url', api_settings.UPLOADED_FILES_USE_URL)
+                to_representation = self._file_representation(use_url)
+            else:
+                to_representation = self._context_free(field.to_representation)
+            plan.append((field.field_name, field.get_attribute, to_representation))
+        return plan
+    
+    @staticmethod
+    def _context_free(to_representation):
+        return lambda value, request: to_representation(value)
+    
+    @staticmethod
+    def _file_representation(use_url):
+        # FileField/ImageField are the only fields that depend on the request
+        def to_representation(value, request):
+            if not value:
+                return None
+            if not use_url:
+                return value.name
+            try:
+                url = value.url
+            except AttributeError:
+                return None
+            return request.build_absolute_uri(url) if request is not None else url
+        return to_representation
+    
+    def to_representation(self, instance, request=None):
+        if self._plan is None:
+            self._plan = self._compile()
+        data = {}
+        for name, get_attribute, to_representation in self._plan:
+            # DRF's lookup: calls callables, maps a missing related object to
+            # None/default or skips the field, exactly like Serializer does
+            try:
+                value = get_attribute(instance)
+            except serializers.SkipField:
+                continue
+            check_for_none = value.pk if isinstance(value, PKOnlyObject) else value
+            data[name] = None if check_for_none is None else to_representation(value, request)
+        return data
+
+
 class RegisterSerializer(serializers.ModelSerializer):
     """Serializer for user registration"""
     password = serializers.CharField(write_only=True, required=True, validators=[validate_password])
@@ -27,6 +95,22 @@ class RegisterSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ('username', 'email', 'password', 'password2', 'first_name', 'last_name')
+        # Uniqueness goes through the availability filter instead of a
+        # UniqueValidator query per field; the unique indexes have the last word
+        extra_kwargs = {
+            'username': {'validators': [User.username_validator]},
+            'email': {'validators': []},
+        }
+    
+    def validate_username(self, value):
+        if not is_available('username', value):
+            raise serializers.ValidationError(unique_message('username'))
+        return value
+    
+    def validate_email(self, value):
+        if not is_available('email', value):
+            raise serializers.ValidationError(unique_message('email'))
+        return value
     
     def validate(self, attrs):
         if attrs['password'] != attrs['password2']:
@@ -35,10 +119,25 @@ class RegisterSerializer(serializers.ModelSerializer):
     
     def create(self, validated_data):
         validated_data.pop('password2')
-        user = User.objects.create_user(**validated_data)
+        try:
+            with transaction.atomic():
+                user = User.objects.create_user(**validated_data)
+        except IntegrityError:
+            # Taken between validation and insert
+            errors = {
+                field: [unique_message(field)]
+                for field in ('username', 'email')
+                if User.objects.filter(**{field: validated_data[field]}).exists()
+            }
+            if not errors:
+                raise
+            raise serializers.ValidationError(errors)
         return user
 
 
+user_representation = CompiledReadSerializer(UserSerializer)
+
+
 class LoginSerializer(serializers.Serializer):
     """Serializer for user login"""
     email = serializers.EmailField(required=True)
@@ -76,6 +175,7 @@ class TwoFactorSetupSerializer(serializers.Serializer):
 class TwoFactorVerifySerializer(serializers.Serializer):
     """Serializer for 2FA token verification"""
     token = serializers.CharField(required=True, max_length=6, min_length=6)
+    challenge = serializers.CharField(required=False, help_text='Challenge returned by login when 2FA is required')
     
     def validate_token(self, value):
         if not value.isdigit():
@@ -0,0 +1,52 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from backend.images import needs_variants
+from .anomaly import get_detector
+from .availability import mark_taken
+from .models import User
+from .tasks import generate_profile_picture_variants, purge_archived_login_history
+
+
+@receiver(post_save, sender=User)
+def queue_profile_picture_variants(sender, instance, **kwargs):
+    """Build image variants once per uploaded profile picture"""
+    if needs_variants(instance.profile_picture, instance.profile_picture_variants):
+        user_id = instance.pk
+        transaction.on_commit(lambda: generate_profile_picture_variants.delay(user_id))
+    elif not instance.profile_picture and instance.profile_picture_variants:
+        instance.profile_picture_variants = {}
+        User.objects.filter(pk=instance.pk).update(profile_picture_variants={})
+
+
+@receiver(post_init, sender=User)
+def remember_names(sender, instance, **kwargs):
+    """Loaded email/username, so saves can tell whether they changed"""
+    # __dict__ so deferred fields aren't fetched
+    instance._saved_names = (instance.__dict__.get('email'), instance.__dict__.get('username'))
+
+
+@receiver(post_save, sender=User)
+def record_taken_names(sender, instance, created, update_fields=None, **kwargs):
+    """Keep availability checks right until the next filter rebuild"""
+    if update_fields is not None and not {'email', 'username'} & set(update_fields):
+        return
+    names = (instance.email, instance.username)
+    if created or names != instance._saved_names:
+        mark_taken(emails=[instance.email], usernames=[instance.username])
+        instance._saved_names = names
+
+
+@receiver(post_delete, sender=User)
+def purge_archived_history(sender, instance, **kwargs):
+    """The CASCADE only reaches table rows; archived ones are rewritten out"""
+    user_id = instance.pk
+    transaction.on_commit(lambda: purge_archived_login_history.delay(user_id))
+
+
+@receiver(post_delete, sender=User)
+def forget_login_fingerprints(sender, instance, **kwargs):
+    """Profiles have no TTL, so they go with the user"""
+    user_id = instance.pk
+    transaction.on_commit(lambda: get_detector().forget(user_id))
@@ -0,0 +1,163 @@
+"""
+Server-Sent Events stream of the authenticated user's security events.
+
+This is a raw ASGI app mounted in ``backend/asgi.py`` in front of Django, so
+an open stream costs one coroutine and one queue. It doesn't hold a thread,
+run the middleware stack or make database queries while idle.
+
+``EventSource`` can't set headers, and a JWT in the query string ends up in
+proxy and access logs, so browsers first ``POST /api/auth/events/ticket/`` with
+their JWT and connect with ``?ticket=``. A ticket is a random key in the
+default cache that is deleted on first use and expires after
+``SECURITY_EVENTS_TICKET_SECONDS``; set ``CACHE_URL`` so the process serving
+the stream sees tickets issued by the others. Clients that can set headers may
+send ``Authorization: Bearer`` instead. Either way the user is looked up with a
+single query at connect.
+"""
+import asyncio
+import json
+import secrets
+from urllib.parse import parse_qs
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .events import get_broker
+
+User = get_user_model()
+
+HEARTBEAT = b': keepalive\n\n'
+
+
+def format_event(event):
+    return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n".encode()
+
+
+def _ticket_key(ticket):
+    return f'sse:ticket:{ticket}'
+
+
+def issue_stream_ticket(user_id):
+    """Single-use key that opens one stream for ``user_id``"""
+    ticket = secrets.token_urlsafe(32)
+    cache.set(_ticket_key(ticket), user_id, settings.SECURITY_EVENTS_TICKET_SECONDS)
+    return ticket
+
+
+async def redeem_stream_ticket(ticket):
+    """User id for a live ticket, or None; only one caller ever gets it"""
+    key = _ticket_key(ticket)
+    user_id = await cache.aget(key)
+    # delete() reports whether the key was still there, so of two concurrent
+    # connects with the same ticket exactly one wins
+    if user_id is None or not await cache.adelete(key):
+        return None
+    return user_id
+
+
+class SecurityEventsApp:
+    """Serve ``path`` as an SSE stream and pass everything else to ``app``"""
+
+    def __init__(self, app, path='/api/auth/events/'):
+        self.app = app
+        self.path = path
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['path'] != self.path:
+            return await self.app(scope, receive, send)
+
+        headers = dict(scope['headers'])
+        cors_headers = self._cors_headers(headers)
+        if scope['method'] != 'GET':
+            return await self._error(send, 405, 'Method not allowed', cors_headers)
+
+        user_id = await self._authenticate(scope, headers)
+        if user_id is None:
+            return await self._error(send, 401, 'Authentication required', cors_headers)
+
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream'),
+                (b'cache-control', b'no-cache'),
+                (b'x-accel-buffering', b'no'),
+                *cors_headers,
+            ],
+        })
+        retry_ms = settings.SECURITY_EVENTS_RETRY_MS
+        await send({'type': 'http.response.body', 'body': f'retry: {retry_ms}\n\n'.encode(), 'more_body': True})
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.SECURITY_EVENTS_MAX_AGE
+        disconnected = loop.create_task(self._wait_for_disconnect(receive))
+        async with get_broker().subscribe(user_id) as queue:
+            try:
+                while not disconnected.done() and loop.time() < deadline:
+                    next_event = loop.create_task(queue.get())
+                    done, _ = await asyncio.wait(
+                        {next_event, disconnected},
+                        timeout=settings.SECURITY_EVENTS_HEARTBEAT,
+                        return_when=asyncio.FIRST_COMPLETED,
+                    )
+                    if next_event in done:
+                        body = format_event(next_event.result())
+                    else:
+                        next_event.cancel()
+                        body = HEARTBEAT
+                    if not disconnected.done():
+                        await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+            finally:
+                client_gone = disconnected.done()
+                disconnected.cancel()
+
+        if not client_gone:
+            # Streams are capped at SECURITY_EVENTS_MAX_AGE; EventSource reconnects
+            await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+
+    async def _wait_for_disconnect(self, receive):
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+    async def _authenticate(self, scope, headers):
+        authorization = headers.get(b'authorization', b'').decode('latin-1')
+        if authorization.startswith('Bearer '):
+            try:
+                user_id = AccessToken(authorization[len('Bearer '):])[jwt_settings.USER_ID_CLAIM]
+            except (TokenError, KeyError):
+                return None
+            lookup = {jwt_settings.USER_ID_FIELD: user_id}
+        else:
+            ticket = parse_qs(scope.get('query_string', b'').decode()).get('ticket', [None])[0]
+            user_id = await redeem_stream_ticket(ticket) if ticket else None
+            if user_id is None:
+                return None
+            lookup = {'pk': user_id}
+
+        # The only query for the lifetime of the connection. Return the pk from
+        # the database: the claim is a string in newer simplejwt releases, but
+        # events are published under the integer id
+        return await User.objects.filter(**lookup, is_active=True).values_list('pk', flat=True).afirst()
+
+    def _cors_headers(self, headers):
+        origin = headers.get(b'origin', b'').decode('latin-1')
+        if origin and origin in settings.CORS_ALLOWED_ORIGINS:
+            return [
+                (b'access-control-allow-origin', origin.encode('latin-1')),
+                (b'access-control-allow-credentials', b'true'),
+                (b'vary', b'Origin'),
+            ]
+        return []
+
+    async def _error(self, send, status, message, extra_headers):
+        body = json.dumps({'error': message}).encode()
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(b'content-type', b'application/json'), *extra_headers],
+        })
+        await send({'type': 'http.response.body', 'body': body})
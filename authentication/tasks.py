@@ -1,18 +1,17 @@
 from celery import shared_task
-from django.core.mail import send_mail
+from django.core.mail import send_mail, send_mass_mail
 from django.conf import settings
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
 
 
-@shared_task
-def send_welcome_email(user_id):
-    """Send welcome email to new user"""
-    try:
-        user = User.objects.get(id=user_id)
-        subject = 'Welcome to Oursfolio Portfolio!'
-        message = f"""
+WELCOME_SUBJECT = 'Welcome to Oursfolio Portfolio!'
+
+
+def welcome_message(user):
+    """Body of the welcome email"""
+    return f"""
         Hi {user.first_name or user.username},
         
         Welcome to Oursfolio Portfolio!
@@ -22,10 +21,17 @@ def send_welcome_email(user_id):
         Best regards,
         The Oursfolio Team
         """
+
+
+@shared_task(ignore_result=True)
+def send_welcome_email(user_id):
+    """Send welcome email to new user"""
+    try:
+        user = User.objects.get(id=user_id)
         
         send_mail(
-            subject,
-            message,
+            WELCOME_SUBJECT,
+            welcome_message(user),
             settings.DEFAULT_FROM_EMAIL,
             [user.email],
             fail_silently=False,
@@ -38,7 +44,34 @@ def send_welcome_email(user_id):
         return f"Error sending email: {str(e)}"
 
 
-@shared_task
+@shared_task(ignore_result=True)
+def send_welcome_emails(user_ids):
+    """Send welcome emails to a batch of users over a single connection"""
+    users = User.objects.filter(id__in=user_ids).only('email', 'username', 'first_name')
+    messages = [
+        (WELCOME_SUBJECT, welcome_message(user), settings.DEFAULT_FROM_EMAIL, [user.email])
+        for user in users
+    ]
+    sent = send_mass_mail(messages, fail_silently=False)
+    return f"Welcome emails sent to {sent} users"
+
+
+@shared_task(ignore_result=True)
+def import_users_file(path, resume=True):
+    """Run a bulk user import queued from the admin endpoint"""
+    from pathlib import Path
+    from .bulk_import import UserImporter, lock_path
+    
+    # Prefork worker children are daemonic and can't start a process pool
+    if UserImporter(path, executor='thread').run(resume=resume) is None:
+        # Another delivery holds the file or already finished it
+        return
+    # The upload holds plaintext passwords; only the progress file is kept
+    Path(path).unlink(missing_ok=True)
+    lock_path(path).unlink(missing_ok=True)
+
+
+@shared_task(ignore_result=True)
 def log_login_attempt(user_id, success, ip_address):
     """Log login attempt asynchronously"""
     try:
@@ -53,7 +86,15 @@ def log_login_attempt(user_id, success, ip_address):
         return f"User with id {user_id} does not exist"
 
 
-@shared_task
+@shared_task(ignore_result=True)
+def record_login_history(user_id, ip_address, user_agent):
+    """Write a successful login's history row off the request path"""
+    from .models import LoginHistory
+    
+    LoginHistory.objects.create(user_id=user_id, ip_address=ip_address, user_agent=user_agent, success=True)
+
+
+@shared_task(ignore_result=False)
 def cleanup_expired_sessions():
     """Clean up expired user sessions and locked accounts"""
     from django.utils import timezone
@@ -69,7 +110,7 @@ def cleanup_expired_sessions():
     return f"Unlocked {unlocked_count} accounts"
 
 
-@shared_task
+@shared_task(ignore_result=True)
 def send_security_alert(user_id, alert_type, details):
     """Send security alert to user"""
     try:
@@ -102,3 +143,54 @@ def send_security_alert(user_id, alert_type, details):
         return f"User with id {user_id} does not exist"
     except Exception as e:
         return f"Error sending alert: {str(e)}"
+
+
+@shared_task(ignore_result=False)
+def rebuild_availability_filter():
+    """Rebuild the Bloom filter behind email/username availability checks"""
+    from django.conf import settings
+    from .availability import rebuild_filter
+    
+    if not settings.AVAILABILITY_FILTER_ENABLED:
+        return "Availability filter disabled; set CACHE_URL to share it"
+    users, size = rebuild_filter()
+    return f"Availability filter rebuilt from {users} users ({size} bytes)"
+
+
+@shared_task(ignore_result=False)
+def archive_old_login_history():
+    """Move login history past LOGIN_HISTORY_HOT_DAYS into the segment archive"""
+    from .archive import archive_login_history
+    
+    moved = archive_login_history()
+    if moved is None:
+        return "Login history archiving already running"
+    return f"Archived {moved} login history rows"
+
+
+@shared_task(ignore_result=True)
+def purge_archived_login_history(user_id):
+    """Drop a deleted user's rows from the login history archive"""
+    from .archive import purge_user
+    
+    dropped = purge_user(user_id)
+    return f"Purged {dropped} archived login history rows of user {user_id}"
+
+
+@shared_task(ignore_result=True)
+def generate_profile_picture_variants(user_id):
+    """Generate resized WebP/JPEG variants of a user's profile picture"""
+    from backend.images import PROFILE_PICTURE_WIDTHS, build_variants
+    
+    user = User.objects.filter(id=user_id).only('profile_picture').first()
+    if user is None or not user.profile_picture:
+        return
+    
+    variants = build_variants(user.profile_picture, PROFILE_PICTURE_WIDTHS)
+    # Only attach if the picture hasn't been replaced in the meantime;
+    # update() skips post_save, so refresh the public page explicitly
+    if User.objects.filter(
+        id=user_id, profile_picture=user.profile_picture.name
+    ).update(profile_picture_variants=variants):
+        from portfolio.cache import bump_projects_version
+        bump_projects_version(user_id)
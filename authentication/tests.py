@@ -1,3 +1,804 @@
-from django.test import TestCase
+import asyncio
+import json
+import shutil
+import tempfile
+import threading
+import time
+import tracemalloc
+import uuid
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
+from urllib.parse import parse_qs, urlsplit
 
-# Create your tests here.
+import pyotp
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.cache import cache, caches
+from django.core.exceptions import ImproperlyConfigured, ObjectDoesNotExist
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from social_core.backends.google import GoogleOAuth2
+from social_django.models import UserSocialAuth
+from social_django.utils import load_backend, load_strategy
+from django_celery_results.models import TaskResult
+
+from backend.celery import app
+
+from .anomaly import LoginAnomalyDetector, get_detector
+from .archive import archive_login_history, get_archive
+from .availability import is_available, rebuild_filter
+from .hashers import MIN_ITERATIONS, TunedPBKDF2PasswordHasher
+from .bulk_import import UserImporter, checkpoint_path, locked
+from .events import InProcessBroker
+from .history import iter_login_history
+from .management.commands.calibrate_password_hasher import recommend
+from .models import LoginHistory
+from .pipeline import GoogleSignInForbidden
+from .serializers import CompiledReadSerializer, UserSerializer, user_representation
+from .sse import SecurityEventsApp
+from .tasks import cleanup_expired_sessions, import_users_file, log_login_attempt, record_login_history
+
+User = get_user_model()
+
+GOOGLE_PROFILE = {
+    'sub': '109876543210987654321',
+    'email': 'ada@example.com',
+    'email_verified': True,
+    'name': 'Ada Lovelace',
+    'given_name': 'Ada',
+    'family_name': 'Lovelace',
+}
+
+
+@override_settings(SOCIAL_AUTH_JWT_REDIRECT_URL='http://frontend.test/auth-callback.html')
+@mock.patch('authentication.pipeline.check_login')
+@mock.patch('authentication.pipeline.log_login_attempt')
+class GooglePipelineTests(TestCase):
+    """Google sign-in through the lean pipeline, with Google's user info mocked"""
+
+    def sign_in(self, **profile):
+        request = RequestFactory().get('/auth/complete/google-oauth2/', HTTP_USER_AGENT='TestAgent/1.0')
+        request.session = SessionStore()
+        backend = load_backend(load_strategy(request), 'google-oauth2', redirect_uri=None)
+        with mock.patch.object(GoogleOAuth2, 'user_data', return_value={**GOOGLE_PROFILE, **profile}):
+            return backend.do_auth('google-access-token')
+
+    def fragment(self, response):
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(response.url.startswith('http://frontend.test/auth-callback.html#'))
+        return {k: v[0] for k, v in parse_qs(urlsplit(response.url).fragment).items()}
+
+    def test_first_sign_in_creates_user(self, log_login_attempt, check_login):
+        # lookup miss, email lookup, savepoint + insert + release, re-read, history insert, last_login
+        with self.assertNumQueries(8):
+            response = self.sign_in()
+
+        tokens = self.fragment(response)
+        self.assertIn('access', tokens)
+        self.assertIn('refresh', tokens)
+        user = User.objects.get(google_id=GOOGLE_PROFILE['sub'])
+        self.assertEqual(user.email, 'ada@example.com')
+        self.assertEqual((user.first_name, user.last_name), ('Ada', 'Lovelace'))
+        self.assertFalse(user.has_usable_password())
+        self.assertIsNotNone(user.last_login)
+        self.assertEqual(LoginHistory.objects.filter(user=user, success=True).count(), 1)
+        self.assertFalse(UserSocialAuth.objects.exists())
+        log_login_attempt.delay.assert_called_once_with(user.id, True, '127.0.0.1')
+
+    def test_returning_user_is_one_lookup(self, log_login_attempt, check_login):
+        self.sign_in()
+
+        # google_id lookup, history insert, last_login; no detail writes
+        with self.assertNumQueries(3):
+            response = self.sign_in()
+        self.assertIn('access', self.fragment(response))
+        self.assertEqual(User.objects.count(), 1)
+
+    def test_changed_details_are_written(self, log_login_attempt, check_login):
+        self.sign_in()
+
+        with self.assertNumQueries(4):
+            self.sign_in(given_name='Augusta')
+        self.assertEqual(User.objects.get().first_name, 'Augusta')
+
+    def test_links_existing_account_by_email(self, log_login_attempt, check_login):
+        existing = User.objects.create_user(username='ada', email='ada@example.com', password='S3cure-pass!')
+
+        self.fragment(self.sign_in())
+
+        existing.refresh_from_db()
+        self.assertEqual(existing.google_id, GOOGLE_PROFILE['sub'])
+        self.assertEqual(existing.username, 'ada')
+        self.assertTrue(existing.check_password('S3cure-pass!'))
+        self.assertEqual(User.objects.count(), 1)
+
+    def test_account_linked_to_another_google_id_is_not_taken_over(self, log_login_attempt, check_login):
+        existing = User.objects.create_user(username='ada', email='ada@example.com', password='x', google_id='1234')
+
+        with self.assertRaises(GoogleSignInForbidden):
+            self.sign_in()
+
+        existing.refresh_from_db()
+        self.assertEqual(existing.google_id, '1234')
+        self.assertEqual(User.objects.count(), 1)
+        log_login_attempt.delay.assert_not_called()
+
+    def test_username_collision_falls_back_to_full_uid(self, log_login_attempt, check_login):
+        User.objects.create_user(username='ada_87654321', email='other@example.com', password='x')
+
+        self.fragment(self.sign_in())
+
+        user = User.objects.get(google_id=GOOGLE_PROFILE['sub'])
+        self.assertEqual(user.username, f"ada_{GOOGLE_PROFILE['sub']}")
+
+    def test_two_factor_user_gets_challenge_not_tokens(self, log_login_attempt, check_login):
+        self.sign_in()
+        User.objects.update(two_factor_enabled=True)
+
+        with self.assertNumQueries(1):
+            tokens = self.fragment(self.sign_in())
+        self.assertEqual(tokens['requires_2fa'], 'true')
+        self.assertNotIn('access', tokens)
+        self.assertIn('challenge', tokens)
+
+    def test_unverified_email_is_rejected(self, log_login_attempt, check_login):
+        with self.assertRaises(GoogleSignInForbidden):
+            self.sign_in(email_verified=False)
+        self.assertFalse(User.objects.exists())
+
+    def test_missing_email_verified_claim_is_rejected(self, log_login_attempt, check_login):
+        existing = User.objects.create_user(username='ada', email='ada@example.com', password='S3cure-pass!')
+        profile = {key: value for key, value in GOOGLE_PROFILE.items() if key != 'email_verified'}
+
+        with mock.patch.object(GoogleOAuth2, 'user_data', return_value=profile):
+            request = RequestFactory().get('/auth/complete/google-oauth2/')
+            request.session = SessionStore()
+            backend = load_backend(load_strategy(request), 'google-oauth2', redirect_uri=None)
+            with self.assertRaises(GoogleSignInForbidden):
+                backend.do_auth('google-access-token')
+
+        existing.refresh_from_db()
+        self.assertIsNone(existing.google_id)
+
+    def test_email_case_links_existing_account(self, log_login_attempt, check_login):
+        existing = User.objects.create_user(username='ada', email='Ada@example.com', password='S3cure-pass!')
+
+        self.fragment(self.sign_in(email='ADA@Example.com'))
+
+        existing.refresh_from_db()
+        self.assertEqual(existing.google_id, GOOGLE_PROFILE['sub'])
+        self.assertEqual(User.objects.count(), 1)
+
+
+class CompiledReadSerializerTests(TestCase):
+    """The compiled plan gives exactly what the serializer would"""
+
+    class Profile:
+        name = 'Ada'
+
+        def greeting(self):
+            return 'hello'
+
+        @property
+        def team(self):
+            raise ObjectDoesNotExist
+
+    class ProfileSerializer(serializers.Serializer):
+        name = serializers.CharField()
+        greeting = serializers.CharField()
+        team_name = serializers.CharField(source='team.name', allow_null=True)
+        team_size = serializers.IntegerField(source='team.size', required=False)
+        team_slug = serializers.CharField(source='team.slug', required=False)
+
+    def test_callables_and_missing_related_objects(self):
+        profile = self.Profile()
+        compiled = CompiledReadSerializer(self.ProfileSerializer)
+
+        self.assertEqual(compiled.to_representation(profile), self.ProfileSerializer(profile).data)
+        self.assertEqual(
+            compiled.to_representation(profile),
+            # DRF turns a missing related object into None rather than raising
+            {'name': 'Ada', 'greeting': 'hello', 'team_name': None, 'team_size': None, 'team_slug': None},
+        )
+
+    def test_user_matches_serializer(self):
+        user = User.objects.create_user(username='ada', email='ada@example.com', password='x', first_name='Ada')
+        request = RequestFactory().get('/api/auth/profile/')
+
+        self.assertEqual(
+            user_representation.to_representation(user, request),
+            UserSerializer(user, context={'request': request}).data,
+        )
+
+
+@override_settings(AVAILABILITY_FILTER_ENABLED=True)
+class AvailabilityTests(TestCase):
+    """Availability answers come from the Bloom filter; only hits are confirmed in the database"""
+
+    def setUp(self):
+        cache.clear()
+        User.objects.create_user(username='taken', email='taken@example.com', password='x')
+        rebuild_filter()
+
+    def check(self, **params):
+        return self.client.get('/api/auth/availability/', params).json()
+
+    def test_free_names_skip_the_database(self):
+        with self.assertNumQueries(0):
+            result = self.check(email='fresh@example.com', username='fresh')
+        self.assertEqual(result, {'email': {'available': True}, 'username': {'available': True}})
+
+    def test_taken_names_are_confirmed(self):
+        with self.assertNumQueries(2):
+            result = self.check(email='taken@example.com', username='taken')
+        self.assertFalse(result['email']['available'])
+        self.assertFalse(result['username']['available'])
+
+    def test_sign_up_after_rebuild_is_seen(self):
+        User.objects.create_user(username='newcomer', email='newcomer@example.com', password='x')
+
+        self.assertFalse(is_available('username', 'newcomer'))
+        self.assertFalse(is_available('email', 'newcomer@example.com'))
+
+    def test_invalid_values_are_not_available(self):
+        result = self.check(email='not-an-email')
+        self.assertFalse(result['email']['available'])
+        self.assertIn('error', result['email'])
+
+    def test_only_new_or_changed_names_are_marked(self):
+        user = User.objects.get(username='taken')
+
+        with mock.patch('authentication.signals.mark_taken') as mark_taken:
+            user.first_name = 'Tak'
+            user.save()
+            User.objects.get(pk=user.pk).save()
+            self.assertFalse(mark_taken.called)
+
+            user.email = 'moved@example.com'
+            user.save()
+            mark_taken.assert_called_once_with(emails=['moved@example.com'], usernames=['taken'])
+
+    def test_without_a_shared_cache_every_check_queries(self):
+        with self.settings(AVAILABILITY_FILTER_ENABLED=False):
+            with self.assertNumQueries(2):
+                result = self.check(email='fresh@example.com', username='taken')
+        self.assertEqual(result, {'email': {'available': True}, 'username': {'available': False}})
+
+    def test_register_rejects_taken_username(self):
+        response = self.client.post('/api/auth/register/', {
+            'username': 'taken', 'email': 'other@example.com',
+            'password': 'S3cure-pass!x', 'password2': 'S3cure-pass!x',
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('username', response.json())
+
+
+@mock.patch('authentication.views.check_login')
+@mock.patch('authentication.views.record_login_history')
+class TwoFactorChallengeTests(TestCase):
+    """Second login step driven by a signed challenge and cached TOTP state"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='grace', email='grace@example.com', password='S3cure-pass!',
+            two_factor_enabled=True, two_factor_secret=pyotp.random_base32(),
+        )
+
+    def login(self):
+        response = self.client.post('/api/auth/login/', {
+            'email': 'grace@example.com', 'password': 'S3cure-pass!',
+        }, content_type='application/json')
+        self.assertTrue(response.json()['requires_2fa'])
+        self.assertNotIn('user_id', response.json())
+        return response.json()['challenge']
+
+    def verify(self, challenge, code=None):
+        return self.client.post('/api/auth/2fa/verify/', {
+            'challenge': challenge,
+            'token': code or pyotp.TOTP(self.user.two_factor_secret).now(),
+        }, content_type='application/json')
+
+    def test_verify_is_one_write(self, record_login_history, check_login):
+        challenge = self.login()
+
+        with self.assertNumQueries(1):
+            response = self.verify(challenge)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('access', response.json())
+        self.assertEqual(response.json()['user']['email'], 'grace@example.com')
+        self.user.refresh_from_db()
+        self.assertIsNotNone(self.user.last_login)
+        record_login_history.delay.assert_called_once_with(self.user.id, '127.0.0.1', '')
+
+    def test_challenge_is_single_use(self, record_login_history, check_login):
+        challenge = self.login()
+        self.assertEqual(self.verify(challenge).status_code, 200)
+        self.assertEqual(self.verify(challenge).status_code, 400)
+
+    def test_wrong_code_and_tampered_challenge_are_rejected(self, record_login_history, check_login):
+        challenge = self.login()
+        wrong = '000000' if pyotp.TOTP(self.user.two_factor_secret).now() != '000000' else '111111'
+
+        self.assertEqual(self.verify(challenge, wrong).status_code, 400)
+        self.assertEqual(self.verify(challenge[:-2] + 'xx').status_code, 400)
+        self.assertEqual(self.verify(challenge).status_code, 200)
+
+    def test_expired_challenge_is_rejected(self, record_login_history, check_login):
+        challenge = self.login()
+
+        with mock.patch('authentication.challenge.time.time', return_value=time.time() + 301):
+            response = self.verify(challenge)
+        self.assertEqual(response.status_code, 400)
+
+    def test_state_missing_from_cache_falls_back_to_database(self, record_login_history, check_login):
+        challenge = self.login()
+        # e.g. verify handled by another worker with its own LocMem cache
+        cache.clear()
+
+        response = self.verify(challenge)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['user']['email'], 'grace@example.com')
+
+    def test_replay_is_rejected_without_the_cache(self, record_login_history, check_login):
+        challenge = self.login()
+        self.assertEqual(self.verify(challenge).status_code, 200)
+        cache.clear()
+
+        self.assertEqual(self.verify(challenge).status_code, 400)
+
+    @override_settings(TWO_FACTOR_CHALLENGE_ATTEMPTS=3)
+    def test_challenge_is_burned_after_failed_attempts(self, record_login_history, check_login):
+        challenge = self.login()
+        wrong = '000000' if pyotp.TOTP(self.user.two_factor_secret).now() != '000000' else '111111'
+
+        responses = [self.verify(challenge, wrong) for _ in range(3)]
+
+        self.assertEqual([r.json()['error'] for r in responses], ['Invalid 2FA token'] * 2 + ['Too many attempts'])
+        self.assertEqual(self.verify(challenge).status_code, 400)
+        self.assertIsNone(User.objects.get(pk=self.user.pk).last_login)
+
+    def test_disabling_2fa_invalidates_challenge(self, record_login_history, check_login):
+        challenge = self.login()
+        code = pyotp.TOTP(self.user.two_factor_secret).now()
+        User.objects.filter(pk=self.user.pk).update(two_factor_enabled=False, two_factor_secret=None)
+
+        self.assertEqual(self.verify(challenge, code).status_code, 400)
+        self.assertIsNone(User.objects.get(pk=self.user.pk).last_login)
+
+
+@mock.patch('authentication.views.check_login')
+@mock.patch('authentication.views.log_login_attempt')
+class PasswordUpgradeTests(TestCase):
+    """Hashes move up to the current PBKDF2 settings on a successful login, never down"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='linus', email='linus@example.com', password='S3cure-pass!')
+
+    def login(self, password):
+        return self.client.post('/api/auth/login/', {
+            'email': 'linus@example.com', 'password': password,
+        }, content_type='application/json')
+
+    def iterations(self):
+        return int(User.objects.get(pk=self.user.pk).password.split('$')[1])
+
+    @override_settings(PASSWORD_PBKDF2_ITERATIONS=MIN_ITERATIONS + 10_000)
+    def test_successful_login_upgrades_hash(self, log_login_attempt, check_login):
+        self.assertEqual(self.login('S3cure-pass!').status_code, 200)
+
+        self.assertEqual(self.iterations(), MIN_ITERATIONS + 10_000)
+        self.assertTrue(User.objects.get(pk=self.user.pk).check_password('S3cure-pass!'))
+
+    @override_settings(PASSWORD_PBKDF2_ITERATIONS=MIN_ITERATIONS + 10_000)
+    def test_failed_login_keeps_hash(self, log_login_attempt, check_login):
+        encoded = self.user.password
+
+        self.assertEqual(self.login('wrong-password').status_code, 401)
+        self.assertEqual(User.objects.get(pk=self.user.pk).password, encoded)
+
+    def test_current_hash_is_not_rewritten(self, log_login_attempt, check_login):
+        encoded = self.user.password
+
+        self.assertEqual(self.login('S3cure-pass!').status_code, 200)
+        self.assertEqual(User.objects.get(pk=self.user.pk).password, encoded)
+
+    def test_stronger_hash_is_not_downgraded(self, log_login_attempt, check_login):
+        with override_settings(PASSWORD_PBKDF2_ITERATIONS=MIN_ITERATIONS + 10_000):
+            self.user.set_password('S3cure-pass!')
+            self.user.save()
+        encoded = self.user.password
+
+        self.assertEqual(self.login('S3cure-pass!').status_code, 200)
+        self.assertEqual(User.objects.get(pk=self.user.pk).password, encoded)
+
+    @override_settings(PASSWORD_PBKDF2_ITERATIONS=150_000)
+    def test_setting_below_django_default_is_ignored(self, log_login_attempt, check_login):
+        self.assertEqual(TunedPBKDF2PasswordHasher().iterations, MIN_ITERATIONS)
+        self.assertEqual(self.login('S3cure-pass!').status_code, 200)
+        self.assertEqual(self.iterations(), MIN_ITERATIONS)
+
+    def test_calibration_never_recommends_less_than_the_default(self, log_login_attempt, check_login):
+        self.assertEqual(recommend(MIN_ITERATIONS, 'linear', 0.25, MIN_ITERATIONS), MIN_ITERATIONS)
+        self.assertEqual(recommend(MIN_ITERATIONS, 'linear', 2, MIN_ITERATIONS), 2 * MIN_ITERATIONS)
+        self.assertEqual(recommend(12, 'log2', 0.25, 12), 12)
+
+
+class LoginHistoryExportMemoryTests(TestCase):
+    """Export memory stays flat as the history grows"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='ada', email='ada@example.com', password=None)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def grow_history(self, rows):
+        LoginHistory.objects.bulk_create(
+            LoginHistory(user=self.user, ip_address=f'10.0.{i // 256 % 256}.{i % 256}',
+                         user_agent='Mozilla/5.0 (test)', success=i % 7 != 0)
+            for i in range(rows)
+        )
+
+    def export_peak(self, fmt):
+        response = self.client.get(f'/api/auth/login-history/export.{fmt}')
+        tracemalloc.start()
+        try:
+            lines = sum(chunk.count(b'\n') for chunk in response.streaming_content)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return lines, peak
+
+    def test_peak_memory_does_not_grow_with_rows(self):
+        for fmt, header in (('ndjson', 0), ('csv', 1)):
+            with self.subTest(fmt=fmt):
+                LoginHistory.objects.all().delete()
+                self.grow_history(5_000)
+                small_lines, small_peak = self.export_peak(fmt)
+                self.grow_history(15_000)
+                large_lines, large_peak = self.export_peak(fmt)
+
+                self.assertEqual((small_lines, large_lines), (5_000 + header, 20_000 + header))
+                # Four times the rows, same working set: a page of rows plus the
+                # output chunk, not the history
+                self.assertLess(large_peak, small_peak * 1.5)
+                self.assertLess(large_peak, 4 * 1024 * 1024)
+
+
+class LoginHistoryArchiveTests(TestCase):
+    """Old history moves to segment files and reads back merged with the table"""
+
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        settings_override = override_settings(LOGIN_HISTORY_ARCHIVE_DIR=directory)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(lambda: get_archive().close())
+
+        self.users = [
+            User.objects.create_user(username=f'user{i}', email=f'user{i}@example.com', password=None)
+            for i in range(3)
+        ]
+        now = timezone.now()
+        for day in range(0, 400, 7):
+            for i, user in enumerate(self.users):
+                row = LoginHistory.objects.create(
+                    user=user, ip_address=f'10.0.{i}.{day % 256}',
+                    user_agent=f'Agent/{day % 3}', success=day % 5 != 0,
+                )
+                LoginHistory.objects.filter(pk=row.pk).update(login_time=now - timedelta(days=day, minutes=i))
+
+    def test_archive_round_trip(self):
+        before = {user.id: list(iter_login_history(user.id)) for user in self.users}
+        old = LoginHistory.objects.filter(login_time__lt=timezone.now() - timedelta(days=90)).count()
+
+        self.assertEqual(archive_login_history(days=90, page_rows=16), old)
+        self.assertFalse(LoginHistory.objects.filter(login_time__lt=get_archive().archived_before).exists())
+        for user in self.users:
+            self.assertEqual(list(iter_login_history(user.id)), before[user.id])
+
+    def test_later_runs_append(self):
+        before = list(iter_login_history(self.users[1].id))
+
+        archive_login_history(days=300, page_rows=16)
+        sizes = {path.name: path.stat().st_size for path in get_archive().path.glob('*.seg')}
+        archive_login_history(days=60, page_rows=16)
+
+        for path in get_archive().path.glob('*.seg'):
+            self.assertGreaterEqual(path.stat().st_size, sizes.get(path.name, 0))
+        self.assertEqual(list(iter_login_history(self.users[1].id)), before)
+
+    def test_time_bounded_reads(self):
+        archive_login_history(days=90, page_rows=16)
+        until = timezone.now() - timedelta(days=200)
+        since = timezone.now() - timedelta(days=300)
+
+        rows = list(get_archive().user_rows(self.users[0].id, since=since, until=until))
+        self.assertTrue(rows)
+        self.assertTrue(all(since <= row[1] < until for row in rows))
+
+    def test_archived_logins_by_user_oldest_first(self):
+        archive_login_history(days=90, page_rows=16)
+
+        rows = list(get_archive().iter_logins(successful_only=True))
+        self.assertEqual(rows, sorted(rows, key=lambda row: (row[0], row[1])))
+        self.assertTrue(all(row[4] for row in rows))
+
+    def test_overlapping_run_is_skipped(self):
+        with get_archive().lock():
+            self.assertIsNone(archive_login_history(days=90))
+        self.assertTrue(archive_login_history(days=90))
+
+    def test_missing_directory_fails_loudly(self):
+        with override_settings(LOGIN_HISTORY_ARCHIVE_DIR='/nonexistent/login_history'):
+            with self.assertRaises(ImproperlyConfigured):
+                archive_login_history(days=90)
+            # Readers still serve the table
+            self.assertTrue(list(iter_login_history(self.users[0].id)))
+
+    @override_settings(CELERY_TASK_ALWAYS_EAGER=True)
+    def test_deleting_a_user_purges_archived_rows(self):
+        archive_login_history(days=90, page_rows=16)
+        keep = {user.id: list(get_archive().user_rows(user.id)) for user in self.users[1:]}
+        old_files = {path.name for path in get_archive().path.glob('*.seg')}
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.users[0].delete()
+
+        self.assertFalse(any(row[0] == self.users[0].id for row in get_archive().iter_logins()))
+        for user_id, rows in keep.items():
+            self.assertEqual(list(get_archive().user_rows(user_id)), rows)
+        self.assertFalse(old_files & {path.name for path in get_archive().path.glob('*.seg')})
+
+
+@override_settings(CELERY_TASK_ALWAYS_EAGER=True)
+class TaskResultPolicyTests(TestCase):
+    """Only opted-in tasks and failures leave rows in django_celery_results"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='ada', email='ada@example.com', password='x')
+        # Eager runs go through the result backend like a worker would
+        for task in (log_login_attempt, record_login_history, cleanup_expired_sessions):
+            patcher = mock.patch.object(task, 'store_eager_result', True)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_fire_and_forget_tasks_store_nothing(self):
+        log_login_attempt.delay(self.user.id, True, '10.0.0.1')
+
+        self.assertFalse(TaskResult.objects.exists())
+
+    def test_beat_jobs_keep_their_summary(self):
+        result = cleanup_expired_sessions.delay()
+
+        row = TaskResult.objects.get(task_id=result.id)
+        self.assertEqual(row.status, 'SUCCESS')
+        self.assertIn('Unlocked', row.result)
+
+    def test_failures_are_recorded_even_if_ignored(self):
+        with mock.patch('authentication.models.LoginHistory.objects.create', side_effect=RuntimeError('db down')):
+            result = record_login_history.delay(self.user.id, '10.0.0.1', 'Agent')
+
+        self.assertEqual(TaskResult.objects.get(task_id=result.id).status, 'FAILURE')
+
+    def test_results_expire_within_a_day(self):
+        self.assertTrue(app.conf.task_ignore_result)
+        self.assertLessEqual(app.conf.result_expires, timedelta(days=1))
+
+
+class UserImportResumeTests(TestCase):
+    """An import file is only ever picked up by one run"""
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        settings_override = override_settings(USER_IMPORT_DIR=directory)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.job_id = uuid.uuid4()
+        self.source = Path(directory) / f'{self.job_id.hex}.ndjson'
+        self.source.write_text('{"email": "ada@example.com", "username": "ada"}\n')
+        self.url = f'/api/auth/users/import/{self.job_id}/'
+
+        self.client = APIClient()
+        self.client.force_authenticate(
+            User.objects.create_superuser(username='admin', email='admin@example.com', password='x')
+        )
+        patcher = mock.patch.object(import_users_file, 'delay')
+        self.delay = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def checkpoint(self, status=None):
+        path = checkpoint_path(self.source)
+        if status is not None:
+            path.write_text(json.dumps({'status': status, 'rows_done': 0, 'created': 0, 'skipped': 0, 'errors': []}))
+        return json.loads(path.read_text())['status']
+
+    def test_failed_import_is_resumed_once(self):
+        self.checkpoint('failed')
+
+        self.assertEqual(self.client.post(self.url).status_code, 202)
+        self.assertEqual(self.client.post(self.url).status_code, 409)
+
+        self.delay.assert_called_once_with(str(self.source))
+        self.assertEqual(self.checkpoint(), 'queued')
+
+    def test_running_import_is_not_resumed(self):
+        self.checkpoint('running')
+
+        with locked(self.source):
+            response = self.client.post(self.url)
+
+        self.assertEqual(response.status_code, 409)
+        self.delay.assert_not_called()
+
+    def test_interrupted_import_is_resumed(self):
+        # "running" with nobody holding the lock: the worker died
+        self.checkpoint('running')
+
+        self.assertEqual(self.client.post(self.url).status_code, 202)
+        self.assertEqual(self.checkpoint(), 'queued')
+
+    def test_finished_import_is_not_resumed(self):
+        self.checkpoint('done')
+
+        self.assertEqual(self.client.post(self.url).status_code, 409)
+        self.delay.assert_not_called()
+
+    def test_second_delivery_leaves_the_file_alone(self):
+        self.checkpoint('queued')
+
+        with locked(self.source):
+            import_users_file(str(self.source))
+
+        self.assertTrue(self.source.exists())
+        self.assertEqual(self.checkpoint(), 'queued')
+        self.assertFalse(User.objects.filter(username='ada').exists())
+
+    @mock.patch('authentication.bulk_import.send_welcome_emails')
+    def test_queued_import_runs(self, send_welcome_emails):
+        self.checkpoint('queued')
+
+        import_users_file(str(self.source))
+
+        self.assertFalse(self.source.exists())
+        self.assertEqual(self.checkpoint(), 'done')
+        self.assertTrue(User.objects.filter(username='ada').exists())
+        self.assertIsNone(UserImporter(self.source).run())
+
+
+class SecurityEventStreamTests(TestCase):
+    """Streams open with a single-use ticket and carry published events"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='ada', email='ada@example.com', password='x')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.broker = InProcessBroker()
+        patcher = mock.patch('authentication.sse.get_broker', return_value=self.broker)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def ticket(self):
+        response = self.client.post('/api/auth/events/ticket/')
+        self.assertEqual(response.status_code, 201)
+        return response.json()['ticket']
+
+    def connect(self, query=b'', headers=(), publish=None):
+        """Run one connection and return ``(status, body)``"""
+        messages = []
+        disconnect = asyncio.Event()
+
+        async def receive():
+            await disconnect.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            messages.append(message)
+            if message.get('body', b'').startswith(b'event:'):
+                disconnect.set()
+
+        async def run():
+            scope = {
+                'type': 'http', 'path': '/api/auth/events/', 'method': 'GET',
+                'query_string': query, 'headers': list(headers),
+            }
+            stream = asyncio.ensure_future(SecurityEventsApp(None)(scope, receive, send))
+            while not messages and not stream.done():
+                await asyncio.sleep(0.01)
+            if messages[0]['status'] == 200:
+                if publish:
+                    self.broker.publish(self.user.id, publish)
+                else:
+                    disconnect.set()
+            await asyncio.wait_for(stream, 5)
+
+        async_to_sync(run)()
+        return messages[0]['status'], b''.join(message.get('body', b'') for message in messages[1:])
+
+    def test_ticket_requires_authentication(self):
+        self.assertEqual(APIClient().post('/api/auth/events/ticket/').status_code, 401)
+
+    def test_ticket_opens_one_stream(self):
+        ticket = self.ticket()
+
+        status, body = self.connect(f'ticket={ticket}'.encode(), publish={'type': 'login', 'ip_address': '10.0.0.1'})
+
+        self.assertEqual(status, 200)
+        self.assertIn(b'event: login\n', body)
+        self.assertEqual(self.connect(f'ticket={ticket}'.encode())[0], 401)
+
+    def test_expired_ticket_is_refused(self):
+        ticket = self.ticket()
+        cache.clear()
+
+        self.assertEqual(self.connect(f'ticket={ticket}'.encode())[0], 401)
+
+    def test_access_token_in_query_string_is_refused(self):
+        token = str(AccessToken.for_user(self.user))
+
+        self.assertEqual(self.connect(f'token={token}'.encode())[0], 401)
+
+    def test_bearer_header_still_works(self):
+        token = str(AccessToken.for_user(self.user))
+
+        self.assertEqual(self.connect(headers=[(b'authorization', f'Bearer {token}'.encode())])[0], 200)
+
+
+class LoginFingerprintTests(TestCase):
+    """Profiles survive the page cache and concurrent logins"""
+
+    AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0'
+
+    def setUp(self):
+        caches['login_fingerprints'].clear()
+        self.detector = get_detector()
+
+    def test_profiles_are_kept_apart_from_the_default_cache(self):
+        self.detector.check(1, '10.0.0.1', self.AGENT)
+
+        cache.clear()
+
+        self.assertIsNotNone(self.detector.cache.get(self.detector.key(1)))
+        self.assertIsNone(cache.get(self.detector.key(1)))
+
+    def test_concurrent_logins_are_all_recorded(self):
+        class SlowDetector(LoginAnomalyDetector):
+            def observe(self, profile, ip_address, user_agent):
+                # Widen the read-modify-write window
+                time.sleep(0.01)
+                return super().observe(profile, ip_address, user_agent)
+
+        detector = SlowDetector(cache_alias='login_fingerprints')
+        threads = [
+            threading.Thread(target=detector.check, args=(1, f'10.0.{i}.1', self.AGENT)) for i in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        profile = detector.cache.get(detector.key(1))
+        self.assertEqual(profile['logins'], 8)
+        self.assertEqual(len(profile['networks']), 8)
+
+    def test_profile_is_dropped_with_the_user(self):
+        user = User.objects.create_user(username='ada', email='ada@example.com', password='x')
+        self.detector.check(user.id, '10.0.0.1', self.AGENT)
+
+        with mock.patch('authentication.signals.purge_archived_login_history'):
+            with self.captureOnCommitCallbacks(execute=True):
+                user.delete()
+
+        self.assertIsNone(self.detector.cache.get(self.detector.key(user.id)))
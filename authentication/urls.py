@@ -1,9 +1,10 @@
 from django.urls import path
 from rest_framework_simplejwt.views import TokenRefreshView
 from .views import (
-    RegisterView, LoginView, LogoutView,
+    RegisterView, AvailabilityView, LoginView, LogoutView,
     Setup2FAView, Verify2FAView, Disable2FAView,
-    UserProfileView, ChangePasswordView
+    UserProfileView, ChangePasswordView,
+    UserImportView, UserImportStatusView, LoginHistoryExportView, SecurityEventsTicketView
 )
 
 app_name = 'authentication'
@@ -11,6 +12,7 @@ app_name = 'authentication'
 urlpatterns = [
     # Authentication
     path('register/', RegisterView.as_view(), name='register'),
+    path('availability/', AvailabilityView.as_view(), name='availability'),
     path('login/', LoginView.as_view(), name='login'),
     path('logout/', LogoutView.as_view(), name='logout'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
@@ -23,4 +25,12 @@ urlpatterns = [
     # User Profile
     path('profile/', UserProfileView.as_view(), name='profile'),
     path('change-password/', ChangePasswordView.as_view(), name='change-password'),
+    path('login-history/export.<str:fmt>', LoginHistoryExportView.as_view(), name='login-history-export'),
+    
+    # Security event stream (the stream itself is served by authentication.sse)
+    path('events/ticket/', SecurityEventsTicketView.as_view(), name='events-ticket'),
+    
+    # Bulk import (admin)
+    path('users/import/', UserImportView.as_view(), name='user-import'),
+    path('users/import/<uuid:job_id>/', UserImportStatusView.as_view(), name='user-import-status'),
 ]
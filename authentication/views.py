@@ -1,8 +1,15 @@
 from rest_framework import status, generics, permissions
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from rest_framework.parsers import MultiPartParser
+from rest_framework.negotiation import BaseContentNegotiation
+from rest_framework.throttling import ScopedRateThrottle
 from rest_framework_simplejwt.tokens import RefreshToken
-from django.contrib.auth import get_user_model, authenticate
+from django.contrib.auth import get_user_model
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.validators import validate_email
+from django.http import StreamingHttpResponse
 from django.utils import timezone
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
@@ -10,10 +17,23 @@ from drf_yasg import openapi
 from .serializers import (
     UserSerializer, RegisterSerializer, LoginSerializer,
     TwoFactorSetupSerializer, TwoFactorVerifySerializer,
-    PasswordChangeSerializer
+    PasswordChangeSerializer, user_representation
 )
 from .models import LoginHistory
-from .tasks import send_welcome_email, log_login_attempt
+from .tasks import send_welcome_email, log_login_attempt, import_users_file, record_login_history
+from .bulk_import import checkpoint_path, queue_resume
+from .history import EXPORT_FORMATS, iter_login_history
+from .events import publish_security_event
+from .sse import issue_stream_ticket
+from .anomaly import check_login
+from .availability import is_available
+from .hashers import check_and_upgrade
+from .challenge import (
+    InvalidChallenge, complete_challenge, issue_challenge, open_challenge, record_failure, verify_code
+)
+import json
+import uuid
+from pathlib import Path
 
 User = get_user_model()
 
@@ -47,11 +67,46 @@ class RegisterView(generics.CreateAPIView):
         send_welcome_email.delay(user.id)
         
         return Response({
-            'user': UserSerializer(user).data,
+            'user': user_representation.to_representation(user),
             'message': 'User registered successfully'
         }, status=status.HTTP_201_CREATED)
 
 
+class AvailabilityView(APIView):
+    """Live email/username availability check for the register form"""
+    permission_classes = (permissions.AllowAny,)
+    throttle_scope = 'availability'
+    throttle_classes = (ScopedRateThrottle,)
+    validators = {
+        'email': validate_email,
+        'username': User.username_validator,
+    }
+    
+    @swagger_auto_schema(
+        operation_description="Check whether an email and/or username can still be registered",
+        manual_parameters=[
+            openapi.Parameter('email', openapi.IN_QUERY, type=openapi.TYPE_STRING),
+            openapi.Parameter('username', openapi.IN_QUERY, type=openapi.TYPE_STRING),
+        ],
+    )
+    def get(self, request):
+        result = {}
+        for field, validator in self.validators.items():
+            value = request.query_params.get(field)
+            if value is None:
+                continue
+            try:
+                validator(value)
+            except DjangoValidationError as e:
+                result[field] = {'available': False, 'error': e.messages[0]}
+                continue
+            result[field] = {'available': is_available(field, value)}
+        
+        if not result:
+            return Response({'error': 'Pass email and/or username'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result, status=status.HTTP_200_OK)
+
+
 class LoginView(APIView):
     """User Login API"""
     permission_classes = (permissions.AllowAny,)
@@ -76,9 +131,9 @@ class LoginView(APIView):
                     'error': 'Account temporarily locked. Try again later.'
                 }, status=status.HTTP_403_FORBIDDEN)
             
-            user_auth = authenticate(request, username=email, password=password)
-            
-            if user_auth is None:
+            # Verifies against the user already loaded, and moves the stored
+            # hash to the current hasher settings when they've changed
+            if not check_and_upgrade(user, password):
                 user.increment_login_attempts()
                 LoginHistory.objects.create(
                     user=user,
@@ -87,6 +142,9 @@ class LoginView(APIView):
                     success=False
                 )
                 log_login_attempt.delay(user.id, False, get_client_ip(request))
+                publish_security_event(user.id, 'login_failed', ip_address=get_client_ip(request))
+                if user.account_locked_until:
+                    publish_security_event(user.id, 'account_locked', until=user.account_locked_until.isoformat())
                 
                 return Response({'error': 'Invalid credentials'}, status=status.HTTP_401_UNAUTHORIZED)
             
@@ -95,7 +153,7 @@ class LoginView(APIView):
             if user.two_factor_enabled:
                 return Response({
                     'requires_2fa': True,
-                    'user_id': user.id,
+                    'challenge': issue_challenge(user, user_representation.to_representation(user)),
                     'message': 'Please provide 2FA token'
                 }, status=status.HTTP_200_OK)
             
@@ -109,13 +167,19 @@ class LoginView(APIView):
             )
             
             log_login_attempt.delay(user.id, True, get_client_ip(request))
+            publish_security_event(
+                user.id, 'login',
+                ip_address=get_client_ip(request),
+                user_agent=request.META.get('HTTP_USER_AGENT', ''),
+            )
+            check_login(user, get_client_ip(request), request.META.get('HTTP_USER_AGENT', ''))
             user.last_login = timezone.now()
-            user.save()
+            user.save(update_fields=['last_login'])
             
             return Response({
                 'access': str(refresh.access_token),
                 'refresh': str(refresh),
-                'user': UserSerializer(user).data,
+                'user': user_representation.to_representation(user),
                 'requires_2fa': False
             }, status=status.HTTP_200_OK)
             
@@ -148,9 +212,9 @@ class Verify2FAView(APIView):
         serializer.is_valid(raise_exception=True)
         
         token = serializer.validated_data['token']
-        user_id = request.data.get('user_id')
+        challenge = serializer.validated_data.get('challenge')
         
-        if not user_id:
+        if not challenge:
             user = request.user
             if not user.is_authenticated:
                 return Response({'error': 'Authentication required'}, status=status.HTTP_401_UNAUTHORIZED)
@@ -158,36 +222,41 @@ class Verify2FAView(APIView):
             if user.verify_2fa_token(token):
                 user.two_factor_enabled = True
                 user.save()
+                publish_security_event(user.id, '2fa_enabled')
                 return Response({'message': '2FA enabled successfully'}, status=status.HTTP_200_OK)
             else:
                 return Response({'error': 'Invalid 2FA token'}, status=status.HTTP_400_BAD_REQUEST)
-        else:
-            try:
-                user = User.objects.get(id=user_id)
-                
-                if user.verify_2fa_token(token):
-                    refresh = RefreshToken.for_user(user)
-                    
-                    LoginHistory.objects.create(
-                        user=user,
-                        ip_address=get_client_ip(request),
-                        user_agent=request.META.get('HTTP_USER_AGENT', ''),
-                        success=True
-                    )
-                    
-                    user.last_login = timezone.now()
-                    user.save()
-                    
-                    return Response({
-                        'access': str(refresh.access_token),
-                        'refresh': str(refresh),
-                        'user': UserSerializer(user).data
-                    }, status=status.HTTP_200_OK)
-                else:
-                    return Response({'error': 'Invalid 2FA token'}, status=status.HTTP_400_BAD_REQUEST)
-                    
-            except User.DoesNotExist:
-                return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
+        
+        try:
+            payload, state = open_challenge(challenge)
+        except InvalidChallenge as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        user_id = payload['uid']
+        ip_address = get_client_ip(request)
+        user_agent = request.META.get('HTTP_USER_AGENT', '')
+        
+        if not verify_code(state, token):
+            publish_security_event(user_id, '2fa_failed', ip_address=ip_address)
+            if record_failure(payload):
+                return Response({'error': 'Too many attempts'}, status=status.HTTP_400_BAD_REQUEST)
+            return Response({'error': 'Invalid 2FA token'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        if not complete_challenge(payload, state):
+            return Response({'error': 'Challenge expired'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        user = User(pk=user_id)
+        refresh = RefreshToken.for_user(user)
+        
+        record_login_history.delay(user_id, ip_address, user_agent)
+        publish_security_event(user_id, 'login', ip_address=ip_address, user_agent=user_agent, method='2fa')
+        check_login(user, ip_address, user_agent)
+        
+        return Response({
+            'access': str(refresh.access_token),
+            'refresh': str(refresh),
+            'user': state['user']
+        }, status=status.HTTP_200_OK)
 
 
 class Disable2FAView(APIView):
@@ -200,6 +269,7 @@ class Disable2FAView(APIView):
         user.two_factor_enabled = False
         user.two_factor_secret = None
         user.save()
+        publish_security_event(user.id, '2fa_disabled')
         return Response({'message': '2FA disabled successfully'}, status=status.HTTP_200_OK)
 
 
@@ -210,6 +280,9 @@ class UserProfileView(generics.RetrieveUpdateAPIView):
     
     def get_object(self):
         return self.request.user
+    
+    def retrieve(self, request, *args, **kwargs):
+        return Response(user_representation.to_representation(request.user, request))
 
 
 class ChangePasswordView(APIView):
@@ -242,3 +315,118 @@ class LogoutView(APIView):
     @swagger_auto_schema(operation_description="Logout user")
     def post(self, request):
         return Response({'message': 'Logout successful'}, status=status.HTTP_200_OK)
+
+
+class StreamingContentNegotiation(BaseContentNegotiation):
+    """Skip Accept-header negotiation; the view picks its own content type"""
+    def select_parser(self, request, parsers):
+        return parsers[0]
+    
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return (renderers[0], renderers[0].media_type)
+
+
+class SecurityEventsTicketView(APIView):
+    """Security Event Stream Ticket API"""
+    permission_classes = (permissions.IsAuthenticated,)
+    
+    @swagger_auto_schema(operation_description="Get a single-use ticket for opening /api/auth/events/?ticket=")
+    def post(self, request):
+        ticket = issue_stream_ticket(request.user.id)
+        return Response(
+            {'ticket': ticket, 'expires_in': settings.SECURITY_EVENTS_TICKET_SECONDS}, status=status.HTTP_201_CREATED,
+        )
+
+
+class LoginHistoryExportView(APIView):
+    """Stream the full login history as NDJSON or CSV"""
+    permission_classes = (permissions.IsAuthenticated,)
+    content_negotiation_class = StreamingContentNegotiation
+    
+    @swagger_auto_schema(
+        operation_description="Export login history (staff may pass ?user_id= to export another user)",
+        manual_parameters=[
+            openapi.Parameter('user_id', openapi.IN_QUERY, type=openapi.TYPE_INTEGER, required=False),
+        ]
+    )
+    def get(self, request, fmt):
+        if fmt not in EXPORT_FORMATS:
+            return Response({'error': 'Format must be ndjson or csv'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        user_id = request.user.id
+        if request.query_params.get('user_id'):
+            if not request.user.is_staff:
+                return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+            try:
+                user_id = int(request.query_params['user_id'])
+            except ValueError:
+                return Response({'error': 'Invalid user_id'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        stream, content_type = EXPORT_FORMATS[fmt]
+        response = StreamingHttpResponse(stream(iter_login_history(user_id)), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="login-history-{user_id}.{fmt}"'
+        return response
+
+
+class UserImportView(APIView):
+    """Bulk User Import API (admin only)"""
+    permission_classes = (permissions.IsAdminUser,)
+    parser_classes = (MultiPartParser,)
+    allowed_extensions = ('.csv', '.ndjson', '.jsonl')
+    
+    @swagger_auto_schema(operation_description="Upload a CSV/NDJSON file of users to import in the background")
+    def post(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'error': 'No file provided'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        extension = Path(upload.name).suffix.lower()
+        if extension not in self.allowed_extensions:
+            return Response({'error': 'File must be CSV or NDJSON'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        job_id = uuid.uuid4()
+        import_dir = Path(settings.USER_IMPORT_DIR)
+        import_dir.mkdir(parents=True, exist_ok=True)
+        path = import_dir / f'{job_id.hex}{extension}'
+        with path.open('wb') as f:
+            for chunk in upload.chunks():
+                f.write(chunk)
+        
+        import_users_file.delay(str(path))
+        
+        return Response({'job_id': str(job_id), 'status': 'queued'}, status=status.HTTP_202_ACCEPTED)
+
+
+class UserImportStatusView(APIView):
+    """Bulk User Import Progress API (admin only)"""
+    permission_classes = (permissions.IsAdminUser,)
+    
+    def _source_file(self, job_id):
+        matches = list(Path(settings.USER_IMPORT_DIR).glob(f'{job_id.hex}.*'))
+        return next((p for p in matches if not p.name.endswith(('.progress.json', '.tmp', '.lock'))), None)
+    
+    @swagger_auto_schema(operation_description="Get progress of a bulk user import")
+    def get(self, request, job_id):
+        progress_file = checkpoint_path(Path(settings.USER_IMPORT_DIR) / job_id.hex)
+        if progress_file.exists():
+            state = json.loads(progress_file.read_text())
+        elif self._source_file(job_id) is not None:
+            state = {'status': 'queued'}
+        else:
+            return Response({'error': 'Import not found'}, status=status.HTTP_404_NOT_FOUND)
+        
+        return Response({'job_id': str(job_id), **state}, status=status.HTTP_200_OK)
+    
+    @swagger_auto_schema(operation_description="Resume a failed or interrupted bulk user import")
+    def post(self, request, job_id):
+        source = self._source_file(job_id)
+        if source is None:
+            return Response({'error': 'Import file no longer available'}, status=status.HTTP_404_NOT_FOUND)
+        
+        if not queue_resume(source):
+            return Response(
+                {'error': 'Only failed or interrupted imports can be resumed'}, status=status.HTTP_409_CONFLICT,
+            )
+        
+        import_users_file.delay(str(source))
+        return Response({'job_id': str(job_id), 'status': 'queued'}, status=status.HTTP_202_ACCEPTED)
@@ -13,4 +13,10 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported after Django is set up; serves /api/auth/events/ without the
+# middleware stack so idle SSE connections hold no threads or DB queries.
+from authentication.sse import SecurityEventsApp  # noqa: E402
+
+application = SecurityEventsApp(django_application)
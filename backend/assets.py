@@ -0,0 +1,117 @@
+"""
+Build step for the hand-written frontend pages.
+
+Inline ``<style>`` and ``<script>`` blocks are moved into minified files under
+``<build>/static``, and the page becomes a Django template under
+``<build>/templates/frontend/`` that links them (and its local images) with
+``{% static %}``. ``collectstatic`` with ``CompressedManifestStaticFilesStorage``
+then fingerprints everything and writes ``.gz``/``.br`` siblings, which
+WhiteNoise serves with far-future immutable cache headers.
+"""
+import os
+import re
+from pathlib import Path
+
+import rcssmin
+import rjsmin
+
+INLINE_STYLE = re.compile(r'<style>(.*?)</style>', re.S | re.I)
+INLINE_SCRIPT = re.compile(r'<script(?:\s+type="text/javascript")?>(.*?)</script>', re.S | re.I)
+LOCAL_URL = re.compile(r'(?P<attr>\s(?:src|href))="(?P<url>(?![a-z]+:|//|#|/|\$\{)[^"]+)"', re.I)
+HTML_COMMENT = re.compile(r'<!--(?!\[if).*?-->', re.S)
+# Elements whose whitespace is content (or code) and must survive minification
+PRESERVED = re.compile(r'<(pre|textarea|script|style)\b.*?</\1\s*>', re.S | re.I)
+TEMPLATE_SYNTAX = re.compile(r'\{[{%#]')
+
+
+class AssetBuildError(Exception):
+    """The page can't be turned into a template safely"""
+
+
+def _collapse(html):
+    lines = '\n'.join(line.strip() for line in HTML_COMMENT.sub('', html).splitlines() if line.strip())
+    # A newline where there was whitespace, so inline neighbours don't run together
+    lead = '\n' if html[:1].isspace() else ''
+    trail = '\n' if html[-1:].isspace() and lines else ''
+    return lead + lines + trail
+
+
+def minify_html(html):
+    """
+    Drop comments and indentation; keeps line breaks so inline handlers stay valid.
+
+    ``<pre>``, ``<textarea>``, ``<script>`` and ``<style>`` elements are copied
+    untouched.
+    """
+    parts = []
+    position = 0
+    for match in PRESERVED.finditer(html):
+        parts.append(_collapse(html[position:match.start()]))
+        parts.append(match.group(0))
+        position = match.end()
+    parts.append(_collapse(html[position:]))
+    return ''.join(parts).strip() + '\n'
+
+
+def static_name(path, static_dirs):
+    """Name ``path`` is collected under, given ``STATICFILES_DIRS``"""
+    path = Path(os.path.normpath(path))
+    for entry in static_dirs:
+        prefix, root = entry if isinstance(entry, (list, tuple)) else ('', entry)
+        try:
+            relative = path.relative_to(Path(root).resolve())
+        except ValueError:
+            continue
+        return '/'.join(filter(None, [prefix, relative.as_posix()]))
+    return None
+
+
+def build_page(source, build_dir, static_dirs):
+    """
+    Split ``source`` into a template plus minified CSS/JS files.
+
+    Returns ``(template_path, written)`` where ``written`` lists
+    ``(static name, original bytes, minified bytes)`` for each extracted asset.
+    """
+    source = Path(source).resolve()
+    build_dir = Path(build_dir)
+    html = source.read_text(encoding='utf-8')
+    stem = source.stem
+    written = []
+
+    def extract(kind, minify):
+        count = 0
+
+        def replace(match):
+            nonlocal count
+            count += 1
+            name = f'{kind}/{stem}.{kind}' if count == 1 else f'{kind}/{stem}-{count}.{kind}'
+            original = match.group(1)
+            minified = minify(original).strip() + '\n'
+            target = build_dir / 'static' / name
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_text(minified, encoding='utf-8')
+            written.append((name, len(original.encode()), len(minified.encode())))
+            if kind == 'css':
+                return f'<link rel="stylesheet" href="{{% static \'{name}\' %}}">'
+            return f'<script src="{{% static \'{name}\' %}}"></script>'
+        return replace
+
+    if TEMPLATE_SYNTAX.search(INLINE_SCRIPT.sub('', INLINE_STYLE.sub('', html))):
+        raise AssetBuildError(f'{source.name} contains Django template syntax outside <script>/<style>')
+
+    html = INLINE_STYLE.sub(extract('css', rcssmin.cssmin), html)
+    html = INLINE_SCRIPT.sub(extract('js', rjsmin.jsmin), html)
+
+    def link_local(match):
+        name = static_name(source.parent / match.group('url'), static_dirs)
+        if name is None:
+            return match.group(0)
+        return f'{match.group("attr")}="{{% static \'{name}\' %}}"'
+
+    html = '{% load static %}' + minify_html(LOCAL_URL.sub(link_local, html))
+
+    template = build_dir / 'templates' / 'frontend' / source.name
+    template.parent.mkdir(parents=True, exist_ok=True)
+    template.write_text(html, encoding='utf-8')
+    return template, written
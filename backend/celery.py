@@ -26,6 +26,18 @@ app.conf.beat_schedule = {
         'task': 'portfolio.tasks.generate_daily_report',
         'schedule': crontab(hour=8, minute=0),  # Run daily at 8 AM
     },
+    'rebuild-availability-filter': {
+        'task': 'authentication.tasks.rebuild_availability_filter',
+        'schedule': crontab(minute='*/15'),  # Keep in step with AVAILABILITY_REBUILD_MINUTES
+    },
+    'archive-login-history': {
+        'task': 'authentication.tasks.archive_old_login_history',
+        'schedule': crontab(hour=3, minute=30),  # Run daily at 3:30 AM
+    },
+    'cleanup-stale-uploads': {
+        'task': 'portfolio.tasks.cleanup_stale_uploads',
+        'schedule': crontab(minute=30),  # Run hourly
+    },
 }
 
 @app.task(bind=True)
@@ -0,0 +1,10 @@
+from rest_framework import serializers
+
+from .images import srcset
+
+
+class ImageVariantsField(serializers.ReadOnlyField):
+    """Serializer field exposing a stored image variant map as srcset strings"""
+
+    def to_representation(self, value):
+        return srcset(value)
@@ -0,0 +1,80 @@
+"""
+Resized WebP/JPEG derivatives for uploaded images.
+
+Variants are named after a hash of the original's bytes
+(``<dir>/variants/<hash>-<width>.<ext>``), so a given URL always serves the
+same content and can be cached forever. The variant map is stored on the
+model next to the original and exposed to clients as ``srcset`` strings.
+"""
+import hashlib
+import io
+import posixpath
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, features
+
+PROFILE_PICTURE_WIDTHS = (64, 160, 320)
+PROJECT_IMAGE_WIDTHS = (320, 640, 1280)
+
+FORMATS = (
+    ('webp', 'WEBP', {'quality': 80, 'method': 4}),
+    ('jpeg', 'JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+)
+
+
+def _for_format(img, pil_format):
+    if pil_format == 'JPEG' and img.mode != 'RGB':
+        rgba = img.convert('RGBA')
+        background = Image.new('RGB', rgba.size, (255, 255, 255))
+        background.paste(rgba, mask=rgba.getchannel('A'))
+        return background
+    if pil_format == 'WEBP' and img.mode not in ('RGB', 'RGBA'):
+        return img.convert('RGBA')
+    return img
+
+
+def build_variants(field_file, widths):
+    """Write resized variants of ``field_file`` and return the variant map"""
+    storage = field_file.storage
+    with field_file.open('rb') as f:
+        data = f.read()
+    digest = hashlib.sha256(data).hexdigest()[:16]
+    variant_dir = posixpath.join(posixpath.dirname(field_file.name), 'variants')
+    formats = [fmt for fmt in FORMATS if fmt[0] != 'webp' or features.check('webp')]
+
+    variants = {ext: {} for ext, _, _ in formats}
+    with Image.open(io.BytesIO(data)) as original:
+        img = ImageOps.exif_transpose(original)
+        for width in sorted(set(min(w, img.width) for w in widths)):
+            height = max(1, round(img.height * width / img.width))
+            resized = img if width == img.width else img.resize((width, height), Image.LANCZOS)
+            for ext, pil_format, options in formats:
+                name = f'{variant_dir}/{digest}-{width}.{ext}'
+                if not storage.exists(name):
+                    buffer = io.BytesIO()
+                    _for_format(resized, pil_format).save(buffer, pil_format, **options)
+                    name = storage.save(name, ContentFile(buffer.getvalue()))
+                variants[ext][str(width)] = name
+
+    return {'source': field_file.name, 'variants': variants}
+
+
+def needs_variants(field_file, variants):
+    """True when the stored variant map doesn't belong to the current file"""
+    return bool(field_file) and (variants or {}).get('source') != field_file.name
+
+
+def srcset(variants, storage=default_storage):
+    """Turn a stored variant map into srcset strings plus a thumbnail URL"""
+    variants = (variants or {}).get('variants')
+    if not variants:
+        return None
+    result = {}
+    for ext, by_width in variants.items():
+        widths = sorted(by_width, key=int)
+        result[ext] = ', '.join(f'{storage.url(by_width[w])} {w}w' for w in widths)
+    jpeg = variants.get('jpeg') or next(iter(variants.values()))
+    result['thumbnail'] = storage.url(jpeg[min(jpeg, key=int)])
+    return result
+
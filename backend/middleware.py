@@ -0,0 +1,56 @@
+"""
+Browser-only middleware that steps aside for JWT API traffic.
+
+Requests to ``API_FAST_LANE_PREFIXES`` that carry an ``Authorization: Bearer``
+header never touch the session, CSRF cookie, ``request.user`` from sessions or
+message storage - DRF's JWTAuthentication does all the work. Admin pages and
+the ``social_django`` OAuth flow keep the full stack.
+"""
+from django.conf import settings
+from django.contrib.auth.middleware import AuthenticationMiddleware as BaseAuthenticationMiddleware
+from django.contrib.messages.middleware import MessageMiddleware as BaseMessageMiddleware
+from django.contrib.sessions.middleware import SessionMiddleware as BaseSessionMiddleware
+from django.middleware.csrf import CsrfViewMiddleware as BaseCsrfViewMiddleware
+
+
+def is_api_fast_lane(request):
+    """True for Bearer-authenticated requests under an API prefix"""
+    try:
+        return request._api_fast_lane
+    except AttributeError:
+        pass
+    fast_lane = (
+        settings.API_FAST_LANE
+        and request.path_info.startswith(settings.API_FAST_LANE_PREFIXES)
+        and request.META.get('HTTP_AUTHORIZATION', '').startswith('Bearer ')
+    )
+    request._api_fast_lane = fast_lane
+    return fast_lane
+
+
+class FastLaneMixin:
+    """Bypass the wrapped middleware entirely for fast-lane requests"""
+
+    def __call__(self, request):
+        if is_api_fast_lane(request):
+            return self.get_response(request)
+        return super().__call__(request)
+
+
+class SessionMiddleware(FastLaneMixin, BaseSessionMiddleware):
+    pass
+
+
+class CsrfViewMiddleware(FastLaneMixin, BaseCsrfViewMiddleware):
+    def process_view(self, request, callback, callback_args, callback_kwargs):
+        if is_api_fast_lane(request):
+            return None
+        return super().process_view(request, callback, callback_args, callback_kwargs)
+
+
+class AuthenticationMiddleware(FastLaneMixin, BaseAuthenticationMiddleware):
+    pass
+
+
+class MessageMiddleware(FastLaneMixin, BaseMessageMiddleware):
+    pass
@@ -0,0 +1,76 @@
+"""
+orjson-backed drop-in for DRF's JSONRenderer.
+
+Compact, strict, non-ASCII output is byte-identical to ``JSONRenderer``.
+orjson formats floats outside ``1e-4 <= |x| < 1e16`` differently from
+``repr`` (``0.0000999`` for ``9.99e-05``) and writes NaN/Infinity as ``null``
+where the stock renderer raises, so any such float sends the whole payload
+through the stock renderer. So does anything else orjson can't handle
+natively: indented output for the browsable API, ints wider than 64 bits, and
+non-string keys.
+"""
+import math
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional at runtime
+    orjson = None
+
+
+def _is_plain_float(value):
+    """Whether orjson and ``repr`` agree on how to write ``value``"""
+    return value == 0 or (math.isfinite(value) and 1e-4 <= abs(value) < 1e16)
+
+
+def has_divergent_float(data):
+    """Whether ``data`` holds a float orjson would write differently"""
+    stack = [data]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, float):
+            if not _is_plain_float(value):
+                return True
+        elif isinstance(value, dict):
+            stack.extend(value.values())
+        elif isinstance(value, (list, tuple)):
+            stack.extend(value)
+    return False
+
+
+class ORJSONRenderer(JSONRenderer):
+    """JSONRenderer using orjson when the output would be identical"""
+
+    def __init__(self):
+        encoder_default = encoders.JSONEncoder().default
+
+        def default(obj):
+            # Decimals and the like can come back as floats
+            value = encoder_default(obj)
+            if has_divergent_float(value):
+                raise TypeError('float orjson would format differently')
+            return value
+
+        self._default = default
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None
+            or data is None
+            or self.ensure_ascii
+            or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+            or has_divergent_float(data)
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            # Let DRF's encoder format datetimes so the strings match exactly
+            ret = orjson.dumps(data, default=self._default, option=orjson.OPT_PASSTHROUGH_DATETIME)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Same escaping JSONRenderer applies for JavaScript compatibility
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
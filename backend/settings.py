@@ -55,26 +55,35 @@ INSTALLED_APPS = [
     # Local apps
     'authentication',
     'portfolio',
+    'monitoring',
+    'pages',
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    # After WhiteNoise, so static files are served without being counted as views
+    'monitoring.middleware.RequestMetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    # Session/CSRF/auth/messages are skipped for Bearer-JWT /api/ requests
+    'backend.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
-    'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'django.contrib.messages.middleware.MessageMiddleware',
+    'backend.middleware.CsrfViewMiddleware',
+    'backend.middleware.AuthenticationMiddleware',
+    'backend.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# API fast lane (see backend/middleware.py)
+API_FAST_LANE = os.getenv('API_FAST_LANE', 'True') == 'True'
+API_FAST_LANE_PREFIXES = ('/api/',)
+
 ROOT_URLCONF = 'backend.urls'
 
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
-        'DIRS': [],
+        'DIRS': [BASE_DIR / 'frontend' / 'templates', BASE_DIR / 'frontend' / 'build' / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
@@ -99,6 +108,33 @@ DATABASES = {
     }
 }
 
+# Cache (instrumented so hits/misses show up in request metrics)
+CACHE_URL = os.getenv('CACHE_URL', '')
+LOGIN_FINGERPRINTS_CACHE_URL = os.getenv('LOGIN_FINGERPRINTS_CACHE_URL', CACHE_URL)
+CACHES = {
+    'default': {
+        'BACKEND': 'monitoring.cache.RedisCache' if CACHE_URL else 'monitoring.cache.LocMemCache',
+        'LOCATION': CACHE_URL,
+    },
+    # Per-user login fingerprints (authentication/anomaly.py). Profiles are
+    # stored without a TTL under their own key prefix, so on a Redis shared with
+    # the default cache a volatile-* or noeviction maxmemory-policy never evicts
+    # them for page entries (which all expire). With an allkeys-* policy, point
+    # LOGIN_FINGERPRINTS_CACHE_URL at a separate noeviction Redis instead
+    'login_fingerprints': {
+        'BACKEND': 'monitoring.cache.RedisCache' if LOGIN_FINGERPRINTS_CACHE_URL else 'monitoring.cache.LocMemCache',
+        'LOCATION': LOGIN_FINGERPRINTS_CACHE_URL or 'login_fingerprints',
+        'KEY_PREFIX': 'fingerprints',
+        'TIMEOUT': None,
+        'OPTIONS': {} if LOGIN_FINGERPRINTS_CACHE_URL else {'MAX_ENTRIES': 100000},
+    },
+}
+
+# Metrics (per-process snapshots merged at /metrics/)
+METRICS_DIR = os.getenv('METRICS_DIR', str(BASE_DIR / 'metrics'))
+METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', '5'))
+METRICS_AUTH_TOKEN = os.getenv('METRICS_AUTH_TOKEN', '')
+
 # REST Framework Configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
@@ -107,6 +143,15 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'backend.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'backend.parsers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
     'DEFAULT_THROTTLE_CLASSES': [
@@ -115,7 +160,8 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_THROTTLE_RATES': {
         'anon': '100/hour',
-        'user': '1000/hour'
+        'user': '1000/hour',
+        'availability': '60/minute',
     }
 }
 
@@ -128,6 +174,11 @@ SIMPLE_JWT = {
     'AUTH_HEADER_TYPES': ('Bearer',),
 }
 
+# Lifetime of the signed challenge between password and 2FA code
+TWO_FACTOR_CHALLENGE_SECONDS = int(os.getenv('TWO_FACTOR_CHALLENGE_SECONDS', '300'))
+# Wrong codes allowed per challenge before it is burned
+TWO_FACTOR_CHALLENGE_ATTEMPTS = int(os.getenv('TWO_FACTOR_CHALLENGE_ATTEMPTS', '5'))
+
 # CORS Settings
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:8000",
@@ -144,13 +195,32 @@ CELERY_RESULT_BACKEND = 'django-db'
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
+# Results are off unless a task opts in with ignore_result=False (the beat
+# jobs, whose summaries show up in the admin); failures are always recorded.
+# Stored rows are purged by beat's daily backend_cleanup after half a day,
+# sooner than Celery's one-day default.
+CELERY_TASK_IGNORE_RESULT = True
+CELERY_TASK_STORE_ERRORS_EVEN_IF_IGNORED = True
+CELERY_RESULT_EXPIRES = timedelta(hours=int(os.getenv('CELERY_RESULT_EXPIRES_HOURS', '12')))
 CELERY_TIMEZONE = 'UTC'
 CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'
+CELERY_TASK_ALWAYS_EAGER = os.getenv('CELERY_TASK_ALWAYS_EAGER', 'False') == 'True'
 
 # Social Auth - Google OAuth
 SOCIAL_AUTH_GOOGLE_OAUTH2_KEY = os.getenv('GOOGLE_OAUTH_CLIENT_ID', '')
 SOCIAL_AUTH_GOOGLE_OAUTH2_SECRET = os.getenv('GOOGLE_OAUTH_CLIENT_SECRET', '')
 SOCIAL_AUTH_GOOGLE_OAUTH2_SCOPE = ['email', 'profile', 'openid']
+# Key accounts on Google's stable account id (stored in User.google_id), not the email
+SOCIAL_AUTH_GOOGLE_OAUTH2_USE_UNIQUE_USER_ID = True
+# Lean pipeline: no UserSocialAuth rows, users are resolved by google_id and get JWTs
+SOCIAL_AUTH_PIPELINE = (
+    'social_core.pipeline.social_auth.social_details',
+    'social_core.pipeline.social_auth.social_uid',
+    'social_core.pipeline.social_auth.auth_allowed',
+    'authentication.pipeline.upsert_google_user',
+    'authentication.pipeline.issue_jwt',
+)
+SOCIAL_AUTH_JWT_REDIRECT_URL = os.getenv('SOCIAL_AUTH_JWT_REDIRECT_URL', 'http://localhost:3000/auth-callback.html')
 
 AUTHENTICATION_BACKENDS = (
     'social_core.backends.google.GoogleOAuth2',
@@ -161,6 +231,17 @@ AUTHENTICATION_BACKENDS = (
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
+# Password hashing; tune the PBKDF2 cost with `manage.py calibrate_password_hasher`.
+# Existing hashes move to new settings on each user's next login.
+PASSWORD_HASHERS = [
+    'authentication.hashers.TunedPBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+PASSWORD_PBKDF2_ITERATIONS = int(os.getenv('PASSWORD_PBKDF2_ITERATIONS', '600000'))
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -195,11 +276,62 @@ USE_TZ = True
 STATIC_URL = '/static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+# Output of `manage.py build_frontend` plus the assets the pages link to
+FRONTEND_BUILD_DIR = BASE_DIR / 'frontend' / 'build'
+STATICFILES_DIRS = [
+    FRONTEND_BUILD_DIR / 'static',
+    BASE_DIR / 'frontend' / 'static',
+    ('css', BASE_DIR / 'frontend' / 'css'),
+    ('img', BASE_DIR / 'img'),
+]
 
 # Media files
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Security event stream (SSE at /api/auth/events/, ASGI only). Without Redis,
+# events published by Celery workers or other web processes are dropped
+SECURITY_EVENTS_REDIS_URL = os.getenv('SECURITY_EVENTS_REDIS_URL', CACHE_URL)
+if SECURITY_EVENTS_REDIS_URL:
+    SECURITY_EVENTS_BROKER = 'authentication.events.RedisBroker'
+    SECURITY_EVENTS_BROKER_OPTIONS = {'url': SECURITY_EVENTS_REDIS_URL}
+else:
+    SECURITY_EVENTS_BROKER = 'authentication.events.InProcessBroker'
+    SECURITY_EVENTS_BROKER_OPTIONS = {}
+SECURITY_EVENTS_HEARTBEAT = 15
+SECURITY_EVENTS_MAX_AGE = 300
+SECURITY_EVENTS_RETRY_MS = 3000
+SECURITY_EVENTS_TICKET_SECONDS = int(os.getenv('SECURITY_EVENTS_TICKET_SECONDS', '30'))
+
+# New-device login alerts (rebuild state with `manage.py rebuild_login_fingerprints`)
+LOGIN_ANOMALY_OPTIONS = {
+    'cache_alias': 'login_fingerprints',
+    'min_logins': int(os.getenv('LOGIN_ANOMALY_MIN_LOGINS', '3')),
+    # No TTL (see CACHES); profiles are bounded and dropped when the user is deleted
+    'timeout': None,
+}
+
+# Registration availability checks (Bloom filter rebuilt by Celery Beat).
+# The filter lives in the default cache, so it's only used when that cache is
+# shared (CACHE_URL); with per-process LocMem every check queries the database
+AVAILABILITY_FILTER_ENABLED = os.getenv('AVAILABILITY_FILTER_ENABLED', 'True' if CACHE_URL else 'False') == 'True'
+AVAILABILITY_REBUILD_MINUTES = 15
+AVAILABILITY_REFRESH_SECONDS = 30
+AVAILABILITY_FILTER_CAPACITY = 100_000
+AVAILABILITY_FILTER_ERROR_RATE = 0.01
+
+# Resumable uploads (partial files are moved into MEDIA_ROOT when complete)
+UPLOAD_PARTIAL_DIR = os.getenv('UPLOAD_PARTIAL_DIR', str(BASE_DIR / 'uploads'))
+UPLOAD_MAX_SIZE = int(os.getenv('UPLOAD_MAX_SIZE', str(2 * 1024 ** 3)))
+UPLOAD_EXPIRY_HOURS = 24
+
+# Bulk user imports (kept outside MEDIA_ROOT - uploads contain passwords)
+USER_IMPORT_DIR = os.getenv('USER_IMPORT_DIR', str(BASE_DIR / 'imports'))
+
+# Login history older than this many days moves to compressed monthly segments
+LOGIN_HISTORY_ARCHIVE_DIR = os.getenv('LOGIN_HISTORY_ARCHIVE_DIR', str(BASE_DIR / 'archive' / 'login_history'))
+LOGIN_HISTORY_HOT_DAYS = int(os.getenv('LOGIN_HISTORY_HOT_DAYS', '180'))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
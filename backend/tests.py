@@ -0,0 +1,190 @@
+import io
+import json
+import shutil
+import tempfile
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from PIL import Image
+from rest_framework.renderers import JSONRenderer
+
+from .assets import minify_html
+from .fields import ImageVariantsField
+from .images import build_variants, needs_variants, srcset
+from .middleware import AuthenticationMiddleware, CsrfViewMiddleware, MessageMiddleware, SessionMiddleware
+from .renderers import ORJSONRenderer
+
+
+class ORJSONRendererTests(SimpleTestCase):
+    """orjson output must match JSONRenderer byte for byte, or not be used"""
+
+    payloads = {
+        'user': {
+            'id': 7, 'username': 'zoë', 'email': 'zoe@example.com', 'first_name': 'Zoë', 'last_name': 'Ñúñez',
+            'profile_picture': None, 'two_factor_enabled': False,
+            'created_at': datetime(2024, 5, 1, 12, 30, 15, 123456, tzinfo=timezone.utc),
+        },
+        'separators': {'text': 'line\u2028break\u2029para', 'emoji': '\U0001f600', 'quote': '"\\/'},
+        'plain floats': [0.0, -0.0, 0.1, 1.5, 0.0001, 123456.789, 9999999999999998.0, -2.5e-3],
+        'exponent floats': [1e16, 9.99e-05, 5e-324, 1.7976931348623157e308, -1e-7],
+        'mixed': {'ok': [1, 2.5, 'x'], 'tiny': {'nested': [[1e-05]]}},
+        'decimal': {'price': Decimal('19.99'), 'rate': Decimal('0.00001')},
+        'wide int': {'big': 2 ** 70},
+        'tuple': (1, 'two', None, True),
+    }
+
+    def test_bytes_match_json_renderer(self):
+        stock, fast = JSONRenderer(), ORJSONRenderer()
+        for name, payload in self.payloads.items():
+            with self.subTest(payload=name):
+                self.assertEqual(fast.render(payload), stock.render(payload))
+
+    def test_non_finite_floats_raise_like_json_renderer(self):
+        for value in (float('nan'), float('inf'), float('-inf')):
+            with self.subTest(value=value):
+                with self.assertRaises(ValueError):
+                    JSONRenderer().render({'value': value})
+                with self.assertRaises(ValueError):
+                    ORJSONRenderer().render({'value': value})
+
+    def test_output_is_valid_json(self):
+        rendered = ORJSONRenderer().render(self.payloads['user'])
+        self.assertEqual(json.loads(rendered)['first_name'], 'Zoë')
+
+
+class MinifyHTMLTests(SimpleTestCase):
+    """Indentation goes; whitespace that is content stays"""
+
+    def test_indentation_and_comments_are_dropped(self):
+        html = '<div>\n    <!-- note -->\n    <span>a</span>\n</div>\n'
+        self.assertEqual(minify_html(html), '<div>\n<span>a</span>\n</div>\n')
+
+    def test_pre_and_textarea_are_kept(self):
+        pre = '<pre class="code">  def f():\n      return 1\n</pre>'
+        textarea = '<textarea name="m">\n  Dear team,\n\n    indented\n</textarea>'
+        html = f'<section>\n    {pre}\n    {textarea}\n</section>\n'
+
+        minified = minify_html(html)
+
+        self.assertIn(pre, minified)
+        self.assertIn(textarea, minified)
+
+    def test_inline_code_is_not_touched(self):
+        script = '<script type="module">\n    const s = `a\n    b`; // <!-- not a comment -->\n</script>'
+        self.assertIn(script, minify_html(f'<body>\n  {script}\n</body>'))
+
+
+class FastLaneMiddlewareTests(SimpleTestCase):
+    """Only Bearer requests under an API prefix skip session, CSRF, auth and messages"""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def view(self, request):
+        return HttpResponse('ok')
+
+    def run_stack(self, request):
+        """Pass ``request`` through the browser middleware; returns the CSRF rejection, if any"""
+        handler = SessionMiddleware(AuthenticationMiddleware(MessageMiddleware(self.view)))
+        handler(request)
+        return CsrfViewMiddleware(self.view).process_view(request, self.view, (), {})
+
+    def assert_fast_lane(self, request):
+        self.assertIsNone(self.run_stack(request))
+        self.assertFalse(hasattr(request, 'session'))
+        self.assertFalse(hasattr(request, 'user'))
+        self.assertFalse(hasattr(request, '_messages'))
+
+    def assert_full_stack(self, request):
+        rejection = self.run_stack(request)
+        self.assertEqual(rejection.status_code, 403)
+        self.assertTrue(hasattr(request, 'session'))
+        self.assertTrue(hasattr(request, 'user'))
+        self.assertTrue(hasattr(request, '_messages'))
+
+    def test_bearer_api_request_skips_browser_middleware(self):
+        self.assert_fast_lane(self.factory.post('/api/portfolio/projects/', HTTP_AUTHORIZATION='Bearer abc'))
+
+    def test_api_request_without_bearer_gets_full_stack(self):
+        self.assert_full_stack(self.factory.post('/api/portfolio/projects/'))
+        self.assert_full_stack(self.factory.post('/api/portfolio/projects/', HTTP_AUTHORIZATION='Basic YTpi'))
+
+    def test_bearer_outside_api_gets_full_stack(self):
+        self.assert_full_stack(self.factory.post('/admin/login/', HTTP_AUTHORIZATION='Bearer abc'))
+        self.assert_full_stack(self.factory.post('/auth/complete/google-oauth2/', HTTP_AUTHORIZATION='Bearer abc'))
+
+    @override_settings(API_FAST_LANE=False)
+    def test_switch_turns_the_fast_lane_off(self):
+        self.assert_full_stack(self.factory.post('/api/portfolio/projects/', HTTP_AUTHORIZATION='Bearer abc'))
+
+    def test_settings_use_the_fast_lane_classes(self):
+        for name in ('SessionMiddleware', 'CsrfViewMiddleware', 'AuthenticationMiddleware', 'MessageMiddleware'):
+            with self.subTest(name):
+                self.assertIn(f'backend.middleware.{name}', settings.MIDDLEWARE)
+                stock = [path for path in settings.MIDDLEWARE if path.startswith('django.') and path.endswith(name)]
+                self.assertEqual(stock, [])
+
+
+class StoredFile:
+    """Just enough of a FieldFile for build_variants"""
+
+    def __init__(self, storage, name):
+        self.storage = storage
+        self.name = name
+
+    def open(self, mode='rb'):
+        return self.storage.open(self.name, mode)
+
+
+class ImageVariantTests(SimpleTestCase):
+    """Variants are content-addressed, capped at the original width and flattened for JPEG"""
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.storage = FileSystemStorage(location=directory, base_url='/media/')
+
+    def upload(self, size=(800, 400), mode='RGBA', name='projects/shot.png'):
+        buffer = io.BytesIO()
+        Image.new(mode, size, (255, 0, 0, 128) if mode == 'RGBA' else 'red').save(buffer, 'PNG')
+        return StoredFile(self.storage, self.storage.save(name, ContentFile(buffer.getvalue())))
+
+    def test_widths_are_capped_at_the_original(self):
+        variants = build_variants(self.upload(), (320, 640, 1280))
+
+        self.assertEqual(variants['source'], 'projects/shot.png')
+        for ext in ('webp', 'jpeg'):
+            self.assertEqual(sorted(variants['variants'][ext], key=int), ['320', '640', '800'])
+        with self.storage.open(variants['variants']['jpeg']['320']) as f, Image.open(f) as img:
+            self.assertEqual((img.size, img.mode), ((320, 160), 'RGB'))
+
+    def test_same_bytes_reuse_the_same_files(self):
+        first = build_variants(self.upload(), (320,))
+        second = build_variants(self.upload(name='projects/copy.png'), (320,))
+
+        self.assertEqual(first['variants'], second['variants'])
+        self.assertEqual(len(self.storage.listdir('projects/variants')[1]), len(first['variants']))
+
+    def test_needs_variants_follows_the_source(self):
+        upload = self.upload()
+        variants = build_variants(upload, (320,))
+
+        self.assertFalse(needs_variants(upload, variants))
+        self.assertTrue(needs_variants(upload, {}))
+        self.assertTrue(needs_variants(StoredFile(self.storage, 'projects/other.png'), variants))
+        self.assertFalse(needs_variants(None, {}))
+
+    def test_srcset_and_field(self):
+        variants = build_variants(self.upload(), (320, 640))
+
+        result = srcset(variants, self.storage)
+
+        jpeg = variants['variants']['jpeg']
+        self.assertEqual(result['jpeg'], f'/media/{jpeg["320"]} 320w, /media/{jpeg["640"]} 640w')
+        self.assertEqual(result['thumbnail'], f'/media/{jpeg["320"]}')
+        self.assertIsNone(ImageVariantsField().to_representation({}))
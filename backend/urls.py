@@ -21,6 +21,8 @@ from django.conf.urls.static import static
 from rest_framework import permissions
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
+from pages.views import frontend_page
+from portfolio.views import public_portfolio
 
 # Swagger/OpenAPI Schema
 schema_view = get_schema_view(
@@ -44,6 +46,15 @@ urlpatterns = [
     path('api/auth/', include('authentication.urls')),
     path('api/portfolio/', include('portfolio.urls')),
     
+    # Pages built by `manage.py build_frontend`, at their original .html paths
+    re_path(r'^(?P<page>landing|auth-callback)\.html$', frontend_page, name='frontend-page'),
+    
+    # Public portfolio pages (server-rendered)
+    path('u/<str:username>/', public_portfolio, name='public-portfolio'),
+    
+    # Prometheus metrics
+    path('metrics/', include('monitoring.urls')),
+    
     # Social Authentication (Google OAuth)
     path('auth/', include('social_django.urls', namespace='social')),
     
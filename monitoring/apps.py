@@ -0,0 +1,16 @@
+from django.apps import AppConfig
+
+
+class MonitoringConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'monitoring'
+
+    def ready(self):
+        from django.conf import settings
+        from .metrics import registry
+        from . import signals  # noqa: F401
+
+        registry.configure(
+            directory=settings.METRICS_DIR,
+            flush_interval=settings.METRICS_FLUSH_INTERVAL,
+        )
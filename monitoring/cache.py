@@ -0,0 +1,35 @@
+"""
+Cache backends that report hits and misses to the request metrics.
+"""
+from django.core.cache.backends.locmem import LocMemCache as BaseLocMemCache
+from django.core.cache.backends.redis import RedisCache as BaseRedisCache
+
+from .metrics import record_cache_access
+
+_MISSING = object()
+
+
+class InstrumentedCacheMixin:
+    """Count get()/get_many() hits and misses for the current request"""
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _MISSING, version)
+        if value is _MISSING:
+            record_cache_access(0, 1)
+            return default
+        record_cache_access(1)
+        return value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        found = super().get_many(keys, version)
+        record_cache_access(len(found), len(keys) - len(found))
+        return found
+
+
+class LocMemCache(InstrumentedCacheMixin, BaseLocMemCache):
+    pass
+
+
+class RedisCache(InstrumentedCacheMixin, BaseRedisCache):
+    pass
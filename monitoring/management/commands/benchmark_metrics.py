@@ -0,0 +1,50 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory
+
+from monitoring.metrics import Registry
+from monitoring import middleware
+
+
+class Command(BaseCommand):
+    help = 'Measure the per-request overhead of RequestMetricsMiddleware'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=20000)
+        parser.add_argument('--queries', type=int, default=1, help='SQL queries issued per request')
+
+    def handle(self, *args, **options):
+        n = options['requests']
+        queries = options['queries']
+
+        def view(request):
+            with connection.cursor() as cursor:
+                for _ in range(queries):
+                    cursor.execute('SELECT 1')
+            return HttpResponse('ok')
+
+        # Use a throwaway in-memory registry so the run doesn't pollute real metrics
+        middleware.registry = Registry()
+        instrumented = middleware.RequestMetricsMiddleware(view)
+        request = RequestFactory().get('/api/auth/profile/')
+        request.resolver_match = None
+
+        baseline = self._time(view, request, n)
+        wrapped = self._time(instrumented, request, n)
+        overhead = (wrapped - baseline) / n * 1e6
+
+        self.stdout.write(f'requests:        {n} ({queries} queries each)')
+        self.stdout.write(f'baseline:        {baseline / n * 1e6:.1f} us/request')
+        self.stdout.write(f'instrumented:    {wrapped / n * 1e6:.1f} us/request')
+        self.stdout.write(self.style.SUCCESS(f'overhead:        {overhead:.1f} us/request'))
+
+    def _time(self, handler, request, n):
+        for _ in range(min(n, 500)):
+            handler(request)
+        start = time.perf_counter()
+        for _ in range(n):
+            handler(request)
+        return time.perf_counter() - start
@@ -0,0 +1,275 @@
+"""
+Lightweight metric registry shared across worker processes.
+
+Each process keeps counters and fixed-bucket histograms in memory and
+periodically dumps a snapshot to ``<METRICS_DIR>/<pid>-<start>.json``. Scraping
+merges every snapshot in the directory, so all gunicorn and Celery workers
+show up in a single Prometheus-style text response.
+
+Snapshots of processes that have exited (or whose PID was reused) are folded
+into ``exited.json`` at scrape time, so totals never go down while the
+directory holds one file per live process. Liveness is checked by PID, so
+``METRICS_DIR`` must be local to the machine.
+"""
+import atexit
+import bisect
+import contextvars
+import fcntl
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+EXITED = 'exited.json'
+
+
+class Registry:
+    """In-process counters and histograms with file-based aggregation"""
+
+    def __init__(self, directory=None, flush_interval=5.0):
+        self._lock = threading.Lock()
+        self.configure(directory, flush_interval)
+        self._reset()
+
+    def configure(self, directory=None, flush_interval=5.0):
+        self.directory = Path(directory) if directory else None
+        self.flush_interval = flush_interval
+        if self.directory:
+            self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._started = time.time_ns()
+        self._counters = {}
+        self._histograms = {}
+        self._last_flush = time.monotonic()
+
+    def inc(self, name, labels=(), amount=1):
+        """Increment a counter"""
+        key = (name, tuple(labels))
+        with self._lock:
+            self._check_fork()
+            self._counters[key] = self._counters.get(key, 0) + amount
+        self._maybe_flush()
+
+    def observe(self, name, value, labels=(), buckets=LATENCY_BUCKETS):
+        """Record a value in a fixed-bucket histogram"""
+        key = (name, tuple(labels))
+        with self._lock:
+            self._check_fork()
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = [buckets, [0] * (len(buckets) + 1), 0.0]
+            hist[1][bisect.bisect_left(buckets, value)] += 1
+            hist[2] += value
+        self._maybe_flush()
+
+    def _check_fork(self):
+        # A forked worker inherits the parent's numbers; start from zero so
+        # they are not counted twice once both processes flush.
+        if os.getpid() != self._pid:
+            self._reset()
+
+    def _maybe_flush(self):
+        if self.directory and time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'counters': [
+                    [name, list(labels), value]
+                    for (name, labels), value in self._counters.items()
+                ],
+                'histograms': [
+                    [name, list(labels), list(buckets), list(counts), total]
+                    for (name, labels), (buckets, counts, total) in self._histograms.items()
+                ],
+            }
+
+    def flush(self):
+        """Write this process' snapshot to the shared metrics directory"""
+        if not self.directory:
+            return
+        with self._lock:
+            self._check_fork()
+        self._last_flush = time.monotonic()
+        path = self.directory / f'{self._pid}-{self._started}.json'
+        tmp_path = path.with_suffix('.tmp')
+        tmp_path.write_text(json.dumps(self.snapshot()))
+        os.replace(tmp_path, path)
+
+    def collect(self):
+        """Merge snapshots from every process into counters and histograms"""
+        if not self.directory:
+            return _merge([self.snapshot()])
+
+        self.flush()
+        # One scrape at a time, so a snapshot is never read both before and after folding
+        with open(self.directory / 'collect.lock', 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            self._fold_exited()
+            snapshots = []
+            for path in self.directory.glob('*.json'):
+                try:
+                    snapshots.append(json.loads(path.read_text()))
+                except (OSError, ValueError):
+                    continue
+        return _merge(snapshots)
+
+    def _fold_exited(self):
+        """Merge the snapshots of exited processes into ``exited.json`` and delete them"""
+        by_pid = {}
+        for path in self.directory.glob('*.json'):
+            # Older releases wrote plain <pid>.json
+            pid, _, started = path.stem.partition('-')
+            try:
+                by_pid.setdefault(int(pid), []).append((int(started or 0), path))
+            except ValueError:
+                continue
+
+        exited = []
+        for pid, files in by_pid.items():
+            files.sort()
+            # Older files under a reused PID belong to processes that are gone
+            exited.extend(path for _, path in files[:-1])
+            if pid != os.getpid() and not _is_running(pid):
+                exited.append(files[-1][1])
+        if not exited:
+            return
+
+        exited_path = self.directory / EXITED
+        try:
+            previous = json.loads(exited_path.read_text())
+        except (OSError, ValueError):
+            previous = {'counters': [], 'histograms': [], 'folded': []}
+        # Files already folded by a scrape that died before deleting them
+        folded = set(previous['folded'])
+        snapshots = [previous]
+        for path in exited:
+            if path.name in folded:
+                continue
+            try:
+                snapshots.append(json.loads(path.read_text()))
+            except (OSError, ValueError):
+                continue
+
+        tmp_path = exited_path.with_suffix('.tmp')
+        tmp_path.write_text(json.dumps({**_dump(*_merge(snapshots)), 'folded': [path.name for path in exited]}))
+        os.replace(tmp_path, exited_path)
+        for path in exited:
+            path.unlink(missing_ok=True)
+
+    def render(self):
+        """Render all metrics in the Prometheus text exposition format"""
+        counters, histograms = self.collect()
+        lines = []
+        typed = set()
+
+        for (name, labels), value in sorted(counters.items()):
+            if name not in typed:
+                lines.append(f'# TYPE {name} counter')
+                typed.add(name)
+            lines.append(f'{name}{_format_labels(labels)} {value}')
+
+        for (name, labels), (buckets, counts, total) in sorted(histograms.items()):
+            if name not in typed:
+                lines.append(f'# TYPE {name} histogram')
+                typed.add(name)
+            cumulative = 0
+            for bound, count in zip(list(buckets) + ['+Inf'], counts):
+                cumulative += count
+                le_labels = labels + (('le', str(bound)),)
+                lines.append(f'{name}_bucket{_format_labels(le_labels)} {cumulative}')
+            lines.append(f'{name}_sum{_format_labels(labels)} {total}')
+            lines.append(f'{name}_count{_format_labels(labels)} {cumulative}')
+
+        return '\n'.join(lines) + '\n'
+
+
+def _merge(snapshots):
+    counters = {}
+    histograms = {}
+    for snap in snapshots:
+        for name, labels, value in snap['counters']:
+            key = (name, tuple(map(tuple, labels)))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, buckets, counts, total in snap['histograms']:
+            key = (name, tuple(map(tuple, labels)))
+            merged = histograms.get(key)
+            if merged is None or merged[0] != buckets:
+                histograms[key] = [buckets, list(counts), total]
+            else:
+                merged[1] = [a + b for a, b in zip(merged[1], counts)]
+                merged[2] += total
+    return counters, histograms
+
+
+def _dump(counters, histograms):
+    """Inverse of ``_merge``: merged metrics back in snapshot form"""
+    return {
+        'counters': [[name, list(labels), value] for (name, labels), value in counters.items()],
+        'histograms': [
+            [name, list(labels), list(buckets), list(counts), total]
+            for (name, labels), (buckets, counts, total) in histograms.items()
+        ],
+    }
+
+
+def _is_running(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Alive, but owned by another user
+        pass
+    return True
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    pairs = ','.join(
+        '{}="{}"'.format(key, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for key, value in labels
+    )
+    return '{' + pairs + '}'
+
+
+registry = Registry()
+# Celery children flush on worker_process_shutdown instead; they leave through os._exit
+atexit.register(registry.flush)
+
+
+class RequestStats:
+    """Per-request SQL and cache counters"""
+    __slots__ = ('queries', 'db_time', 'cache_hits', 'cache_misses')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def sql_wrapper(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_time += time.perf_counter() - start
+
+
+current_stats = contextvars.ContextVar('request_stats', default=None)
+
+
+def record_cache_access(hits, misses=0):
+    """Attribute cache hits/misses to the request being served, if any"""
+    stats = current_stats.get()
+    if stats is not None:
+        stats.cache_hits += hits
+        stats.cache_misses += misses
@@ -0,0 +1,51 @@
+import time
+from contextlib import ExitStack
+
+from django.db import connections
+
+from .metrics import COUNT_BUCKETS, RequestStats, current_stats, registry
+
+
+class RequestMetricsMiddleware:
+    """
+    Record SQL queries, cache hits/misses and latency for every view.
+
+    The numbers are added to the response as a ``Server-Timing`` header and
+    aggregated into histograms labelled by view name.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = RequestStats()
+        token = current_stats.set(stats)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(stats.sql_wrapper))
+                response = self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        duration = time.perf_counter() - start
+
+        match = request.resolver_match
+        view = match.view_name if match else 'unmatched'
+        labels = (('view', view), ('method', request.method))
+
+        registry.inc('http_requests_total', labels + (('status', str(response.status_code)),))
+        registry.observe('http_request_duration_seconds', duration, labels)
+        registry.observe('http_request_db_queries', stats.queries, (('view', view),), COUNT_BUCKETS)
+        registry.observe('http_request_db_duration_seconds', stats.db_time, (('view', view),))
+        if stats.cache_hits:
+            registry.inc('http_cache_hits_total', (('view', view),), stats.cache_hits)
+        if stats.cache_misses:
+            registry.inc('http_cache_misses_total', (('view', view),), stats.cache_misses)
+
+        response['Server-Timing'] = (
+            f'db;dur={stats.db_time * 1000:.2f};desc="{stats.queries} queries", '
+            f'cache;desc="{stats.cache_hits} hits {stats.cache_misses} misses", '
+            f'total;dur={duration * 1000:.2f}'
+        )
+        return response
@@ -0,0 +1,58 @@
+"""
+Celery signal handlers feeding task metrics into the shared registry.
+
+The producer stamps an ``enqueued_at`` header on every published message so
+the worker can report how long the task sat in the queue before it started.
+The start time is kept on the task's request rather than in a module-level
+dict, so a task that never reaches ``task_postrun`` (revoked or killed
+mid-run) leaves nothing behind.
+"""
+import time
+
+from celery.signals import (
+    before_task_publish, task_failure, task_postrun, task_prerun,
+    task_retry, worker_process_shutdown,
+)
+
+from .metrics import registry
+
+QUEUE_LAG_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+
+@before_task_publish.connect
+def stamp_enqueue_time(headers=None, **kwargs):
+    if headers is not None:
+        headers['enqueued_at'] = time.time()
+
+
+@task_prerun.connect
+def record_task_start(task_id=None, task=None, **kwargs):
+    enqueued_at = getattr(task.request, 'enqueued_at', None)
+    if enqueued_at:
+        lag = max(time.time() - enqueued_at, 0.0)
+        registry.observe('celery_task_queue_lag_seconds', lag, (('task', task.name),), QUEUE_LAG_BUCKETS)
+    task.request.metrics_started_at = time.perf_counter()
+
+
+@task_postrun.connect
+def record_task_end(task_id=None, task=None, state=None, **kwargs):
+    start = getattr(task.request, 'metrics_started_at', None)
+    labels = (('task', task.name),)
+    if start is not None:
+        registry.observe('celery_task_runtime_seconds', time.perf_counter() - start, labels)
+    registry.inc('celery_tasks_total', labels + (('state', state or 'UNKNOWN'),))
+
+
+@task_failure.connect
+def record_task_failure(sender=None, **kwargs):
+    registry.inc('celery_task_failures_total', (('task', sender.name),))
+
+
+@task_retry.connect
+def record_task_retry(sender=None, **kwargs):
+    registry.inc('celery_task_retries_total', (('task', sender.name),))
+
+
+@worker_process_shutdown.connect
+def flush_on_shutdown(**kwargs):
+    registry.flush()
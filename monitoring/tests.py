@@ -0,0 +1,143 @@
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+
+from authentication.tasks import cleanup_expired_sessions, record_login_history
+
+from .metrics import EXITED, Registry, registry
+
+User = get_user_model()
+
+
+def counter(name, labels):
+    for counter_name, counter_labels, value in registry.snapshot()['counters']:
+        if counter_name == name and tuple(map(tuple, counter_labels)) == labels:
+            return value
+    return 0
+
+
+def histogram_count(name, labels):
+    for histogram_name, histogram_labels, _, counts, _ in registry.snapshot()['histograms']:
+        if histogram_name == name and tuple(map(tuple, histogram_labels)) == labels:
+            return sum(counts)
+    return 0
+
+
+@override_settings(CELERY_TASK_ALWAYS_EAGER=True)
+class CeleryTaskMetricsTests(TestCase):
+    """Task runtime and outcome reach the registry"""
+
+    def test_success_records_runtime_and_state(self):
+        labels = (('task', cleanup_expired_sessions.name),)
+        runs, successes = histogram_count('celery_task_runtime_seconds', labels), counter(
+            'celery_tasks_total', labels + (('state', 'SUCCESS'),))
+
+        cleanup_expired_sessions.delay()
+
+        self.assertEqual(histogram_count('celery_task_runtime_seconds', labels), runs + 1)
+        self.assertEqual(counter('celery_tasks_total', labels + (('state', 'SUCCESS'),)), successes + 1)
+
+    def test_failure_is_counted(self):
+        user = User.objects.create_user(username='ada', email='ada@example.com', password='x')
+        labels = (('task', record_login_history.name),)
+        failures = counter('celery_task_failures_total', labels)
+        failed = counter('celery_tasks_total', labels + (('state', 'FAILURE'),))
+        runs = histogram_count('celery_task_runtime_seconds', labels)
+
+        with mock.patch('authentication.models.LoginHistory.objects.create', side_effect=RuntimeError('db down')):
+            record_login_history.delay(user.id, '10.0.0.1', 'Agent')
+
+        self.assertEqual(counter('celery_task_failures_total', labels), failures + 1)
+        self.assertEqual(counter('celery_tasks_total', labels + (('state', 'FAILURE'),)), failed + 1)
+        self.assertEqual(histogram_count('celery_task_runtime_seconds', labels), runs + 1)
+
+    def test_start_time_lives_on_the_request(self):
+        with mock.patch.object(cleanup_expired_sessions, 'run', side_effect=lambda: cleanup_expired_sessions.request):
+            request = cleanup_expired_sessions.delay().get()
+
+        self.assertTrue(hasattr(request, 'metrics_started_at'))
+
+
+class RegistryFileTests(TestCase):
+    """Snapshots of exited processes are folded, not lost or double counted"""
+
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def write_snapshot(self, name, value):
+        (self.directory / name).write_text(json.dumps({
+            'counters': [['jobs_total', [['queue', 'default']], value]],
+            'histograms': [],
+        }))
+
+    def total(self, registry):
+        counters, _ = registry.collect()
+        return counters.get(('jobs_total', (('queue', 'default'),)), 0)
+
+    def exited_pid(self):
+        process = subprocess.Popen(['true'])
+        process.wait()
+        return process.pid
+
+    def test_exited_process_is_folded_once(self):
+        registry = Registry(self.directory)
+        registry.inc('jobs_total', (('queue', 'default'),), 2)
+        self.write_snapshot(f'{self.exited_pid()}-1.json', 5)
+
+        self.assertEqual(self.total(registry), 7)
+        self.assertEqual(self.total(registry), 7)
+        self.assertEqual(
+            sorted(path.name for path in self.directory.glob('*.json')),
+            sorted([EXITED, f'{os.getpid()}-{registry._started}.json']),
+        )
+
+    def test_reused_pid_keeps_the_earlier_counts(self):
+        self.write_snapshot(f'{os.getpid()}-1.json', 5)
+        registry = Registry(self.directory)
+        registry.inc('jobs_total', (('queue', 'default'),))
+
+        self.assertEqual(self.total(registry), 6)
+        self.assertFalse((self.directory / f'{os.getpid()}-1.json').exists())
+
+    def test_half_finished_fold_is_not_counted_twice(self):
+        name = f'{self.exited_pid()}-1.json'
+        self.write_snapshot(name, 5)
+        (self.directory / EXITED).write_text(json.dumps({
+            'counters': [['jobs_total', [['queue', 'default']], 5]], 'histograms': [], 'folded': [name],
+        }))
+
+        self.assertEqual(self.total(Registry(self.directory)), 5)
+        self.assertFalse((self.directory / name).exists())
+
+
+class RequestMetricsMiddlewareTests(TestCase):
+    """Views are labelled by name and static files are not counted"""
+
+    def test_view_requests_are_counted(self):
+        labels = (('view', 'authentication:availability'), ('method', 'GET'), ('status', '200'))
+        before = counter('http_requests_total', labels)
+
+        response = self.client.get('/api/auth/availability/', {'username': 'ada'})
+
+        self.assertIn('Server-Timing', response)
+        self.assertEqual(counter('http_requests_total', labels), before + 1)
+
+    @override_settings(WHITENOISE_USE_FINDERS=True, WHITENOISE_AUTOREFRESH=True)
+    def test_static_files_are_not_counted(self):
+        before = sum(value for name, _, value in registry.snapshot()['counters'] if name == 'http_requests_total')
+
+        response = self.client.get('/static/admin/css/base.css')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(
+            sum(value for name, _, value in registry.snapshot()['counters'] if name == 'http_requests_total'), before,
+        )
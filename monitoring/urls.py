@@ -0,0 +1,9 @@
+from django.urls import path
+
+from .views import metrics
+
+app_name = 'monitoring'
+
+urlpatterns = [
+    path('', metrics, name='metrics'),
+]
@@ -0,0 +1,12 @@
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+from .metrics import registry
+
+
+def metrics(request):
+    """Prometheus scrape endpoint aggregating every worker process"""
+    token = settings.METRICS_AUTH_TOKEN
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,68 @@
+import gzip
+import os
+from pathlib import Path
+
+import brotli
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.template.loader import render_to_string
+from django.test import RequestFactory
+
+from backend.assets import AssetBuildError, build_page
+
+
+def _sizes(data):
+    return len(data), len(gzip.compress(data, 9)), len(brotli.compress(data))
+
+
+class Command(BaseCommand):
+    help = 'Extract and minify inline frontend assets, collect them fingerprinted and precompressed, and report payload sizes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('pages', nargs='*', default=['frontend/landing.html', 'frontend/auth-callback.html'])
+        parser.add_argument('--no-collect', action='store_true', help='Only build; skip collectstatic')
+
+    def handle(self, *args, **options):
+        results = []
+        for page in options['pages']:
+            source = Path(settings.BASE_DIR) / page
+            try:
+                template, assets = build_page(source, settings.FRONTEND_BUILD_DIR, settings.STATICFILES_DIRS)
+            except (OSError, AssetBuildError) as e:
+                raise CommandError(str(e))
+            results.append((source, template, assets))
+            self.stdout.write(f'built {os.path.relpath(template, settings.BASE_DIR)}')
+
+        if options['no_collect']:
+            return
+        call_command('collectstatic', interactive=False, verbosity=0)
+
+        request = RequestFactory().get('/')
+        for source, template, assets in results:
+            before = _sizes(source.read_bytes())
+            html = render_to_string(f'frontend/{template.name}', request=request).encode()
+            rows = [('page', *_sizes(html))]
+            for name, _, _ in assets:
+                stored = Path(settings.STATIC_ROOT) / staticfiles_storage.stored_name(name)
+                br = stored.with_name(stored.name + '.br')
+                gz = stored.with_name(stored.name + '.gz')
+                rows.append((
+                    stored.name,
+                    stored.stat().st_size,
+                    gz.stat().st_size if gz.exists() else 0,
+                    br.stat().st_size if br.exists() else 0,
+                ))
+
+            self.stdout.write(f'\n{source.name}')
+            self.stdout.write(f'  {"":<28} {"raw":>9} {"gzip":>9} {"brotli":>9}')
+            self.stdout.write(f'  {"before (inline)":<28} {before[0]:>9} {before[1]:>9} {before[2]:>9}')
+            for row in rows:
+                self.stdout.write(f'  {row[0]:<28} {row[1]:>9} {row[2]:>9} {row[3]:>9}')
+            # The page itself goes through gzip_page; assets are served as .br
+            first_visit = rows[0][2] + sum(row[3] for row in rows[1:])
+            self.stdout.write(self.style.SUCCESS(
+                f'  first visit {first_visit} bytes (was {before[0]} raw, {before[1]} gzip); '
+                f'repeat visit {rows[0][2]} bytes with assets cached as immutable'
+            ))
@@ -0,0 +1,14 @@
+from django.shortcuts import render
+from django.views.decorators.gzip import gzip_page
+
+
+@gzip_page
+def frontend_page(request, page):
+    """
+    Serve a page built by ``manage.py build_frontend`` at its original path.
+
+    The pages link to each other relatively (``landing.html``,
+    ``auth-callback.html``) and the OAuth redirect URI is derived from the
+    landing page's path, so they keep their ``.html`` names at the root.
+    """
+    return render(request, f'frontend/{page}.html')
@@ -0,0 +1,141 @@
+"""
+Bulk create/update/delete/reorder of a user's projects.
+
+Every operation validates the whole batch before touching the database and
+then applies it in one transaction with ``bulk_create``/``bulk_update``, so a
+batch either succeeds as a whole or leaves nothing behind. ``bulk_create`` and
+``bulk_update`` skip model signals, so the public page cache is invalidated
+once per batch here. Deletes go through the ORM collector so that uploads
+cascade; that sends ``post_delete`` per project, which does the invalidation.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from .cache import bump_projects_version
+from .models import Project
+from .serializers import ProjectBulkSerializer
+
+MAX_BATCH_SIZE = 1000
+WRITE_BATCH_SIZE = 500
+
+
+class BulkValidationError(Exception):
+    """Raised with per-item errors when any item in a batch is invalid"""
+
+    def __init__(self, errors):
+        super().__init__('Invalid batch')
+        self.errors = errors
+
+
+def _check_batch(items):
+    if not isinstance(items, list) or not items:
+        raise BulkValidationError([{'index': None, 'errors': 'Expected a non-empty list.'}])
+    if len(items) > MAX_BATCH_SIZE:
+        raise BulkValidationError([{'index': None, 'errors': f'At most {MAX_BATCH_SIZE} items per batch.'}])
+
+
+def _owned_projects(user, items, objects=False):
+    """
+    Map each item's id to the user's project, collecting per-item id errors.
+
+    With ``objects`` every item must be a dict carrying an ``id``; otherwise
+    items are the ids themselves.
+    """
+    errors = []
+    ids = []
+    seen = set()
+    for index, item in enumerate(items):
+        if objects and not isinstance(item, dict):
+            errors.append({'index': index, 'errors': {'non_field_errors': ['Expected an object with an id.']}})
+            ids.append(None)
+            continue
+        item_id = item.get('id') if objects else item
+        if not isinstance(item_id, int) or isinstance(item_id, bool):
+            errors.append({'index': index, 'errors': {'id': ['A valid integer is required.']}})
+        elif item_id in seen:
+            errors.append({'index': index, 'errors': {'id': ['Duplicate id in batch.']}})
+        else:
+            seen.add(item_id)
+        ids.append(item_id)
+
+    projects = Project.objects.filter(user=user).in_bulk(seen)
+    for index, item_id in enumerate(ids):
+        if item_id in seen and item_id not in projects:
+            errors.append({'index': index, 'errors': {'id': ['Project not found.']}})
+    return ids, projects, errors
+
+
+def bulk_create_projects(user, items):
+    _check_batch(items)
+    serializer = ProjectBulkSerializer(data=items, many=True)
+    if not serializer.is_valid():
+        raise BulkValidationError([
+            {'index': index, 'errors': errors}
+            for index, errors in enumerate(serializer.errors) if errors
+        ])
+
+    projects = [Project(user=user, **data) for data in serializer.validated_data]
+    with transaction.atomic():
+        created = Project.objects.bulk_create(projects, batch_size=WRITE_BATCH_SIZE)
+        transaction.on_commit(lambda: bump_projects_version(user.id))
+    return [{'index': index, 'id': project.pk, 'status': 'created'} for index, project in enumerate(created)]
+
+
+def bulk_update_projects(user, items):
+    _check_batch(items)
+    ids, projects, errors = _owned_projects(user, items, objects=True)
+
+    changes = []
+    for index, (item_id, item) in enumerate(zip(ids, items)):
+        project = projects.get(item_id)
+        if project is None:
+            continue
+        data = {k: v for k, v in item.items() if k != 'id'}
+        serializer = ProjectBulkSerializer(project, data=data, partial=True)
+        if not serializer.is_valid():
+            errors.append({'index': index, 'errors': serializer.errors})
+            continue
+        changes.append((index, project, serializer.validated_data))
+    if errors:
+        raise BulkValidationError(sorted(errors, key=lambda e: e['index']))
+
+    now = timezone.now()
+    fields = {'updated_at'}
+    for _, project, data in changes:
+        for field, value in data.items():
+            setattr(project, field, value)
+        fields.update(data)
+        project.updated_at = now
+
+    with transaction.atomic():
+        Project.objects.bulk_update([p for _, p, _ in changes], sorted(fields), batch_size=WRITE_BATCH_SIZE)
+        transaction.on_commit(lambda: bump_projects_version(user.id))
+    return [{'index': index, 'id': project.pk, 'status': 'updated'} for index, project, _ in changes]
+
+
+def bulk_delete_projects(user, ids):
+    _check_batch(ids)
+    ids, projects, errors = _owned_projects(user, ids)
+    if errors:
+        raise BulkValidationError(sorted(errors, key=lambda e: e['index']))
+
+    with transaction.atomic():
+        # post_delete bumps the projects version
+        Project.objects.filter(user=user, id__in=ids).delete()
+    return [{'index': index, 'id': item_id, 'status': 'deleted'} for index, item_id in enumerate(ids)]
+
+
+def bulk_reorder_projects(user, ids):
+    """Set ``position`` from the order of ``ids``"""
+    _check_batch(ids)
+    ids, projects, errors = _owned_projects(user, ids)
+    if errors:
+        raise BulkValidationError(sorted(errors, key=lambda e: e['index']))
+
+    for position, item_id in enumerate(ids):
+        projects[item_id].position = position
+
+    with transaction.atomic():
+        Project.objects.bulk_update(list(projects.values()), ['position'], batch_size=WRITE_BATCH_SIZE)
+        transaction.on_commit(lambda: bump_projects_version(user.id))
+    return [{'index': index, 'id': item_id, 'status': 'reordered'} for index, item_id in enumerate(ids)]
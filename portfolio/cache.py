@@ -0,0 +1,57 @@
+"""
+Cache keys for public portfolio pages.
+
+Every user has a projects version counter that is bumped whenever one of
+their projects, or the user's own public fields, is saved or deleted. Page
+fragments are keyed on it, so a change simply makes the old fragments
+unreachable instead of deleting them. Username lookups are deleted outright
+when the user is saved, so a rename or deactivation takes effect at once.
+"""
+import time
+
+from django.core.cache import cache
+
+USER_ID_TIMEOUT = 60 * 60
+PAGE_TIMEOUT = 10 * 60
+
+
+def username_key(username):
+    return f'portfolio:user_id:{username}'
+
+
+def version_key(user_id):
+    return f'portfolio:projects_version:{user_id}'
+
+
+def page_key(user_id, version, encoding):
+    return f'portfolio:page:{user_id}:{version}:{encoding}'
+
+
+def _fresh_version():
+    # Starting from the clock (not 1) means an evicted counter can never
+    # come back at a value that old fragments were cached under
+    return time.time_ns() // 1000
+
+
+def projects_version(user_id):
+    """Current projects version for a user"""
+    key = version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _fresh_version(), None)
+        version = cache.get(key)
+    return version
+
+
+def forget_usernames(usernames):
+    """Drop cached username -> id lookups"""
+    cache.delete_many([username_key(username) for username in usernames])
+
+
+def bump_projects_version(user_id):
+    """Invalidate every cached fragment built from the user's projects"""
+    key = version_key(user_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _fresh_version(), None)
@@ -0,0 +1,52 @@
+import json
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from rest_framework_simplejwt.tokens import RefreshToken
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Report query counts and latency of the bulk project endpoints'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=500)
+
+    def handle(self, *args, **options):
+        n = options['items']
+        with transaction.atomic():
+            user = User.objects.create_user(
+                username=f'bench-{uuid.uuid4().hex[:8]}',
+                email=f'bench-{uuid.uuid4().hex[:8]}@example.com',
+            )
+            token = str(RefreshToken.for_user(user).access_token)
+            client = Client(HTTP_HOST='localhost', HTTP_AUTHORIZATION=f'Bearer {token}')
+
+            items = [
+                {'title': f'Project {i}', 'description': 'Bulk benchmark', 'technologies': ['Django']}
+                for i in range(n)
+            ]
+            response = self._call(client, 'post', '/api/portfolio/projects/bulk/', {'items': items}, 'create')
+            ids = [r['id'] for r in response.json()['results']]
+
+            updates = [{'id': pk, 'is_featured': True, 'technologies': ['Django', 'DRF']} for pk in ids]
+            self._call(client, 'patch', '/api/portfolio/projects/bulk/', {'items': updates}, 'update')
+            self._call(client, 'post', '/api/portfolio/projects/bulk/reorder/', {'ids': ids[::-1]}, 'reorder')
+            self._call(client, 'post', '/api/portfolio/projects/bulk/delete/', {'ids': ids}, 'delete')
+            transaction.set_rollback(True)
+
+    def _call(self, client, method, path, payload, label):
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            response = getattr(client, method)(path, json.dumps(payload), content_type='application/json')
+            elapsed = time.perf_counter() - start
+        if response.status_code >= 400:
+            self.stderr.write(f'{label}: HTTP {response.status_code} {response.content[:200]!r}')
+        self.stdout.write(f'{label:<8} 1 request   {len(queries):>3} queries   {elapsed * 1000:7.1f} ms')
+        return response
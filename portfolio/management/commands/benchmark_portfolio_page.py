@@ -0,0 +1,56 @@
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from portfolio.models import Project
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Measure queries, latency and size of cold vs warm public portfolio pages'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--projects', type=int, default=30)
+        parser.add_argument('--requests', type=int, default=500)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            user = User.objects.create_user(
+                username=f'bench-{uuid.uuid4().hex[:8]}',
+                email=f'bench-{uuid.uuid4().hex[:8]}@example.com',
+                first_name='Bench', last_name='Mark',
+            )
+            Project.objects.bulk_create([
+                Project(
+                    user=user, title=f'Project {i}', description='A portfolio project. ' * 20,
+                    technologies=['Django', 'Tailwind', 'Celery'], is_featured=i % 5 == 0,
+                )
+                for i in range(options['projects'])
+            ])
+            cache.clear()
+            client = Client(HTTP_HOST='localhost')
+            path = f'/u/{user.username}/'
+
+            for label, encoding in (('identity', ''), ('gzip', 'gzip')):
+                with CaptureQueriesContext(connection) as cold_queries:
+                    start = time.perf_counter()
+                    response = client.get(path, HTTP_ACCEPT_ENCODING=encoding)
+                    cold = time.perf_counter() - start
+                with CaptureQueriesContext(connection) as warm_queries:
+                    start = time.perf_counter()
+                    for _ in range(options['requests']):
+                        client.get(path, HTTP_ACCEPT_ENCODING=encoding)
+                    warm = (time.perf_counter() - start) / options['requests']
+                self.stdout.write(
+                    f'{label:<9} {len(response.content):>7} bytes   '
+                    f'cold {cold * 1000:6.2f} ms / {len(cold_queries)} queries   '
+                    f'warm {warm * 1000:6.3f} ms / {len(warm_queries) / options["requests"]:.0f} queries'
+                )
+            transaction.set_rollback(True)
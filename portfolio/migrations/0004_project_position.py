@@ -0,0 +1,22 @@
+# Generated by Django 4.2.25 on 2026-10-19 11:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio', '0003_upload'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='position',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AlterModelOptions(
+            name='project',
+            options={'ordering': ['position', '-created_at']},
+        ),
+    ]
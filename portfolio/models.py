@@ -1,5 +1,7 @@
+import uuid
 from django.db import models
 from django.contrib.auth import get_user_model
+from backend.images import srcset
 
 User = get_user_model()
 
@@ -10,16 +12,45 @@ class Project(models.Model):
     title = models.CharField(max_length=200)
     description = models.TextField()
     image = models.ImageField(upload_to='projects/', blank=True, null=True)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     url = models.URLField(blank=True, null=True)
     github_url = models.URLField(blank=True, null=True)
     technologies = models.JSONField(default=list)
     is_featured = models.BooleanField(default=False)
+    position = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         db_table = 'projects'
-        ordering = ['-created_at']
+        ordering = ['position', '-created_at']
     
     def __str__(self):
         return self.title
+    
+    @property
+    def image_srcset(self):
+        return srcset(self.image_variants)
+
+
+class Upload(models.Model):
+    """Resumable chunked upload, assembled on disk until complete"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='uploads')
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='uploads', blank=True, null=True)
+    filename = models.CharField(max_length=255)
+    size = models.BigIntegerField()
+    offset = models.BigIntegerField(default=0)
+    file = models.FileField(upload_to='projects/', blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(blank=True, null=True)
+    
+    class Meta:
+        db_table = 'uploads'
+    
+    def __str__(self):
+        return f"{self.filename} ({self.offset}/{self.size})"
+    
+    @property
+    def is_complete(self):
+        return self.completed_at is not None
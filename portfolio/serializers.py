@@ -0,0 +1,47 @@
+from django.conf import settings
+from rest_framework import serializers
+
+from backend.fields import ImageVariantsField
+from .models import Project, Upload
+
+
+class ProjectSerializer(serializers.ModelSerializer):
+    """Serializer for Project model"""
+    image_srcset = ImageVariantsField(source='image_variants')
+    
+    class Meta:
+        model = Project
+        fields = ('id', 'title', 'description', 'image', 'image_srcset', 'url',
+                  'github_url', 'technologies', 'is_featured', 'position',
+                  'created_at', 'updated_at')
+        read_only_fields = ('id', 'created_at', 'updated_at')
+
+
+class ProjectListSerializer(ProjectSerializer):
+    """Project list representation - variants only, never the original upload"""
+    class Meta(ProjectSerializer.Meta):
+        fields = tuple(f for f in ProjectSerializer.Meta.fields if f != 'image')
+
+
+class ProjectBulkSerializer(ProjectSerializer):
+    """Per-item serializer for bulk operations (JSON only, so no image upload)"""
+    class Meta(ProjectSerializer.Meta):
+        fields = tuple(f for f in ProjectSerializer.Meta.fields if f != 'image')
+
+
+class UploadSerializer(serializers.ModelSerializer):
+    """Serializer for resumable uploads"""
+    class Meta:
+        model = Upload
+        fields = ('id', 'filename', 'size', 'offset', 'project', 'file', 'created_at', 'completed_at')
+        read_only_fields = ('id', 'offset', 'file', 'created_at', 'completed_at')
+    
+    def validate_size(self, value):
+        if value <= 0 or value > settings.UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError(f"Size must be between 1 and {settings.UPLOAD_MAX_SIZE} bytes.")
+        return value
+    
+    def validate_project(self, value):
+        if value is not None and value.user_id != self.context['request'].user.id:
+            raise serializers.ValidationError("Project not found.")
+        return value
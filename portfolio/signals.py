@@ -0,0 +1,68 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from backend.images import needs_variants
+from .cache import bump_projects_version, forget_usernames
+from .models import Project
+from .tasks import generate_project_image_variants
+
+User = get_user_model()
+
+# User fields the public page shows or depends on
+PUBLIC_USER_FIELDS = {'username', 'first_name', 'last_name', 'profile_picture', 'profile_picture_variants', 'is_active'}
+
+
+@receiver(post_save, sender=Project)
+def queue_project_image_variants(sender, instance, **kwargs):
+    """Build image variants once per uploaded project image"""
+    if needs_variants(instance.image, instance.image_variants):
+        project_id = instance.pk
+        transaction.on_commit(lambda: generate_project_image_variants.delay(project_id))
+    elif not instance.image and instance.image_variants:
+        instance.image_variants = {}
+        Project.objects.filter(pk=instance.pk).update(image_variants={})
+
+
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+def invalidate_public_portfolio(sender, instance, **kwargs):
+    """Bump the owner's projects version so cached pages are rebuilt"""
+    user_id = instance.user_id
+    transaction.on_commit(lambda: bump_projects_version(user_id))
+
+
+def _public_values(instance):
+    # __dict__ so deferred fields aren't fetched; files compare by name
+    values = {}
+    for name in PUBLIC_USER_FIELDS:
+        value = instance.__dict__.get(name)
+        values[name] = getattr(value, 'name', value)
+    return values
+
+
+@receiver(post_init, sender=User)
+def remember_public_fields(sender, instance, **kwargs):
+    """Loaded public fields, so saves can tell whether the page changed"""
+    instance._public_values = _public_values(instance)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_public_profile(sender, instance, created=False, update_fields=None, **kwargs):
+    """Rebuild the user's page and forget their username lookups"""
+    if update_fields is not None and not PUBLIC_USER_FIELDS & set(update_fields):
+        return
+    values = _public_values(instance)
+    if kwargs['signal'] is post_save and not created and values == instance._public_values:
+        # Full saves that only touch private fields (login attempts, passwords)
+        return
+    user_id = instance.pk
+    usernames = {instance.username, instance._public_values['username']} - {None}
+    instance._public_values = values
+
+    def invalidate():
+        forget_usernames(usernames)
+        bump_projects_version(user_id)
+    transaction.on_commit(invalidate)
@@ -4,7 +4,7 @@ from django.contrib.auth import get_user_model
 User = get_user_model()
 
 
-@shared_task
+@shared_task(ignore_result=False)
 def generate_daily_report():
     """Generate daily portfolio report"""
     user_count = User.objects.count()
@@ -12,3 +12,55 @@ def generate_daily_report():
     print(f"Daily Report: Total users: {user_count}")
     
     return f"Daily report generated: {user_count} users"
+
+
+@shared_task(ignore_result=True)
+def generate_project_image_variants(project_id):
+    """Generate resized WebP/JPEG variants of a project image"""
+    from PIL import UnidentifiedImageError
+    from backend.images import PROJECT_IMAGE_WIDTHS, build_variants
+    from .cache import bump_projects_version
+    from .models import Project
+    
+    project = Project.objects.filter(id=project_id).only('image', 'user').first()
+    if project is None or not project.image:
+        return
+    
+    try:
+        variants = build_variants(project.image, PROJECT_IMAGE_WIDTHS)
+    except UnidentifiedImageError:
+        # Demo videos and other non-image media have no variants
+        return
+    # Only attach if the image hasn't been replaced in the meantime;
+    # update() skips post_save, so refresh cached pages explicitly
+    if Project.objects.filter(id=project_id, image=project.image.name).update(image_variants=variants):
+        bump_projects_version(project.user_id)
+
+
+@shared_task(ignore_result=False)
+def cleanup_stale_uploads():
+    """Delete resumable uploads that were abandoned before completion"""
+    from datetime import timedelta
+    from django.conf import settings
+    from django.utils import timezone
+    from .models import Upload
+    from .uploads import UploadError, discard, finalize, locked
+    
+    cutoff = timezone.now() - timedelta(hours=settings.UPLOAD_EXPIRY_HOURS)
+    stale = Upload.objects.filter(completed_at__isnull=True, created_at__lt=cutoff)
+    count = finished = 0
+    for upload in stale.iterator():
+        try:
+            if upload.offset == upload.size:
+                # All bytes arrived but finalize failed; finish it instead
+                with locked(upload):
+                    finalize(upload)
+                finished += 1
+            else:
+                discard(upload)
+                count += 1
+        except UploadError:
+            # Completed or cancelled since the query
+            continue
+    
+    return f"Removed {count} stale uploads, finalized {finished}"
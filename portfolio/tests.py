@@ -1,3 +1,433 @@
-from django.test import TestCase
+import fcntl
+import io
+import math
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.db.models.sql.constants import GET_ITERATOR_CHUNK_SIZE
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+
+from . import uploads
+from .bulk import (
+    WRITE_BATCH_SIZE, bulk_create_projects, bulk_delete_projects, bulk_reorder_projects, bulk_update_projects,
+)
+from .models import Project, Upload
+from .tasks import cleanup_stale_uploads, generate_project_image_variants
+
+User = get_user_model()
+
+
+class BulkProjectTests(TestCase):
+    """
+    Bulk operations cost one query per write batch, not one per item.
+
+    Batches are capped by WRITE_BATCH_SIZE and by the backend's parameter
+    limit (999 on SQLite), so the expected counts are derived from both.
+    """
+
+    size = 500
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='ada', email='ada@example.com', password='x')
+        self.other = User.objects.create_user(username='bob', email='bob@example.com', password='x')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def make_projects(self, count, user=None):
+        return Project.objects.bulk_create([
+            Project(user=user or self.user, title=f'Project {i}', description='...', position=i)
+            for i in range(count)
+        ])
+
+    def batches(self, fields, objs, limit=WRITE_BATCH_SIZE):
+        size = min(limit, connection.ops.bulk_batch_size(fields, objs) or len(objs))
+        return math.ceil(len(objs) / size)
+
+    def lookups(self, ids):
+        # in_bulk() splits the ownership lookup at the backend's parameter limit
+        return math.ceil(len(ids) / (connection.features.max_query_params or len(ids)))
+
+    def test_create(self):
+        items = [{'title': f'Project {i}', 'description': '...'} for i in range(self.size)]
+        fields = [field for field in Project._meta.concrete_fields if not field.primary_key]
+        inserts = self.batches(fields, items)
+
+        # savepoint, inserts, release
+        with self.assertNumQueries(1 + inserts + 1):
+            results = bulk_create_projects(self.user, items)
+
+        self.assertLess(inserts, self.size)
+        self.assertEqual(len(results), self.size)
+        self.assertEqual(Project.objects.filter(user=self.user).count(), self.size)
+
+    def test_update(self):
+        projects = self.make_projects(self.size)
+        items = [{'id': project.pk, 'title': f'Renamed {project.pk}'} for project in projects]
+        updates = self.batches(['pk', 'pk', 'title', 'updated_at'], projects)
+
+        # ownership lookup, savepoint, updates, release
+        with self.assertNumQueries(self.lookups(projects) + 1 + updates + 1):
+            bulk_update_projects(self.user, items)
+
+        self.assertEqual(Project.objects.filter(title__startswith='Renamed').count(), self.size)
+
+    def test_reorder(self):
+        projects = self.make_projects(self.size)
+        ids = [project.pk for project in reversed(projects)]
+        updates = self.batches(['pk', 'pk', 'position'], projects)
+
+        # ownership lookup, savepoint, updates, release
+        with self.assertNumQueries(self.lookups(ids) + 1 + updates + 1):
+            bulk_reorder_projects(self.user, ids)
+
+        self.assertEqual(Project.objects.get(pk=ids[0]).position, 0)
+        self.assertEqual(Project.objects.get(pk=ids[-1]).position, self.size - 1)
+
+    def test_delete(self):
+        projects = self.make_projects(self.size)
+        ids = [project.pk for project in projects]
+        # The collector deletes uploads per parameter-limited batch and projects per GET_ITERATOR_CHUNK_SIZE
+        uploads = self.batches(['project'], projects, limit=len(projects))
+        deletes = math.ceil(self.size / GET_ITERATOR_CHUNK_SIZE)
+
+        # ownership lookup, savepoint, collect projects, delete uploads, delete projects, release
+        with self.assertNumQueries(self.lookups(ids) + 1 + 1 + uploads + deletes + 1):
+            bulk_delete_projects(self.user, ids)
+
+        self.assertFalse(Project.objects.filter(user=self.user).exists())
+
+    def test_bare_id_in_update_is_a_validation_error(self):
+        project = self.make_projects(1)[0]
+
+        response = self.client.patch('/api/portfolio/projects/bulk/', {'items': [project.pk]}, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['errors'][0]['index'], 0)
+
+    def test_other_users_projects_are_not_found(self):
+        project = self.make_projects(1, user=self.other)[0]
+
+        response = self.client.post('/api/portfolio/projects/bulk/delete/', {'ids': [project.pk]}, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(Project.objects.filter(pk=project.pk).exists())
+
+    def test_duplicate_ids_are_rejected(self):
+        project = self.make_projects(1)[0]
+
+        response = self.client.post(
+            '/api/portfolio/projects/bulk/delete/', {'ids': [project.pk, project.pk]}, format='json',
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['errors'], [{'index': 1, 'errors': {'id': ['Duplicate id in batch.']}}])
+
+
+class ResumableUploadTests(TestCase):
+    """Chunks are serialised per upload and finishing an upload can be retried"""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        settings_override = override_settings(
+            MEDIA_ROOT=str(Path(self.tmp) / 'media'),
+            UPLOAD_PARTIAL_DIR=str(Path(self.tmp) / 'partial'),
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = User.objects.create_user(username='ada', email='ada@example.com', password='x')
+        self.project = Project.objects.create(user=self.user, title='Demo', description='...')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def png(self):
+        buffer = io.BytesIO()
+        Image.new('RGB', (8, 8), 'red').save(buffer, 'PNG')
+        return buffer.getvalue()
+
+    def start(self, filename, size):
+        response = self.client.post(
+            '/api/portfolio/uploads/', {'filename': filename, 'size': size, 'project': self.project.pk}, format='json',
+        )
+        self.assertEqual(response.status_code, 201)
+        return response['Location']
+
+    def send(self, location, offset, data):
+        return self.client.generic(
+            'PATCH', location, data, content_type='application/offset+octet-stream', HTTP_UPLOAD_OFFSET=str(offset),
+        )
+
+    def test_image_upload_becomes_project_image(self):
+        data = self.png()
+        location = self.start('shot.png', len(data))
+
+        self.assertEqual(self.send(location, 0, data[:20]).status_code, 204)
+        response = self.send(location, 20, data[20:])
+
+        self.assertEqual(response.status_code, 204)
+        self.project.refresh_from_db()
+        upload = Upload.objects.get()
+        self.assertEqual(self.project.image.name, upload.file.name)
+        self.assertEqual(Path(upload.file.path).read_bytes(), data)
+        self.assertEqual(list(Path(self.tmp, 'partial').iterdir()), [])
+
+    def test_video_is_not_attached_as_project_image(self):
+        data = b'\x00\x00\x00\x18ftypmp42' + b'\x00' * 100
+        location = self.start('demo.mp4', len(data))
+
+        self.assertEqual(self.send(location, 0, data).status_code, 204)
+
+        self.project.refresh_from_db()
+        self.assertFalse(self.project.image)
+        self.assertTrue(Upload.objects.get().is_complete)
+
+    def test_stale_offset_is_rejected_after_another_chunk(self):
+        data = self.png()
+        location = self.start('shot.png', len(data))
+        upload = Upload.objects.get()
+        self.send(location, 0, data[:20])
+
+        # The in-memory copy still says offset 0; the locked reload catches it
+        with self.assertRaises(uploads.UploadError) as raised:
+            uploads.write_chunk(upload, io.BytesIO(data[:20]), 0, 20)
+
+        self.assertEqual(raised.exception.status, 409)
+        self.assertEqual(Upload.objects.get().offset, 20)
+
+    def test_chunk_is_written_under_an_exclusive_lock(self):
+        data = self.png()
+        self.start('shot.png', len(data))
+        upload = Upload.objects.get()
+        contended = []
+
+        class Stream(io.BytesIO):
+            def read(stream, size=-1):
+                with open(uploads.lock_path(upload), 'a') as other:
+                    try:
+                        fcntl.flock(other, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except BlockingIOError:
+                        contended.append(True)
+                return super().read(size)
+
+        uploads.write_chunk(upload, Stream(data[:20]), 0, 20)
+
+        self.assertTrue(contended)
+
+    def test_failed_finalize_is_retried_by_an_empty_chunk(self):
+        data = self.png()
+        location = self.start('shot.png', len(data))
+
+        with mock.patch.object(uploads, 'is_image', side_effect=OSError('disk full')):
+            with self.assertRaises(OSError):
+                self.send(location, 0, data)
+        upload = Upload.objects.get()
+        self.assertEqual(upload.offset, len(data))
+        self.assertFalse(upload.is_complete)
+
+        response = self.send(location, len(data), b'')
+
+        self.assertEqual(response.status_code, 204)
+        upload.refresh_from_db()
+        self.project.refresh_from_db()
+        self.assertTrue(upload.is_complete)
+        self.assertEqual(self.project.image.name, upload.file.name)
+        self.assertEqual(Path(upload.file.path).read_bytes(), data)
+
+    def test_cleanup_finishes_uploads_stuck_after_the_last_byte(self):
+        data = self.png()
+        location = self.start('shot.png', len(data))
+        with mock.patch.object(uploads, 'is_image', side_effect=OSError('disk full')):
+            with self.assertRaises(OSError):
+                self.send(location, 0, data)
+        Upload.objects.update(created_at='2000-01-01T00:00:00Z')
+
+        self.assertEqual(cleanup_stale_uploads(), 'Removed 0 stale uploads, finalized 1')
+        self.assertTrue(Upload.objects.get().is_complete)
+
+
+class PublicPortfolioTests(TestCase):
+    """Warm pages come from the cache alone and follow changes to the owner"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='ada', email='ada@example.com', password='x', first_name='Ada', last_name='Lovelace',
+        )
+        Project.objects.create(user=self.user, title='Engine', description='Analytical')
+
+    def get(self, username='ada', encoding='identity', **headers):
+        return self.client.get(f'/u/{username}/', HTTP_ACCEPT_ENCODING=encoding, **headers)
+
+    def test_warm_page_makes_no_queries(self):
+        for encoding in ('gzip', 'identity'):
+            with self.subTest(encoding=encoding):
+                self.assertEqual(self.get(encoding=encoding).status_code, 200)
+                with self.assertNumQueries(0):
+                    response = self.get(encoding=encoding)
+                self.assertEqual(response.status_code, 200)
+
+    def test_etag_depends_on_encoding(self):
+        plain, gzipped = self.get(encoding='identity'), self.get(encoding='gzip')
+
+        self.assertNotEqual(plain['ETag'], gzipped['ETag'])
+        self.assertEqual(self.get(encoding='identity', HTTP_IF_NONE_MATCH=plain['ETag']).status_code, 304)
+        self.assertEqual(self.get(encoding='gzip', HTTP_IF_NONE_MATCH=plain['ETag']).status_code, 200)
+
+    def test_profile_change_rebuilds_the_page(self):
+        self.assertContains(self.get(), 'Lovelace')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.last_name = 'King'
+            self.user.save()
+
+        self.assertContains(self.get(), 'King')
+
+    def test_rename_and_deactivation_take_effect_at_once(self):
+        self.assertEqual(self.get().status_code, 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.username = 'countess'
+            self.user.save()
+        self.assertEqual(self.get('ada').status_code, 404)
+        self.assertEqual(self.get('countess').status_code, 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save(update_fields=['is_active'])
+        self.assertEqual(self.get('countess').status_code, 404)
+
+    @override_settings(CELERY_TASK_ALWAYS_EAGER=True)
+    def test_logging_in_does_not_invalidate(self):
+        etag = self.get()['ETag']
+        client = APIClient()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            failed = client.post('/api/auth/login/', {'email': 'ada@example.com', 'password': 'wrong'}, format='json')
+        with self.captureOnCommitCallbacks(execute=True):
+            succeeded = client.post('/api/auth/login/', {'email': 'ada@example.com', 'password': 'x'}, format='json')
+
+        self.assertEqual((failed.status_code, succeeded.status_code), (401, 200))
+        self.assertEqual(self.get()['ETag'], etag)
+
+    def test_full_save_of_private_fields_does_not_invalidate(self):
+        etag = self.get()['ETag']
+        user = User.objects.get(pk=self.user.pk)
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            user.set_password('changed')
+            user.save()
+
+        self.assertEqual(callbacks, [])
+        self.assertEqual(self.get()['ETag'], etag)
+
+    def test_last_login_does_not_invalidate(self):
+        etag = self.get()['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.user.last_login = timezone.now()
+            self.user.save(update_fields=['last_login'])
+
+        self.assertEqual(callbacks, [])
+        self.assertEqual(self.get()['ETag'], etag)
+
+
+@override_settings(CELERY_TASK_ALWAYS_EAGER=True)
+class ProjectCrudTests(TestCase):
+    """Project endpoints stay per-user and keep image variants in step with the image"""
+
+    def setUp(self):
+        cache.clear()
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        settings_override = override_settings(MEDIA_ROOT=self.tmp)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = User.objects.create_user(username='ada', email='ada@example.com', password='x')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def png(self, color='red'):
+        buffer = io.BytesIO()
+        Image.new('RGB', (800, 400), color).save(buffer, 'PNG')
+        return SimpleUploadedFile('shot.png', buffer.getvalue(), content_type='image/png')
+
+    def create(self, **data):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                '/api/portfolio/projects/',
+                {'title': 'Engine', 'description': 'Analytical', **data},
+                format='multipart',
+            )
+        self.assertEqual(response.status_code, 201)
+        return Project.objects.get(pk=response.json()['id'])
+
+    def test_create_with_image_builds_variants(self):
+        project = self.create(image=self.png())
+
+        self.assertEqual(project.image_variants['source'], project.image.name)
+        response = self.client.get(f'/api/portfolio/projects/{project.pk}/')
+        self.assertIn('640w', response.json()['image_srcset']['jpeg'])
+
+    def test_list_has_variants_but_not_the_original(self):
+        self.create(image=self.png())
+
+        item = self.client.get('/api/portfolio/projects/').json()['results'][0]
+
+        self.assertNotIn('image', item)
+        self.assertIn('thumbnail', item['image_srcset'])
+
+    def test_editing_text_does_not_rebuild_variants(self):
+        project = self.create(image=self.png())
+
+        with mock.patch.object(generate_project_image_variants, 'delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.patch(f'/api/portfolio/projects/{project.pk}/', {'title': 'Mill'}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        delay.assert_not_called()
+
+    def test_replacing_and_clearing_the_image(self):
+        project = self.create(image=self.png())
+        old = project.image_variants
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f'/api/portfolio/projects/{project.pk}/', {'image': self.png('blue')}, format='multipart')
+        project.refresh_from_db()
+        self.assertEqual(project.image_variants['source'], project.image.name)
+        self.assertNotEqual(project.image_variants['variants'], old['variants'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f'/api/portfolio/projects/{project.pk}/', {'image': ''}, format='multipart')
+        project.refresh_from_db()
+        self.assertFalse(project.image)
+        self.assertEqual(project.image_variants, {})
+
+    def test_other_users_projects_are_invisible(self):
+        other = User.objects.create_user(username='bob', email='bob@example.com', password='x')
+        project = Project.objects.create(user=other, title='Secret', description='...')
+
+        self.assertEqual(self.client.get('/api/portfolio/projects/').json()['results'], [])
+        self.assertEqual(self.client.get(f'/api/portfolio/projects/{project.pk}/').status_code, 404)
+        self.assertEqual(self.client.delete(f'/api/portfolio/projects/{project.pk}/').status_code, 404)
+        self.assertTrue(Project.objects.filter(pk=project.pk).exists())
+
+    def test_delete(self):
+        project = self.create()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(f'/api/portfolio/projects/{project.pk}/')
+
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(Project.objects.filter(pk=project.pk).exists())
@@ -0,0 +1,195 @@
+"""
+Resumable chunked uploads using tus-style offsets.
+
+Each PATCH carries ``Upload-Offset`` and, optionally, an ``Upload-Checksum``
+(``<algorithm> <base64 digest>``) for that chunk. The body is copied from
+the request stream to a partial file in small blocks, so worker memory stays
+flat however large the upload is. When the last byte arrives the partial file
+is moved into media storage with a single atomic rename.
+
+Each chunk is written under an exclusive ``flock`` on a per-upload lock file, so
+``UPLOAD_PARTIAL_DIR`` must be a local (or otherwise flock-capable)
+filesystem shared by every web worker. Final files are written through
+``default_storage.path()``, so this needs a filesystem-backed storage.
+Only files Pillow can open become the project's image; videos stay on the
+upload's own ``file``.
+"""
+import base64
+import binascii
+import fcntl
+import hashlib
+import os
+import shutil
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from django.utils.text import get_valid_filename
+from PIL import Image
+
+from .models import Upload
+
+READ_SIZE = 64 * 1024
+CHECKSUM_ALGORITHMS = {
+    'md5': hashlib.md5,
+    'sha1': hashlib.sha1,
+    'sha256': hashlib.sha256,
+}
+
+
+class UploadError(Exception):
+    """Upload request rejected; ``status`` is the HTTP status to return"""
+
+    def __init__(self, message, status):
+        super().__init__(message)
+        self.status = status
+
+
+def partial_path(upload):
+    return Path(settings.UPLOAD_PARTIAL_DIR) / f'{upload.id.hex}.part'
+
+
+def parse_checksum(header):
+    """Parse an ``Upload-Checksum`` header into (hasher, expected digest)"""
+    if not header:
+        return None
+    try:
+        algorithm, encoded = header.split(' ', 1)
+        expected = base64.b64decode(encoded, validate=True)
+    except (ValueError, binascii.Error):
+        raise UploadError('Malformed Upload-Checksum header', 400)
+    if algorithm not in CHECKSUM_ALGORITHMS:
+        raise UploadError('Unsupported checksum algorithm', 400)
+    return CHECKSUM_ALGORITHMS[algorithm](), expected
+
+
+def lock_path(upload):
+    return Path(settings.UPLOAD_PARTIAL_DIR) / f'{upload.id.hex}.lock'
+
+
+@contextmanager
+def locked(upload):
+    """
+    Hold an exclusive ``flock`` for the upload and refresh ``upload`` under it.
+
+    The lock is held across the seek, truncate, write and the offset update,
+    so two requests for the same upload run one after the other even in
+    different worker processes. ``upload`` is reloaded once the lock is held,
+    because the caller's copy may predate the request that held it.
+    """
+    path = lock_path(upload)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            upload.refresh_from_db(fields=['offset', 'file', 'completed_at'])
+        except Upload.DoesNotExist:
+            path.unlink(missing_ok=True)
+            raise UploadError('Upload not found', 404)
+        if upload.is_complete:
+            path.unlink(missing_ok=True)
+            raise UploadError('Upload already complete', 409)
+        yield
+        if upload.is_complete or upload.pk is None:
+            # Later holders see the final state and bail, so the file can go
+            path.unlink(missing_ok=True)
+
+
+def write_chunk(upload, stream, offset, length, checksum=None):
+    """Copy ``length`` bytes from ``stream`` to the upload at ``offset``"""
+    with locked(upload):
+        if offset != upload.offset:
+            raise UploadError('Upload-Offset does not match the current offset', 409)
+        if length > upload.size - upload.offset:
+            raise UploadError('Chunk exceeds the declared upload size', 413)
+        if upload.offset == upload.size:
+            # Every byte arrived but an earlier finalize failed; retry it
+            finalize(upload)
+            return upload.offset
+
+        path = partial_path(upload)
+        hasher, expected = checksum or (None, None)
+        with open(path, 'r+b' if path.exists() else 'wb') as f:
+            # Drop anything past the committed offset left by an aborted request
+            f.seek(offset)
+            f.truncate()
+            remaining = length
+            while remaining and stream is not None:
+                data = stream.read(min(READ_SIZE, remaining))
+                if not data:
+                    break
+                f.write(data)
+                if hasher:
+                    hasher.update(data)
+                remaining -= len(data)
+
+            if hasher and (remaining or hasher.digest() != expected):
+                f.truncate(offset)
+                raise UploadError('Checksum mismatch', 460)
+            f.flush()
+            os.fsync(f.fileno())
+
+        new_offset = offset + length - remaining
+        if not Upload.objects.filter(pk=upload.pk, offset=offset).update(offset=new_offset):
+            raise UploadError('Upload was modified by a concurrent request', 409)
+        upload.offset = new_offset
+
+        if upload.offset == upload.size:
+            finalize(upload)
+    return upload.offset
+
+
+def is_image(path):
+    """Whether Pillow recognises the file; videos and other media are not attached as project images"""
+    try:
+        with Image.open(path) as image:
+            image.verify()
+    except (OSError, SyntaxError, ValueError, Image.DecompressionBombError):
+        return False
+    return True
+
+
+def finalize(upload):
+    """
+    Move the completed file into media storage and attach images to the project.
+
+    Each step can be repeated, so a finalize that failed part-way is finished
+    by the next call: the storage name is reserved and saved before the move,
+    the move is skipped once the partial file is gone, and ``completed_at`` is
+    set last. Call with the upload ``locked``.
+    """
+    if not upload.file:
+        upload_to = Upload._meta.get_field('file').upload_to
+        # Reserve the name with an empty placeholder so no other upload takes it
+        upload.file.name = default_storage.save(upload_to + get_valid_filename(upload.filename), ContentFile(b''))
+        upload.save(update_fields=['file'])
+
+    target = Path(default_storage.path(upload.file.name))
+    partial = partial_path(upload)
+    if partial.exists():
+        try:
+            os.replace(partial, target)
+        except OSError:
+            # Partial dir on another filesystem; fall back to copy + delete
+            shutil.move(partial, target)
+    elif not target.exists() or target.stat().st_size != upload.size:
+        raise UploadError('Upload data is missing', 410)
+
+    if upload.project_id and is_image(target):
+        project = upload.project
+        if project.image.name != upload.file.name:
+            project.image.name = upload.file.name
+            project.save(update_fields=['image', 'updated_at'])
+
+    upload.completed_at = timezone.now()
+    upload.save(update_fields=['completed_at'])
+
+
+def discard(upload):
+    """Delete an unfinished upload and its partial file"""
+    with locked(upload):
+        partial_path(upload).unlink(missing_ok=True)
+        upload.delete()
@@ -1,7 +1,21 @@
 from django.urls import path
+from .views import (
+    ProjectListCreateView, ProjectDetailView,
+    ProjectBulkView, ProjectBulkDeleteView, ProjectBulkReorderView,
+    UploadCreateView, UploadDetailView
+)
 
 app_name = 'portfolio'
 
 urlpatterns = [
-    # Portfolio endpoints will be added here
+    # Projects
+    path('projects/', ProjectListCreateView.as_view(), name='project-list'),
+    path('projects/<int:pk>/', ProjectDetailView.as_view(), name='project-detail'),
+    path('projects/bulk/', ProjectBulkView.as_view(), name='project-bulk'),
+    path('projects/bulk/delete/', ProjectBulkDeleteView.as_view(), name='project-bulk-delete'),
+    path('projects/bulk/reorder/', ProjectBulkReorderView.as_view(), name='project-bulk-reorder'),
+    
+    # Resumable uploads
+    path('uploads/', UploadCreateView.as_view(), name='upload-create'),
+    path('uploads/<uuid:upload_id>/', UploadDetailView.as_view(), name='upload-detail'),
 ]
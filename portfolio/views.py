@@ -1,3 +1,215 @@
-from django.shortcuts import render
+import gzip
 
-# Create your views here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.http import Http404, HttpResponse, HttpResponseNotModified
+from django.shortcuts import get_object_or_404
+from django.template.loader import render_to_string
+from django.utils.functional import SimpleLazyObject
+from django.views.decorators.http import require_safe
+from django.urls import reverse
+from rest_framework import generics, permissions, status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from drf_yasg.utils import swagger_auto_schema
+
+from .bulk import (
+    BulkValidationError, bulk_create_projects, bulk_delete_projects,
+    bulk_reorder_projects, bulk_update_projects
+)
+from .cache import PAGE_TIMEOUT, USER_ID_TIMEOUT, page_key, projects_version, username_key
+from .models import Project, Upload
+from .serializers import ProjectSerializer, ProjectListSerializer, UploadSerializer
+from .uploads import UploadError, discard, parse_checksum, write_chunk
+
+User = get_user_model()
+
+
+@require_safe
+def public_portfolio(request, username):
+    """
+    Server-rendered public portfolio page.
+
+    Warm requests are answered from the cache alone: the username lookup,
+    the projects version and the (precompressed) page body are all cached,
+    and the database is only touched when a fragment has to be rebuilt.
+    """
+    user_id = cache.get(username_key(username))
+    if user_id is None:
+        user_id = User.objects.filter(username=username, is_active=True).values_list('id', flat=True).first()
+        if user_id is None:
+            raise Http404
+        cache.set(username_key(username), user_id, USER_ID_TIMEOUT)
+    
+    version = projects_version(user_id)
+    use_gzip = 'gzip' in request.headers.get('Accept-Encoding', '')
+    encoding = 'gzip' if use_gzip else 'identity'
+    # The gzip and identity bodies differ, so they get different strong ETags
+    etag = f'"{user_id}-{version}-{encoding}"'
+    if etag in [tag.strip() for tag in request.headers.get('If-None-Match', '').split(',')]:
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        response['Vary'] = 'Accept-Encoding'
+        return response
+    
+    key = page_key(user_id, version, encoding)
+    body = cache.get(key)
+    if body is None:
+        html = render_to_string('portfolio/index.html', {
+            'owner_id': user_id,
+            'version': version,
+            # Lazy: only evaluated if the {% cache %} fragment is cold
+            'owner': SimpleLazyObject(lambda: User.objects.only(
+                'username', 'first_name', 'last_name', 'profile_picture', 'profile_picture_variants'
+            ).get(pk=user_id)),
+            'projects': Project.objects.filter(user_id=user_id),
+        }).encode()
+        body = gzip.compress(html, compresslevel=9) if use_gzip else html
+        cache.set(key, body, PAGE_TIMEOUT)
+    
+    response = HttpResponse(body, content_type='text/html; charset=utf-8')
+    if use_gzip:
+        response['Content-Encoding'] = 'gzip'
+    response['Vary'] = 'Accept-Encoding'
+    response['ETag'] = etag
+    response['Cache-Control'] = 'public, max-age=60'
+    return response
+
+
+class ProjectListCreateView(generics.ListCreateAPIView):
+    """List and create the current user's projects"""
+    permission_classes = (permissions.IsAuthenticated,)
+    
+    def get_queryset(self):
+        return Project.objects.filter(user=self.request.user)
+    
+    def get_serializer_class(self):
+        if self.request.method == 'GET':
+            return ProjectListSerializer
+        return ProjectSerializer
+    
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user)
+
+
+class ProjectDetailView(generics.RetrieveUpdateDestroyAPIView):
+    """Retrieve, update or delete one of the current user's projects"""
+    permission_classes = (permissions.IsAuthenticated,)
+    serializer_class = ProjectSerializer
+    
+    def get_queryset(self):
+        return Project.objects.filter(user=self.request.user)
+
+
+class ProjectBulkView(APIView):
+    """Bulk create/update projects in a single transaction"""
+    permission_classes = (permissions.IsAuthenticated,)
+    
+    def _run(self, operation, request, key, success_status=status.HTTP_200_OK):
+        data = request.data
+        try:
+            results = operation(request.user, data.get(key) if isinstance(data, dict) else data)
+        except BulkValidationError as e:
+            return Response({'errors': e.errors}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'results': results}, status=success_status)
+    
+    @swagger_auto_schema(operation_description="Create projects: {\"items\": [{...}, ...]}")
+    def post(self, request):
+        return self._run(bulk_create_projects, request, 'items', status.HTTP_201_CREATED)
+    
+    @swagger_auto_schema(operation_description="Partially update projects: {\"items\": [{\"id\": 1, ...}, ...]}")
+    def patch(self, request):
+        return self._run(bulk_update_projects, request, 'items')
+
+
+class ProjectBulkDeleteView(ProjectBulkView):
+    """Bulk delete projects in a single transaction"""
+    http_method_names = ['post', 'options']
+    
+    @swagger_auto_schema(operation_description="Delete projects: {\"ids\": [1, 2, ...]}")
+    def post(self, request):
+        return self._run(bulk_delete_projects, request, 'ids')
+
+
+class ProjectBulkReorderView(ProjectBulkView):
+    """Set project positions from the order of the given ids"""
+    http_method_names = ['post', 'options']
+    
+    @swagger_auto_schema(operation_description="Reorder projects: {\"ids\": [3, 1, 2, ...]}")
+    def post(self, request):
+        return self._run(bulk_reorder_projects, request, 'ids')
+
+
+class UploadCreateView(APIView):
+    """Start a resumable upload"""
+    permission_classes = (permissions.IsAuthenticated,)
+    
+    @swagger_auto_schema(
+        operation_description="Declare a file upload; send its bytes with PATCH to the returned Location",
+        request_body=UploadSerializer,
+        responses={201: UploadSerializer}
+    )
+    def post(self, request):
+        serializer = UploadSerializer(data=request.data, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        upload = serializer.save(user=request.user)
+        
+        response = Response(serializer.data, status=status.HTTP_201_CREATED)
+        response['Location'] = reverse('portfolio:upload-detail', args=[upload.id])
+        response['Upload-Offset'] = '0'
+        response['Upload-Length'] = str(upload.size)
+        return response
+
+
+class UploadDetailView(APIView):
+    """Query, append to or cancel a resumable upload"""
+    permission_classes = (permissions.IsAuthenticated,)
+    
+    def get_upload(self, request, upload_id):
+        return get_object_or_404(Upload, pk=upload_id, user=request.user)
+    
+    def _offset_headers(self, response, upload):
+        response['Upload-Offset'] = str(upload.offset)
+        response['Upload-Length'] = str(upload.size)
+        response['Cache-Control'] = 'no-store'
+        return response
+    
+    def head(self, request, upload_id):
+        upload = self.get_upload(request, upload_id)
+        return self._offset_headers(Response(status=status.HTTP_200_OK), upload)
+    
+    @swagger_auto_schema(operation_description="Get upload progress")
+    def get(self, request, upload_id):
+        upload = self.get_upload(request, upload_id)
+        return self._offset_headers(Response(UploadSerializer(upload).data), upload)
+    
+    @swagger_auto_schema(operation_description="Append a chunk (Content-Type: application/offset+octet-stream, Upload-Offset, optional Upload-Checksum)")
+    def patch(self, request, upload_id):
+        upload = self.get_upload(request, upload_id)
+        
+        if request.content_type != 'application/offset+octet-stream':
+            return Response({'error': 'Content-Type must be application/offset+octet-stream'},
+                            status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+        try:
+            offset = int(request.META['HTTP_UPLOAD_OFFSET'])
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except (KeyError, ValueError):
+            return Response({'error': 'Upload-Offset and Content-Length headers are required'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            # request.stream reads straight from the socket; request.data is never touched
+            write_chunk(upload, request.stream, offset, length, parse_checksum(request.META.get('HTTP_UPLOAD_CHECKSUM')))
+        except UploadError as e:
+            return self._offset_headers(Response({'error': str(e)}, status=e.status), upload)
+        
+        return self._offset_headers(Response(status=status.HTTP_204_NO_CONTENT), upload)
+    
+    @swagger_auto_schema(operation_description="Cancel an unfinished upload")
+    def delete(self, request, upload_id):
+        upload = self.get_upload(request, upload_id)
+        try:
+            discard(upload)
+        except UploadError as e:
+            return Response({'error': str(e)}, status=e.status)
+        return Response(status=status.HTTP_204_NO_CONTENT)